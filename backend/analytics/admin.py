@@ -0,0 +1,31 @@
+from django.contrib import admin
+from .models import DailySales, DailyProductSales, DailyCategorySales
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Rollups are derived data: viewable, but only written by the code that maintains them."""
+
+    date_hierarchy = "date"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(RollupAdmin):
+    list_display = ["date", "orders_count", "units_sold", "revenue"]
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(RollupAdmin):
+    list_display = ["date", "product", "orders_count", "units_sold", "revenue"]
+    list_select_related = ["product"]
+
+
+@admin.register(DailyCategorySales)
+class DailyCategorySalesAdmin(RollupAdmin):
+    list_display = ["date", "category", "orders_count", "units_sold", "revenue"]
+    list_select_related = ["category"]
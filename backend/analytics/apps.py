@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class AnalyticsConfig(AppConfig):
+    name = 'analytics'
+
+    def ready(self):
+        # Connects the receivers that keep the similar-products lists fresh
+        from . import signals  # noqa: F401
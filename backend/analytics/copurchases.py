@@ -0,0 +1,125 @@
+from collections import defaultdict
+from itertools import combinations, groupby
+
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from products.models import Product
+from .models import CopurchaseIndex
+from .rollups import SOLD_STATUSES
+
+
+class TopK:
+    """
+    Space-Saving counter: approximately counts the most frequent items of a stream while
+    holding at most `capacity` counters. When full, a new item takes over the smallest
+    counter (and its count), so frequent items are never lost but rare ones may be over-counted.
+    Keeping capacity a few times larger than the number of items reported makes the top exact
+    in practice.
+    """
+
+    __slots__ = ("capacity", "counts")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+
+    def add(self, item, count=1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+        elif len(counts) < self.capacity:
+            counts[item] = count
+        else:
+            victim = min(counts, key=counts.get)
+            counts[item] = counts.pop(victim) + count
+
+    def top(self, k):
+        """[[item, count], ...] of the k largest counters, largest first (ties by item)."""
+        ranked = sorted(self.counts.items(), key=lambda pair: (-pair[1], pair[0]))
+        return [[item, count] for item, count in ranked[:k]]
+
+
+def count_copurchases(capacity, chunk_size=1000, max_order_size=50):
+    """
+    Streams the paid orders in chunks (keyset pagination on id) and counts, for every product,
+    the other products bought in the same order. Memory is bounded by the number of products
+    times capacity. Orders with more than max_order_size distinct products (bulk B2B orders)
+    are skipped: they say little about affinity and cost a quadratic number of pairs.
+    Returns {product_id: TopK}.
+    """
+    counters = defaultdict(lambda: TopK(capacity))
+    last_id = 0
+
+    while True:
+        order_ids = list(
+            Order.objects.filter(status__in=SOLD_STATUSES, id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:chunk_size]
+        )
+        if not order_ids:
+            break
+        last_id = order_ids[-1]
+
+        items = (
+            OrderItem.objects.filter(order_id__in=order_ids)
+            .order_by("order_id")
+            .values_list("order_id", "product_id")
+        )
+        for _, rows in groupby(items, key=lambda row: row[0]):
+            product_ids = sorted({product_id for _, product_id in rows})
+            if len(product_ids) > max_order_size:
+                continue
+            for a, b in combinations(product_ids, 2):
+                counters[a].add(b)
+                counters[b].add(a)
+
+    return counters
+
+
+def build_copurchase_index(top=20, capacity=None, chunk_size=1000, max_order_size=50):
+    """
+    Rebuilds CopurchaseIndex from the paid orders: keeps the `top` products most often bought
+    together with each product. Returns the number of indexed products.
+    """
+    counters = count_copurchases(
+        capacity or top * 5, chunk_size=chunk_size, max_order_size=max_order_size
+    )
+    built_at = timezone.now()
+
+    with transaction.atomic():
+        CopurchaseIndex.objects.bulk_create(
+            [
+                CopurchaseIndex(
+                    product_id=product_id, items=counter.top(top), built_at=built_at
+                )
+                for product_id, counter in counters.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=["items", "built_at"],
+            batch_size=1000,
+        )
+        # Products that no longer have any co-purchase
+        CopurchaseIndex.objects.filter(built_at__lt=built_at).delete()
+
+    return len(counters)
+
+
+def bought_together(product_id, limit):
+    """
+    [(Product, times_bought_together), ...] for one product, most frequent first: one primary
+    key lookup on the index, one to load the (active) products it lists.
+    """
+    index = CopurchaseIndex.objects.filter(product_id=product_id).first()
+    if index is None:
+        return []
+    pairs = index.items[:limit]
+
+    products = Product.objects.filter(is_active=True).in_bulk(
+        [other_id for other_id, _ in pairs]
+    )
+    return [
+        (products[other_id], times) for other_id, times in pairs if other_id in products
+    ]
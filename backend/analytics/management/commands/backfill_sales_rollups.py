@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from analytics.rollups import SOLD_STATUSES, rebuild_rollups
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the daily sales rollups (DailySales, DailyProductSales, DailyCategorySales) "
+        "from the paid orders, one day per transaction. Use it once to fill the tables for "
+        "existing orders, or to repair a range of days. Days are replaced, not added to, so "
+        "it is safe to run several times; prefer closed days, as orders paid while a day is "
+        "being rebuilt may be missed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start",
+            help="First day to rebuild, YYYY-MM-DD (default: day of the first paid order).",
+        )
+        parser.add_argument(
+            "--end",
+            help="Last day to rebuild, YYYY-MM-DD (default: yesterday).",
+        )
+
+    def handle(self, *args, **options):
+        start = self.parse_day(options["start"], "--start")
+        end = self.parse_day(options["end"], "--end")
+
+        if end is None:
+            end = timezone.localdate() - timedelta(days=1)
+        if start is None:
+            first = (
+                Order.objects.filter(status__in=SOLD_STATUSES)
+                .order_by("created_at")
+                .values_list("created_at", flat=True)
+                .first()
+            )
+            if first is None:
+                self.stdout.write("No paid orders, nothing to rebuild.")
+                return
+            start = timezone.localdate(first)
+
+        if start > end:
+            raise CommandError("--start must not be after --end.")
+
+        days = rebuild_rollups(start, end)
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt sales rollups for {days} day(s).")
+        )
+
+    @staticmethod
+    def parse_day(value, option):
+        if value is None:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"{option} must be a date (YYYY-MM-DD).")
+        return day
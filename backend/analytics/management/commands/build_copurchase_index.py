@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from analytics.copurchases import build_copurchase_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the 'frequently bought together' index from the paid orders, streaming "
+        "them in chunks and keeping a bounded top-K per product. Run it nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=20,
+            help="Products kept per product (default: 20).",
+        )
+        parser.add_argument(
+            "--capacity",
+            type=int,
+            help="Counters tracked per product while counting (default: 5 x --top).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of orders read per query (default: 1000).",
+        )
+        parser.add_argument(
+            "--max-order-size",
+            type=int,
+            default=50,
+            help="Skip orders with more distinct products than this (default: 50).",
+        )
+
+    def handle(self, *args, **options):
+        indexed = build_copurchase_index(
+            top=options["top"],
+            capacity=options["capacity"],
+            chunk_size=options["chunk_size"],
+            max_order_size=options["max_order_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} product(s)."))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from analytics.similarity import build_similar_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Computes the 'similar items' of every product from the categories and choice "
+        "specifications they share (run nightly). With --stale, only recomputes the products "
+        "whose categories or specifications changed since (run every few minutes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale",
+            action="store_true",
+            help="Only recompute the products marked as changed.",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=10,
+            help="Similar products kept per product (default: 10).",
+        )
+        parser.add_argument(
+            "--max-feature-size",
+            type=int,
+            default=1000,
+            help="Categories/options with more products than this don't generate "
+            "candidates on their own (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        computed = build_similar_products(
+            stale_only=options["stale"],
+            top=options["top"],
+            max_feature_size=options["max_feature_size"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Computed similar products of {computed} product(s).")
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from analytics.rankings import rebuild_rankings
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the bestseller and trending rankings of every product from the daily "
+        "sales rollups. Rankings are kept up to date incrementally as orders are paid; run "
+        "this nightly (during low traffic) to repair them, or after backfill_sales_rollups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Number of rollup rows read per query (default: 5000).",
+        )
+
+    def handle(self, *args, **options):
+        ranked = rebuild_rankings(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Ranked {ranked} product(s)."))
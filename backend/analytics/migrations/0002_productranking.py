@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-19 01:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('products', '0004_remove_product_stock_quantity_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRanking',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='products.product')),
+                ('units_sold', models.PositiveBigIntegerField(default=0)),
+                ('trending_score', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-units_sold'], name='ranking_units_idx'), models.Index(fields=['-trending_score'], name='ranking_trending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-19 01:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_productranking'),
+        ('products', '0004_remove_product_stock_quantity_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CopurchaseIndex',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='copurchases', serialize=False, to='products.product')),
+                ('items', models.JSONField(default=list)),
+                ('built_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Copurchase indexes',
+            },
+        ),
+    ]
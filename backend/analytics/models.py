@@ -0,0 +1,192 @@
+from django.db import models
+
+from products.models import Category, Product
+
+# ----------------------------------------------------------------------------
+# SALES ROLLUPS
+# ----------------------------------------------------------------------------
+# Pre-aggregated sales, one row per day (and per product / category). They are updated
+# incrementally when orders are marked paid (see analytics.rollups.record_paid_orders) and can
+# be rebuilt from the orders with the backfill_sales_rollups command.
+# Sales are attributed to the day the order was placed (Order.created_at, in TIME_ZONE).
+# Reports read these tables only, never Order/OrderItem.
+
+
+class SalesRollup(models.Model):
+    date = models.DateField()
+    units_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Number of paid orders that contributed to this row
+    orders_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailySales(SalesRollup):
+    """Store-wide totals per day."""
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date"], name="dailysales_date_unique"),
+        ]
+        ordering = ["date"]
+        verbose_name_plural = "Daily sales"
+
+    def __str__(self):
+        return f"{self.date}: {self.revenue}"
+
+
+class DailyProductSales(SalesRollup):
+    """Sales of one product on one day."""
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "product"], name="dailyproductsales_unique"
+            ),
+        ]
+        indexes = [
+            # Per-product history ("this product over the last 90 days")
+            models.Index(fields=["product", "date"], name="dailyproductsales_prod_idx"),
+        ]
+        verbose_name_plural = "Daily product sales"
+
+    def __str__(self):
+        return f"{self.date} - product {self.product_id}: {self.units_sold}"
+
+
+class DailyCategorySales(SalesRollup):
+    """
+    Sales of one category on one day. A product in several categories counts in each of
+    them, so category totals can add up to more than DailySales.
+    """
+
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "category"], name="dailycategorysales_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["category", "date"], name="dailycategorysales_cat_idx"
+            ),
+        ]
+        verbose_name_plural = "Daily category sales"
+
+    def __str__(self):
+        return f"{self.date} - category {self.category_id}: {self.units_sold}"
+
+
+# ----------------------------------------------------------------------------
+# PRODUCT RANKINGS
+# ----------------------------------------------------------------------------
+
+
+class ProductRanking(models.Model):
+    """
+    Precomputed popularity of a product, updated when its orders are paid
+    (see analytics.rankings) and rebuilt nightly by rebuild_product_rankings.
+
+    trending_score is a forward-decayed sales count kept in log space: every unit sold at time t
+    adds exp((t - EPOCH) / tau) to the score, so recent sales weigh exponentially more than old
+    ones (half-life: RANKINGS_TRENDING_HALF_LIFE_DAYS) and the score never has to be decayed
+    in place. Storing log(score) keeps it a small float that plain ORDER BY can rank.
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="ranking"
+    )
+    units_sold = models.PositiveBigIntegerField(default=0)
+    trending_score = models.FloatField(blank=True, null=True)
+    updated_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-units_sold"], name="ranking_units_idx"),
+            models.Index(fields=["-trending_score"], name="ranking_trending_idx"),
+        ]
+
+    def __str__(self):
+        return f"Product {self.product_id}: {self.units_sold} sold"
+
+
+# ----------------------------------------------------------------------------
+# RECOMMENDATIONS
+# ----------------------------------------------------------------------------
+
+
+class CopurchaseIndex(models.Model):
+    """
+    "Frequently bought together" for one product, built by the build_copurchase_index job.
+
+    items is a compact list of [other_product_id, times_bought_together] pairs, most
+    frequent first, at most the job's --top entries. One row per product, looked up by primary key.
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="copurchases"
+    )
+    items = models.JSONField(default=list)
+    built_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name_plural = "Copurchase indexes"
+
+    def __str__(self):
+        return f"Bought together with product {self.product_id}"
+
+
+class SimilarProduct(models.Model):
+    """
+    One entry of a product's "similar items" list, built by build_similar_products from the
+    categories and choice specifications the two products share. One row per pair, so the
+    list of a product (with the similar products' data) is a single indexed query.
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="similar_products"
+    )
+    similar = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    # Weighted Jaccard similarity of the two products' features, in (0, 1]
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "similar"], name="similarproduct_pair_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["product", "-score"], name="similarproduct_rank_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} ~ {self.similar_id} ({self.score:.2f})"
+
+
+class StaleSimilarity(models.Model):
+    """
+    Products whose categories or specifications changed since their similar products were
+    computed (marked by signals, see analytics.signals). build_similar_products --stale
+    recomputes only those. product_id is a plain id, not a foreign key: products may be
+    marked while they are being deleted.
+    """
+
+    product_id = models.BigIntegerField(primary_key=True)
+    marked_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Stale similarities"
+
+    def __str__(self):
+        return f"Product {self.product_id} (since {self.marked_at})"
@@ -0,0 +1,155 @@
+import math
+from collections import defaultdict
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DailyProductSales, ProductRanking
+
+# Reference time of the forward-decayed trending scores (see ProductRanking). Never change it
+# without running rebuild_product_rankings, or old and new scores won't be comparable.
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+ORDERINGS = {
+    "units": F("units_sold").desc(),
+    "trending": F("trending_score").desc(nulls_last=True),
+}
+
+
+def decay_exponent(moment):
+    """log of the weight of one unit sold at `moment`: (moment - EPOCH) / tau."""
+    half_life = settings.RANKINGS_TRENDING_HALF_LIFE_DAYS * 86400
+    return (moment - EPOCH).total_seconds() * math.log(2) / half_life
+
+
+def log_add(log_a, log_b):
+    """log(exp(log_a) + exp(log_b)) without overflowing; None stands for log(0)."""
+    if log_a is None:
+        return log_b
+    high, low = max(log_a, log_b), min(log_a, log_b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def record_product_sales(units_by_product, moment=None):
+    """Adds {product_id: units} sold at `moment` (default: now) to the rankings."""
+    moment = moment or timezone.now()
+    record_sales([(pid, units, moment) for pid, units in units_by_product.items()])
+
+
+def record_sales(sales):
+    """
+    Adds (product_id, units, sold_at) sales to the rankings, each decayed from the time it
+    was sold (not the time it is recorded: a late webhook must not make old sales trend).
+    Must run inside the transaction that marks the orders paid; 3 queries.
+    """
+    if not sales:
+        return
+    units_by_product = defaultdict(int)
+    score_by_product = {}
+    for pid, units, sold_at in sales:
+        if not units:
+            continue
+        units_by_product[pid] += units
+        score_by_product[pid] = log_add(
+            score_by_product.get(pid), math.log(units) + decay_exponent(sold_at)
+        )
+    if not units_by_product:
+        return
+
+    ProductRanking.objects.bulk_create(
+        [ProductRanking(product_id=pid) for pid in units_by_product],
+        ignore_conflicts=True,
+    )
+    rankings = list(
+        ProductRanking.objects.select_for_update()
+        .filter(product_id__in=units_by_product)
+        .order_by("product_id")
+    )
+    now = timezone.now()
+    for ranking in rankings:
+        ranking.units_sold += units_by_product[ranking.product_id]
+        ranking.trending_score = log_add(
+            ranking.trending_score, score_by_product[ranking.product_id]
+        )
+        ranking.updated_at = now
+    ProductRanking.objects.bulk_update(
+        rankings, ["units_sold", "trending_score", "updated_at"]
+    )
+
+
+def rebuild_rankings(chunk_size=5000):
+    """
+    Recomputes every ProductRanking from the DailyProductSales rollups (sales of a day count
+    as sold at noon that day). Returns the number of ranked products.
+    """
+    units = defaultdict(int)
+    scores = {}
+    rows = DailyProductSales.objects.values_list(
+        "product_id", "date", "units_sold"
+    ).order_by("product_id", "date")
+    for product_id, day, sold in rows.iterator(chunk_size=chunk_size):
+        if not sold:
+            continue
+        noon = timezone.make_aware(datetime.combine(day, time(12)))
+        units[product_id] += sold
+        scores[product_id] = log_add(
+            scores.get(product_id), math.log(sold) + decay_exponent(noon)
+        )
+
+    now = timezone.now()
+    with transaction.atomic():
+        ProductRanking.objects.all().delete()
+        ProductRanking.objects.bulk_create(
+            [
+                ProductRanking(
+                    product_id=pid,
+                    units_sold=sold,
+                    trending_score=scores[pid],
+                    updated_at=now,
+                )
+                for pid, sold in units.items()
+            ],
+            batch_size=1000,
+        )
+    return len(units)
+
+
+def top_products(by="units", in_category=None, limit=20):
+    """
+    The best ranked active products (optionally only those matching in_category, a filter
+    on the ranking rows), best first, as a list of Product objects. One query: the ranking
+    table joined with products.
+    """
+    rankings = ProductRanking.objects.filter(product__is_active=True)
+    if in_category is not None:
+        rankings = rankings.filter(in_category)
+    if by == "units":
+        rankings = rankings.filter(units_sold__gt=0)
+    rankings = rankings.select_related("product").order_by(ORDERINGS[by], "product_id")[
+        :limit
+    ]
+    return [ranking.product for ranking in rankings]
+
+
+def ranking_cache_key(by, category_id, limit):
+    return f"rankings:{by}:{category_id or 'all'}:{limit}"
+
+
+def cached_ranking(by, category_id, limit, build, in_category=None):
+    """
+    Returns build(top_products(...)) from the cache, computing and caching it (for
+    RANKINGS_CACHE_SECONDS) on a miss. Lists are only refreshed when they expire.
+    With a category_id, in_category() builds the filter of the ranking rows of that category;
+    it is only called on a miss, so cache hits don't touch the database.
+    """
+    key = ranking_cache_key(by, category_id, limit)
+    data = cache.get(key)
+    if data is None:
+        category_filter = in_category() if category_id is not None else None
+        data = build(top_products(by, category_filter, limit))
+        cache.set(key, data, settings.RANKINGS_CACHE_SECONDS)
+    return data
@@ -0,0 +1,142 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import OrderItem
+from .models import DailyCategorySales, DailyProductSales, DailySales
+from .rankings import record_sales
+
+# Orders in these statuses have been paid for and count as sales
+SOLD_STATUSES = ("paid", "shipped", "delivered")
+
+# (model, OrderItem expression its rows are keyed by, model field holding that key).
+# Rows of the tables are always locked in this order (then by id) to avoid deadlocks.
+ROLLUPS = (
+    (DailySales, None, None),
+    (DailyProductSales, "product_id", "product_id"),
+    (DailyCategorySales, "product__categories", "category_id"),
+)
+
+
+def _sales_by(items, key=None):
+    """
+    Aggregates the given OrderItems per day of their order (and per key, if given).
+    Returns {(date, key): (units_sold, revenue, orders_count)}; key is None without a key.
+    """
+    extra = {"key": F(key)} if key else {}
+    rows = (
+        items.annotate(day=TruncDate("order__created_at"))
+        .values("day", **extra)
+        .annotate(
+            units=Sum("quantity"),
+            revenue=Sum(
+                F("price") * F("quantity"),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+            orders=Count("order_id", distinct=True),
+        )
+        .order_by()
+    )
+    return {
+        (row["day"], row.get("key")): (row["units"], row["revenue"], row["orders"])
+        for row in rows
+        # e.g. a product without any category
+        if not (key and row["key"] is None)
+    }
+
+
+def _add_to_rollup(model, key_field, sales):
+    """
+    Adds sales (as returned by _sales_by()) onto the rows of a rollup table.
+
+    3 queries whatever the number of rows: create the missing rows (zeroed), lock the rows,
+    write the new totals with bulk_update(). Must run inside a transaction.
+    """
+    if not sales:
+        return
+
+    def lookup(day, key):
+        return {"date": day, key_field: key} if key_field else {"date": day}
+
+    model.objects.bulk_create(
+        [model(**lookup(day, key)) for day, key in sales], ignore_conflicts=True
+    )
+
+    rows = model.objects.select_for_update().filter(date__in={day for day, _ in sales})
+    if key_field:
+        rows = rows.filter(**{f"{key_field}__in": {key for _, key in sales}})
+
+    to_update = []
+    for row in rows.order_by("id"):
+        added = sales.get((row.date, getattr(row, key_field) if key_field else None))
+        if added is None:
+            continue
+        units, revenue, orders = added
+        row.units_sold += units
+        row.revenue += revenue
+        row.orders_count += orders
+        to_update.append(row)
+
+    model.objects.bulk_update(to_update, ["units_sold", "revenue", "orders_count"])
+
+
+def record_paid_orders(order_ids):
+    """
+    Adds the sales of the given orders (which were just marked paid) to the rollup tables
+    and to the product rankings.
+
+    Call it inside the transaction that marks the orders paid, and only for orders that were
+    NOT paid before, so every order is counted exactly once (PaymentService does both).
+    """
+    items = OrderItem.objects.filter(order_id__in=order_ids)
+    for model, key, key_field in ROLLUPS:
+        _add_to_rollup(model, key_field, _sales_by(items, key))
+
+    # Ranked as sold when the order was placed, the time the rollups count them at too
+    rows = items.values_list("product_id", "order__created_at").annotate(
+        Sum("quantity")
+    )
+    record_sales([(pid, units, placed_at) for pid, placed_at, units in rows.order_by()])
+
+
+def rebuild_rollups(start, end):
+    """
+    Recomputes the rollups of every day from start to end (dates, inclusive) from the orders.
+    Each day is rebuilt in its own transaction (delete + insert). Returns the number of days.
+    """
+    day = start
+    days = 0
+    while day <= end:
+        since = timezone.make_aware(datetime.combine(day, time.min))
+        until = since + timedelta(days=1)
+        items = OrderItem.objects.filter(
+            order__status__in=SOLD_STATUSES,
+            order__created_at__gte=since,
+            order__created_at__lt=until,
+        )
+
+        with transaction.atomic():
+            for model, key, key_field in ROLLUPS:
+                model.objects.filter(date=day).delete()
+                model.objects.bulk_create(
+                    [
+                        model(
+                            date=row_day,
+                            units_sold=units,
+                            revenue=revenue,
+                            orders_count=orders,
+                            **({key_field: row_key} if key_field else {}),
+                        )
+                        for (row_day, row_key), (units, revenue, orders) in _sales_by(
+                            items, key
+                        ).items()
+                    ],
+                    batch_size=1000,
+                )
+
+        day += timedelta(days=1)
+        days += 1
+    return days
@@ -0,0 +1,40 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from products.models import Product, Value
+from .similarity import mark_stale
+
+# Keep the similar-products lists fresh: any change to what a product is similar on (its
+# categories, its choice specifications, whether it is active) queues it for the next
+# incremental build_similar_products --stale run.
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Stock and price updates (save(update_fields=[...])) don't affect similarity
+    if created or update_fields is None or "is_active" in update_fields:
+        mark_stale([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    mark_stale([instance.pk])
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def product_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # instance is a Product (product.categories...) or, if reverse, a Category
+    # (category.products...), in which case pk_set holds the products
+    if action in ("post_add", "post_remove"):
+        mark_stale(pk_set if reverse else [instance.pk])
+    elif action == "post_clear" and not reverse:
+        mark_stale([instance.pk])
+    elif action == "pre_clear" and reverse:
+        # category.products.clear() doesn't say which products it removes
+        mark_stale(instance.products.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Value)
+@receiver(post_delete, sender=Value)
+def value_changed(sender, instance, **kwargs):
+    mark_stale([instance.product_id])
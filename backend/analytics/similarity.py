@@ -0,0 +1,157 @@
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from products.models import Product, Value
+from .models import SimilarProduct, StaleSimilarity
+
+
+def load_features(chunk_size=5000):
+    """
+    The features of every active product, as {product_id: {feature, ...}}, read with 3 flat
+    queries (no joins): its categories ("category", id) and the options of its choice
+    specifications ("option", id). An option belongs to a single attribute, so sharing an
+    option means sharing the same attribute and value.
+    """
+    active = set(Product.objects.filter(is_active=True).values_list("id", flat=True))
+    features = {product_id: set() for product_id in active}
+
+    categories = Product.categories.through.objects.values_list(
+        "product_id", "category_id"
+    )
+    for product_id, category_id in categories.iterator(chunk_size=chunk_size):
+        if product_id in active:
+            features[product_id].add(("category", category_id))
+
+    options = Value.objects.filter(value_option__isnull=False).values_list(
+        "product_id", "value_option_id"
+    )
+    for product_id, option_id in options.iterator(chunk_size=chunk_size):
+        if product_id in active:
+            features[product_id].add(("option", option_id))
+
+    return features
+
+
+class SimilarityIndex:
+    """
+    Inverted index over product features, scoring pairs by weighted Jaccard similarity:
+    sum of the weights of the shared features / sum of the weights of all their features.
+    A feature weighs log(1 + N / products having it), so sharing a rare option counts more
+    than sharing a big category.
+
+    Candidates of a product are the products sharing at least one of its features, except
+    features held by more than max_feature_size products (a huge category would make every
+    lookup scan it); such features still count in the score of the other candidates.
+    """
+
+    def __init__(self, features, max_feature_size=1000):
+        self.features = features
+        self.max_feature_size = max_feature_size
+
+        self.postings = defaultdict(set)
+        for product_id, product_features in features.items():
+            for feature in product_features:
+                self.postings[feature].add(product_id)
+
+        total = len(features) or 1
+        self.weights = {
+            feature: math.log(1 + total / len(members))
+            for feature, members in self.postings.items()
+        }
+        self.norms = {
+            product_id: sum(self.weights[f] for f in product_features)
+            for product_id, product_features in features.items()
+        }
+
+    def similar_to(self, product_id, top=10):
+        """[(score, other_id), ...] of the `top` most similar products, best first."""
+        mine = self.features.get(product_id)
+        if not mine:
+            return []
+
+        candidates = set()
+        for feature in mine:
+            members = self.postings[feature]
+            if len(members) <= self.max_feature_size:
+                candidates |= members
+        candidates.discard(product_id)
+
+        scores = []
+        for other_id in candidates:
+            shared = sum(self.weights[f] for f in mine & self.features[other_id])
+            union = self.norms[product_id] + self.norms[other_id] - shared
+            scores.append((round(shared / union, 6), -other_id))
+        # Ties broken by the lowest id, for stable lists
+        return [(score, -neg_id) for score, neg_id in heapq.nlargest(top, scores)]
+
+
+def _rows_for(index, product_ids, top):
+    return [
+        SimilarProduct(product_id=product_id, similar_id=other_id, score=score)
+        for product_id in product_ids
+        for score, other_id in index.similar_to(product_id, top)
+    ]
+
+
+def build_similar_products(stale_only=False, top=10, max_feature_size=1000):
+    """
+    Recomputes the similar products of every product (nightly), or with stale_only=True only of
+    the products marked in StaleSimilarity (incremental). Products that became inactive or
+    were deleted are also removed from the other products' lists. The lists of other
+    products are not recomputed in the incremental mode: they catch up on the next full run.
+    Returns the number of products whose list was computed.
+    """
+    started_at = timezone.now()
+    if stale_only:
+        marked = set(StaleSimilarity.objects.values_list("product_id", flat=True))
+        if not marked:
+            return 0
+
+    index = SimilarityIndex(load_features(), max_feature_size=max_feature_size)
+
+    if stale_only:
+        product_ids = [pid for pid in marked if pid in index.features]
+        gone = marked - set(product_ids)
+    else:
+        product_ids = list(index.features)
+        gone = None
+
+    with transaction.atomic():
+        if stale_only:
+            SimilarProduct.objects.filter(
+                Q(product_id__in=marked) | Q(similar_id__in=gone)
+            ).delete()
+        else:
+            SimilarProduct.objects.all().delete()
+        SimilarProduct.objects.bulk_create(
+            _rows_for(index, product_ids, top), batch_size=1000
+        )
+        # Marks made while we were computing are kept for the next run
+        StaleSimilarity.objects.filter(marked_at__lte=started_at).delete()
+
+    return len(product_ids)
+
+
+def mark_stale(product_ids):
+    """Queues products for the next build_similar_products --stale run (1 query)."""
+    StaleSimilarity.objects.bulk_create(
+        [StaleSimilarity(product_id=product_id) for product_id in set(product_ids)],
+        update_conflicts=True,
+        unique_fields=["product_id"],
+        update_fields=["marked_at"],
+    )
+
+
+def similar_products(product_id, limit):
+    """[(Product, score), ...] for one product, best first: a single indexed query."""
+    rows = (
+        SimilarProduct.objects.filter(product_id=product_id, similar__is_active=True)
+        .select_related("similar")
+        .order_by("-score", "similar_id")[:limit]
+    )
+    return [(row.similar, row.score) for row in rows]
@@ -0,0 +1,327 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import Order
+from payments.services import PaymentService
+from payments.tests import PaymentFixturesMixin
+from products.models import Attribute, Category, Option, Value
+from .copurchases import TopK
+from .models import (
+    CopurchaseIndex,
+    DailyCategorySales,
+    DailyProductSales,
+    DailySales,
+    ProductRanking,
+    SimilarProduct,
+    StaleSimilarity,
+)
+from .rankings import record_product_sales
+
+SALES_REPORT_URL = reverse("sales-report")
+BESTSELLERS_URL = reverse("product-bestsellers")
+
+
+class SalesRollupTests(PaymentFixturesMixin, APITestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.phones = Category.objects.create(name="Phones", slug="phones")
+        self.phone = self.create_product("Phone", price=100)
+        self.case = self.create_product("Case", price=5)
+        self.phone.categories.add(self.phones)
+        self.case.categories.add(self.phones)
+        self.today = timezone.localdate()
+
+    def pay(self, lines, session_id):
+        order = self.create_reserved_order(self.user, lines, session_id)
+        return self.paid_session(order, session_id)
+
+    def rollup_state(self):
+        return {
+            "day": list(
+                DailySales.objects.values_list(
+                    "date", "units_sold", "revenue", "orders_count"
+                )
+            ),
+            "product": sorted(
+                DailyProductSales.objects.values_list(
+                    "date", "product_id", "units_sold", "revenue", "orders_count"
+                )
+            ),
+            "category": list(
+                DailyCategorySales.objects.values_list(
+                    "date", "category_id", "units_sold", "revenue", "orders_count"
+                )
+            ),
+        }
+
+    def test_fulfill_order_updates_rollups_once(self):
+        session = self.pay([(self.phone, 2), (self.case, 1)], "cs_roll_1")
+
+        self.assertTrue(PaymentService.fulfill_order(session))
+        # Webhook delivered twice: the order is already paid, nothing is added again
+        self.assertTrue(PaymentService.fulfill_order(session))
+
+        day = DailySales.objects.get(date=self.today)
+        self.assertEqual((day.units_sold, day.revenue, day.orders_count), (3, 205, 1))
+        phone = DailyProductSales.objects.get(product=self.phone)
+        self.assertEqual((phone.units_sold, phone.revenue), (2, 200))
+        category = DailyCategorySales.objects.get(category=self.phones)
+        self.assertEqual((category.units_sold, category.orders_count), (3, 1))
+
+    def test_batch_fulfillment_and_backfill_agree(self):
+        sessions = [
+            self.pay([(self.phone, 1)], "cs_roll_a"),
+            self.pay([(self.phone, 1), (self.case, 3)], "cs_roll_b"),
+        ]
+        PaymentService.fulfill_order(sessions[0])
+        PaymentService.fulfill_orders_batch(sessions)
+
+        incremental = self.rollup_state()
+        self.assertEqual(incremental["day"][0][1:], (5, 215, 2))
+
+        DailySales.objects.all().delete()
+        DailyProductSales.objects.all().delete()
+        DailyCategorySales.objects.all().delete()
+        call_command(
+            "backfill_sales_rollups", end=self.today.isoformat(), stdout=StringIO()
+        )
+        self.assertEqual(self.rollup_state(), incremental)
+
+    def test_sales_report_reads_only_rollups(self):
+        PaymentService.fulfill_order(self.pay([(self.phone, 1)], "cs_roll_r1"))
+        PaymentService.fulfill_order(self.pay([(self.case, 4)], "cs_roll_r2"))
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(SALES_REPORT_URL)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(SALES_REPORT_URL, {"group_by": "product"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row["name"], row["revenue"]) for row in response.data["results"]],
+            [("Phone", "100.00"), ("Case", "20.00")],
+        )
+        self.assertEqual(response.data["totals"]["orders_count"], 2)
+        sql = " ".join(query["sql"] for query in ctx.captured_queries)
+        self.assertNotIn("orders_order", sql)
+
+        response = self.client.get(SALES_REPORT_URL, {"group_by": "week"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # limit is clamped to [1, MAX_LIMIT]
+        for limit, expected in (("-5", ["Phone"]), ("0", ["Phone"]), ("9999", None)):
+            response = self.client.get(
+                SALES_REPORT_URL, {"group_by": "product", "limit": limit}
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names = [row["name"] for row in response.data["results"]]
+            self.assertEqual(names, expected or ["Phone", "Case"])
+
+
+class ProductRankingTests(PaymentFixturesMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user()
+        self.phones = Category.objects.create(name="Phones", slug="phones")
+        self.phone = self.create_product("Phone", price=100)
+        self.case = self.create_product("Case", price=5)
+        self.cable = self.create_product("Cable", price=2)
+        self.phone.categories.add(self.phones)
+
+    def test_paid_orders_update_rankings(self):
+        order = self.create_reserved_order(
+            self.user, [(self.phone, 2), (self.case, 1)], "cs_rank_1"
+        )
+        PaymentService.fulfill_order(self.paid_session(order, "cs_rank_1"))
+
+        ranking = ProductRanking.objects.get(product=self.phone)
+        self.assertEqual(ranking.units_sold, 2)
+        self.assertIsNotNone(ranking.trending_score)
+
+        # The nightly rebuild (from the rollups) agrees with the incremental updates
+        call_command("rebuild_product_rankings", stdout=StringIO())
+        self.assertEqual(ProductRanking.objects.get(product=self.phone).units_sold, 2)
+
+    def test_recent_sales_trend_above_older_bigger_ones(self):
+        now = timezone.now()
+        record_product_sales({self.case.id: 50}, moment=now - timedelta(days=30))
+        record_product_sales({self.cable.id: 5}, moment=now)
+
+        by_units = self.client.get(BESTSELLERS_URL, {"by": "units"})
+        trending = self.client.get(BESTSELLERS_URL, {"by": "trending"})
+        self.assertEqual([p["name"] for p in by_units.data], ["Case", "Cable"])
+        self.assertEqual([p["name"] for p in trending.data], ["Cable", "Case"])
+
+    def test_bestsellers_are_filtered_and_cached(self):
+        record_product_sales({self.phone.id: 1, self.case.id: 10})
+
+        response = self.client.get(BESTSELLERS_URL, {"category": self.phones.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p["name"] for p in response.data], ["Phone"])
+
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get(BESTSELLERS_URL, {"category": self.phones.id})
+        self.assertEqual(again.data, response.data)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        response = self.client.get(BESTSELLERS_URL, {"by": "worst"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bestsellers_of_a_category_include_its_subcategories(self):
+        smartphones = Category.objects.create(
+            name="Smartphones", slug="smartphones", parent=self.phones
+        )
+        self.case.categories.add(smartphones)
+        record_product_sales({self.phone.id: 1, self.case.id: 10, self.cable.id: 5})
+
+        response = self.client.get(BESTSELLERS_URL, {"category": self.phones.id})
+        self.assertEqual([p["name"] for p in response.data], ["Case", "Phone"])
+        response = self.client.get(BESTSELLERS_URL, {"category": smartphones.id})
+        self.assertEqual([p["name"] for p in response.data], ["Case"])
+
+        response = self.client.get(BESTSELLERS_URL, {"category": 999999})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_late_fulfillment_trends_from_the_order_time(self):
+        """A webhook delivered days late doesn't make the sale look recent."""
+        old = self.create_reserved_order(self.user, [(self.case, 5)], "cs_rank_old")
+        Order.objects.filter(id=old.id).update(
+            created_at=timezone.now() - timedelta(days=30)
+        )
+        new = self.create_reserved_order(self.user, [(self.cable, 1)], "cs_rank_new")
+        PaymentService.fulfill_orders_batch(
+            [
+                self.paid_session(old, "cs_rank_old"),
+                self.paid_session(new, "cs_rank_new"),
+            ]
+        )
+
+        trending = self.client.get(BESTSELLERS_URL, {"by": "trending"})
+        self.assertEqual([p["name"] for p in trending.data], ["Cable", "Case"])
+
+        # Same scores as the rebuild from the rollups (sales counted at noon of their day)
+        scores = dict(ProductRanking.objects.values_list("product", "trending_score"))
+        call_command("rebuild_product_rankings", stdout=StringIO())
+        rebuilt = dict(ProductRanking.objects.values_list("product", "trending_score"))
+        self.assertEqual(scores.keys(), rebuilt.keys())
+        for product_id, score in scores.items():
+            self.assertAlmostEqual(score, rebuilt[product_id], delta=0.25)
+
+
+class CopurchaseIndexTests(PaymentFixturesMixin, APITestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.phone, self.case, self.cable, self.charger = [
+            self.create_product(name) for name in ("Phone", "Case", "Cable", "Charger")
+        ]
+
+    def paid_order(self, products, session_id):
+        order = self.create_reserved_order(
+            self.user, [(product, 1) for product in products], session_id
+        )
+        PaymentService.fulfill_order(self.paid_session(order, session_id))
+
+    def test_top_k_keeps_frequent_items_within_capacity(self):
+        counter = TopK(capacity=3)
+        for item in ["a"] * 5 + ["b"] * 4 + ["c", "d", "e", "f"]:
+            counter.add(item)
+
+        self.assertLessEqual(len(counter.counts), 3)
+        self.assertEqual([item for item, _ in counter.top(2)], ["a", "b"])
+
+    def test_index_is_built_from_paid_orders_and_served(self):
+        self.paid_order([self.phone, self.case, self.cable], "cs_co_1")
+        self.paid_order([self.phone, self.case], "cs_co_2")
+        # Not paid: ignored
+        self.create_reserved_order(self.user, [(self.phone, 1), (self.charger, 1)], "x")
+
+        call_command("build_copurchase_index", top=5, chunk_size=1, stdout=StringIO())
+
+        index = CopurchaseIndex.objects.get(product=self.phone)
+        self.assertEqual(index.items, [[self.case.id, 2], [self.cable.id, 1]])
+        self.assertFalse(CopurchaseIndex.objects.filter(product=self.charger).exists())
+
+        url = reverse("product-bought-together", kwargs={"pk": self.phone.id})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {"limit": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(p["name"], p["times_bought_together"]) for p in response.data],
+            [("Case", 2)],
+        )
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        # Unknown product: nothing bought together
+        url = reverse("product-bought-together", kwargs={"pk": 999999})
+        self.assertEqual(self.client.get(url).data, [])
+
+
+class SimilarProductsTests(PaymentFixturesMixin, APITestCase):
+    def setUp(self):
+        self.phones = Category.objects.create(name="Phones", slug="phones")
+        self.laptops = Category.objects.create(name="Laptops", slug="laptops")
+        color = Attribute.objects.create(name="Color", slug="color", data_type="choice")
+        self.black = Option.objects.create(attribute=color, value="Black")
+        self.color = color
+
+        self.phone_a, self.phone_b, self.phone_c, self.laptop = [
+            self.create_product(name)
+            for name in ("Phone A", "Phone B", "Phone C", "Laptop")
+        ]
+        for product in (self.phone_a, self.phone_b, self.phone_c):
+            product.categories.add(self.phones)
+        self.laptop.categories.add(self.laptops)
+        for product in (self.phone_a, self.phone_b, self.laptop):
+            Value.objects.create(
+                product=product, attribute=color, value_option=self.black
+            )
+
+    def similar_names(self, product):
+        url = reverse("product-similar", kwargs={"pk": product.id})
+        return [item["name"] for item in self.client.get(url).data]
+
+    def test_similar_products_are_ranked_by_shared_features(self):
+        call_command("build_similar_products", stdout=StringIO())
+
+        # Same category and same color first, then same category, then same color only
+        self.assertEqual(
+            self.similar_names(self.phone_a), ["Phone B", "Phone C", "Laptop"]
+        )
+        self.assertFalse(StaleSimilarity.objects.exists())
+
+        url = reverse("product-similar", kwargs={"pk": self.phone_a.id})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_changes_are_picked_up_by_the_incremental_run(self):
+        call_command("build_similar_products", stdout=StringIO())
+
+        # Phone C gets the color, the laptop is discontinued
+        Value.objects.create(
+            product=self.phone_c, attribute=self.color, value_option=self.black
+        )
+        self.laptop.is_active = False
+        self.laptop.save()
+        self.assertEqual(
+            set(StaleSimilarity.objects.values_list("product_id", flat=True)),
+            {self.phone_c.id, self.laptop.id},
+        )
+
+        call_command("build_similar_products", stale=True, stdout=StringIO())
+        self.assertEqual(self.similar_names(self.phone_c), ["Phone A", "Phone B"])
+        self.assertFalse(SimilarProduct.objects.filter(similar=self.laptop).exists())
+        self.assertFalse(StaleSimilarity.objects.exists())
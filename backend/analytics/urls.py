@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import SalesReportView
+
+urlpatterns = [
+    # Admin-only endpoints
+    path("sales/", SalesReportView.as_view(), name="sales-report"),
+]
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import DailyCategorySales, DailyProductSales, DailySales
+
+
+class SalesReportView(APIView):
+    """
+    GET /api/reports/sales/ (admins only): revenue and units sold, read from the rollup tables.
+
+    Query params:
+    - ?start=2025-01-01&end=2025-01-31: inclusive date range (default: the last 30 days)
+    - ?group_by=day (default) | product | category
+    - ?limit=50: max rows for product/category, best sellers (by revenue) first (max 500)
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    GROUPINGS = {
+        # group_by: (rollup model, columns to group on, extra columns)
+        "day": (DailySales, ("date",), {}),
+        "product": (DailyProductSales, ("product_id",), {"name": F("product__name")}),
+        "category": (
+            DailyCategorySales,
+            ("category_id",),
+            {"name": F("category__name")},
+        ),
+    }
+    DEFAULT_DAYS = 30
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 500
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        end = self.parse_day("end") or timezone.localdate()
+        start = self.parse_day("start") or end - timedelta(days=self.DEFAULT_DAYS - 1)
+        if start > end:
+            raise ValidationError({"start": "Must not be after 'end'."})
+
+        group_by = params.get("group_by", "day")
+        if group_by not in self.GROUPINGS:
+            raise ValidationError(
+                {"group_by": f"Must be one of: {', '.join(self.GROUPINGS)}."}
+            )
+
+        try:
+            limit = min(
+                max(int(params.get("limit", self.DEFAULT_LIMIT)), 1), self.MAX_LIMIT
+            )
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+
+        model, columns, extra = self.GROUPINGS[group_by]
+        rows = (
+            model.objects.filter(date__range=(start, end))
+            .values(*columns, **extra)
+            .annotate(
+                units_sold=Sum("units_sold"),
+                revenue=Sum("revenue"),
+                orders_count=Sum("orders_count"),
+            )
+        )
+        if group_by == "day":
+            rows = rows.order_by("date")
+        else:
+            rows = rows.order_by("-revenue", "name")[:limit]
+
+        totals = DailySales.objects.filter(date__range=(start, end)).aggregate(
+            units_sold=Sum("units_sold"),
+            revenue=Sum("revenue"),
+            orders_count=Sum("orders_count"),
+        )
+
+        return Response(
+            {
+                "start": start,
+                "end": end,
+                "group_by": group_by,
+                "totals": self.format_row(totals),
+                "results": [self.format_row(row) for row in rows],
+            }
+        )
+
+    def parse_day(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({name: "Must be a date (YYYY-MM-DD)."})
+        return day
+
+    @staticmethod
+    def format_row(row):
+        # Money as a string, like the rest of the API (DecimalField serialization)
+        row["units_sold"] = row["units_sold"] or 0
+        row["orders_count"] = row["orders_count"] or 0
+        row["revenue"] = f"{row['revenue'] or 0:.2f}"
+        return row
@@ -0,0 +1,30 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from orders.models import Address
+
+
+class CartItemAddSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(
+        min_value=1, max_value=settings.CART_MAX_QUANTITY, default=1
+    )
+
+
+class CartItemUpdateSerializer(serializers.Serializer):
+    # 0 removes the line
+    quantity = serializers.IntegerField(
+        min_value=0, max_value=settings.CART_MAX_QUANTITY
+    )
+
+
+class CartCheckoutSerializer(serializers.Serializer):
+    address = serializers.PrimaryKeyRelatedField(queryset=Address.objects.none())
+    recipient_name = serializers.CharField(max_length=150)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only the user's own addresses can be shipped to
+        request = self.context.get("request")
+        if request is not None:
+            self.fields["address"].queryset = Address.objects.filter(user=request.user)
@@ -0,0 +1,187 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import serializers
+
+from orders.serializers import OrderWriteSerializer
+from orders.services import OrderService
+
+
+class CartService:
+    """
+    Server-side shopping carts, stored in Django's cache framework (the "carts" cache alias:
+    local memory in development/tests, Redis or similar in production). Nothing is written to
+    the database until checkout.
+
+    A cart is one cache entry per user: {"version": int, "lines": {product_id: quantity}}.
+    Adding, updating and removing a line are dict operations on an entry of bounded size
+    (settings.CART_MAX_LINES), and every change bumps the version, which keys the cached
+    priced cart (see price()); emptying the cart bumps it too, so versions never repeat.
+    Carts expire after settings.CART_TTL_DAYS without changes.
+    Changes are read-modify-write without a lock: two simultaneous changes to the same cart
+    (one user, two tabs) may lose one of them, which is acceptable for a cart.
+    """
+
+    @staticmethod
+    def _cache():
+        return caches["carts"]
+
+    @staticmethod
+    def _key(user):
+        return f"cart:{user.pk}"
+
+    @staticmethod
+    def get(user):
+        """The cart of the user: {"version": int, "lines": {product_id: quantity}}."""
+        cart = CartService._cache().get(CartService._key(user))
+        return cart or {"version": 0, "lines": {}}
+
+    @staticmethod
+    def _save(user, cart):
+        cart["version"] += 1
+        CartService._cache().set(
+            CartService._key(user), cart, settings.CART_TTL_DAYS * 86400
+        )
+        return cart
+
+    @staticmethod
+    def _check_product(product_id):
+        product = OrderService.fetch_products([product_id]).get(product_id)
+        if product is None or not product.is_active:
+            raise serializers.ValidationError(
+                {"product": [f"Product with ID {product_id} does not exist."]}
+            )
+
+    @staticmethod
+    def add(user, product_id, quantity):
+        """Adds quantity units of a product (to the existing line, if any)."""
+        cart = CartService.get(user)
+        lines = cart["lines"]
+        if product_id not in lines:
+            if len(lines) >= settings.CART_MAX_LINES:
+                raise serializers.ValidationError(
+                    {
+                        "product": [
+                            f"A cart can hold at most {settings.CART_MAX_LINES} products."
+                        ]
+                    }
+                )
+            CartService._check_product(product_id)
+        total = lines.get(product_id, 0) + quantity
+        if total > settings.CART_MAX_QUANTITY:
+            raise serializers.ValidationError(
+                {
+                    "quantity": [
+                        f"A cart can hold at most {settings.CART_MAX_QUANTITY} units "
+                        "of a product."
+                    ]
+                }
+            )
+        lines[product_id] = total
+        return CartService._save(user, cart)
+
+    @staticmethod
+    def set_quantity(user, product_id, quantity):
+        """Sets the quantity of a line already in the cart; 0 removes it."""
+        cart = CartService.get(user)
+        if product_id not in cart["lines"]:
+            raise KeyError(product_id)
+        if quantity:
+            cart["lines"][product_id] = quantity
+        else:
+            del cart["lines"][product_id]
+        return CartService._save(user, cart)
+
+    @staticmethod
+    def remove(user, product_id):
+        cart = CartService.get(user)
+        if cart["lines"].pop(product_id, None) is None:
+            raise KeyError(product_id)
+        return CartService._save(user, cart)
+
+    @staticmethod
+    def clear(user):
+        # Saved empty rather than deleted: the version must keep growing, or the next cart
+        # would start over at version 1 and be served the old cart's priced entry
+        cart = CartService.get(user)
+        cart["lines"] = {}
+        return CartService._save(user, cart)
+
+    @staticmethod
+    def price(user):
+        """
+        The cart repriced with the current product prices and stock: one query for all of its
+        products. The result is cached per cart version for settings.CART_PRICING_CACHE_SECONDS,
+        so repeated views of an unchanged cart don't hit the database.
+
+        Lines whose product is gone or inactive, or lacks stock, carry an "issue" and are not
+        counted in the subtotal.
+        """
+        cart = CartService.get(user)
+        cache = CartService._cache()
+        key = f"{CartService._key(user)}:priced:{cart['version']}"
+        priced = cache.get(key)
+        if priced is not None:
+            return priced
+
+        products = OrderService.fetch_products(cart["lines"])
+        items = []
+        subtotal = Decimal("0")
+        for product_id, quantity in cart["lines"].items():
+            product = products.get(product_id)
+            item = {"product": product_id, "quantity": quantity, "issue": None}
+            if product is None or not product.is_active:
+                item["issue"] = "This product is no longer available."
+                items.append(item)
+                continue
+
+            line_total = product.price * quantity
+            item.update(
+                {
+                    "name": product.name,
+                    "unit_price": str(product.price),
+                    "line_total": str(line_total),
+                    "quantity_available": product.quantity_available,
+                }
+            )
+            if product.quantity_available < quantity:
+                item["issue"] = f"Only {product.quantity_available} left in stock."
+            else:
+                subtotal += line_total
+            items.append(item)
+
+        priced = {
+            "items": items,
+            "item_count": sum(cart["lines"].values()),
+            "subtotal": str(subtotal),
+            "has_issues": any(item["issue"] for item in items),
+        }
+        cache.set(key, priced, settings.CART_PRICING_CACHE_SECONDS)
+        return priced
+
+    @staticmethod
+    def checkout(user, address, recipient_name, context):
+        """
+        Turns the cart into an Order (the same validation and single bulk insert of the items
+        as POST /api/orders/), then empties the cart. Returns the Order.
+        """
+        lines = CartService.get(user)["lines"]
+        if not lines:
+            raise serializers.ValidationError({"cart": ["The cart is empty."]})
+
+        serializer = OrderWriteSerializer(
+            data={
+                "address": address.id,
+                "recipient_name": recipient_name,
+                "order_items": [
+                    {"product": product_id, "quantity": quantity}
+                    for product_id, quantity in lines.items()
+                ],
+            },
+            context=context,
+        )
+        serializer.is_valid(raise_exception=True)
+        order = serializer.save(user=user)
+        CartService.clear(user)
+        return order
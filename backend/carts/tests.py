@@ -0,0 +1,163 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import Address, Order
+from products.models import Product
+
+User = get_user_model()
+
+CART_URL = reverse("cart")
+CART_ITEMS_URL = reverse("cart-item-list")
+CART_CHECKOUT_URL = reverse("cart-checkout")
+
+
+def cart_item_url(product_id):
+    return reverse("cart-item-detail", kwargs={"product_id": product_id})
+
+
+class CartTests(APITestCase):
+    def setUp(self):
+        caches["carts"].clear()
+        self.user = User.objects.create_user(
+            email="shopper@example.com", password="password123"
+        )
+        self.address = Address.objects.create(
+            user=self.user, city="Tehran", address_line_1="Main St", postal_code="1"
+        )
+        self.phone = Product.objects.create(
+            name="Phone", slug="phone", price=100, quantity_on_hand=5
+        )
+        self.case = Product.objects.create(
+            name="Case", slug="case", price=5, quantity_on_hand=50
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def add(self, product, quantity=1):
+        return self.client.post(
+            CART_ITEMS_URL, {"product": product.id, "quantity": quantity}, format="json"
+        )
+
+    def test_add_update_remove(self):
+        self.add(self.phone)
+        self.add(self.phone)
+        response = self.add(self.case, 3)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["item_count"], 5)
+        self.assertEqual(response.data["subtotal"], "215.00")
+
+        response = self.client.patch(
+            cart_item_url(self.case.id), {"quantity": 1}, format="json"
+        )
+        self.assertEqual(response.data["subtotal"], "205.00")
+
+        response = self.client.delete(cart_item_url(self.phone.id))
+        self.assertEqual(
+            [item["product"] for item in response.data["items"]], [self.case.id]
+        )
+
+        response = self.client.delete(cart_item_url(self.phone.id))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.add(Product(id=999999))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pricing_is_cached_and_flags_stock_and_price_changes(self):
+        self.add(self.phone, 2)
+        self.add(self.case)
+
+        self.client.get(CART_URL)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(CART_URL)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        # Any change to the cart reprices it, with one query for all its products
+        Product.objects.filter(id=self.phone.id).update(price=90, quantity_available=1)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(
+                cart_item_url(self.case.id), {"quantity": 2}, format="json"
+            )
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        phone = response.data["items"][0]
+        self.assertEqual(phone["unit_price"], "90.00")
+        self.assertEqual(phone["issue"], "Only 1 left in stock.")
+        self.assertTrue(response.data["has_issues"])
+        self.assertEqual(response.data["subtotal"], "10.00")
+
+    def test_emptied_cart_is_not_served_its_old_pricing(self):
+        self.add(self.phone)
+        self.client.get(CART_URL)
+        self.client.delete(CART_URL)
+
+        response = self.add(self.case)
+        self.assertEqual(
+            [item["product"] for item in response.data["items"]], [self.case.id]
+        )
+        self.assertEqual(response.data["subtotal"], "5.00")
+
+    def test_quantity_of_a_line_is_capped(self):
+        with self.settings(CART_MAX_QUANTITY=5):
+            self.assertEqual(
+                self.add(self.case, 3).status_code, status.HTTP_201_CREATED
+            )
+            response = self.add(self.case, 3)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(CART_URL).data["item_count"], 3)
+
+    def test_checkout_creates_the_order_and_empties_the_cart(self):
+        self.add(self.phone, 2)
+        self.add(self.case)
+
+        response = self.client.post(
+            CART_CHECKOUT_URL,
+            {"address": self.address.id, "recipient_name": "Shopper"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(id=response.data["id"])
+        self.assertEqual(order.total_paid, 205)
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(self.client.get(CART_URL).data["items"], [])
+
+        response = self.client.post(
+            CART_CHECKOUT_URL,
+            {"address": self.address.id, "recipient_name": "Shopper"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_checkout_rejects_deactivated_products(self):
+        self.add(self.phone)
+        self.add(self.case)
+        # Deactivated after the cart was priced: checkout must still catch it
+        self.client.get(CART_URL)
+        Product.objects.filter(id=self.case.id).update(is_active=False)
+
+        response = self.client.post(
+            CART_CHECKOUT_URL,
+            {"address": self.address.id, "recipient_name": "Shopper"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("'Case' is no longer available.", response.data["order_items"])
+        self.assertFalse(Order.objects.exists())
+        # The cart is kept so the shopper can remove the line
+        self.assertEqual(len(self.client.get(CART_URL).data["items"]), 2)
+
+    def test_checkout_rejects_someone_elses_address(self):
+        other = User.objects.create_user(email="other@example.com", password="pw")
+        address = Address.objects.create(user=other, city="Shiraz")
+        self.add(self.phone)
+
+        response = self.client.post(
+            CART_CHECKOUT_URL,
+            {"address": address.id, "recipient_name": "Shopper"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
@@ -0,0 +1,103 @@
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from idempotency.decorators import idempotent
+from orders.serializers import OrderWriteSerializer
+from .serializers import (
+    CartCheckoutSerializer,
+    CartItemAddSerializer,
+    CartItemUpdateSerializer,
+)
+from .services import CartService
+
+
+class CartView(APIView):
+    """
+    GET /api/carts/: the current user's cart, repriced with current prices and stock.
+    DELETE /api/carts/: empty the cart.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response(CartService.price(request.user))
+
+    def delete(self, request, *args, **kwargs):
+        CartService.clear(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CartItemListView(APIView):
+    """POST /api/carts/items/: add a product ({"product", "quantity"}) to the cart."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = CartItemAddSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        CartService.add(
+            request.user,
+            serializer.validated_data["product"],
+            serializer.validated_data["quantity"],
+        )
+        return Response(CartService.price(request.user), status=status.HTTP_201_CREATED)
+
+
+class CartItemDetailView(APIView):
+    """
+    PATCH /api/carts/items/{product_id}/: set the quantity of a line ({"quantity"}, 0 removes it).
+    DELETE /api/carts/items/{product_id}/: remove a line.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def patch(self, request, product_id, *args, **kwargs):
+        serializer = CartItemUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            CartService.set_quantity(
+                request.user, product_id, serializer.validated_data["quantity"]
+            )
+        except KeyError:
+            return self.not_in_cart()
+        return Response(CartService.price(request.user))
+
+    def delete(self, request, product_id, *args, **kwargs):
+        try:
+            CartService.remove(request.user, product_id)
+        except KeyError:
+            return self.not_in_cart()
+        return Response(CartService.price(request.user))
+
+    @staticmethod
+    def not_in_cart():
+        return Response(
+            {"error": "This product is not in the cart."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+
+class CartCheckoutView(APIView):
+    """
+    POST /api/carts/checkout/: turn the cart into an order ({"address", "recipient_name"}).
+    Responds like POST /api/orders/; the cart is emptied on success.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        serializer = CartCheckoutSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        order = CartService.checkout(
+            request.user,
+            serializer.validated_data["address"],
+            serializer.validated_data["recipient_name"],
+            context={"request": request},
+        )
+        return Response(
+            OrderWriteSerializer(order).data, status=status.HTTP_201_CREATED
+        )
@@ -37,8 +37,10 @@ INSTALLED_APPS = [
     "products",
     # "reviews",
     "orders",
-    # "carts",
+    "carts",
     "payments",
+    "idempotency",
+    "analytics",
 ]
 
 
@@ -198,3 +200,74 @@ STRIPE_PUBLISHABLE_KEY = env("STRIPE_PUBLISHABLE_KEY")
 STRIPE_SECRET_KEY = env("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = env("STRIPE_WEBHOOK_SECRET")
 PAYMENT_SUCCESS_URL = env("PAYMENT_SUCCESS_URL")
+
+# Finished StockReservation / Transaction rows older than this are moved to the archive tables
+# by `python manage.py archive_payment_history`
+PAYMENTS_RETENTION_DAYS = env.int("PAYMENTS_RETENTION_DAYS", default=90)
+
+# Top-level keys of the gateway response (e.g. the Stripe Checkout Session) that are kept in
+# TransactionPayload. Everything else is dropped before the payload is compressed and stored.
+PAYMENTS_RAW_RESPONSE_FIELDS = env.list(
+    "PAYMENTS_RAW_RESPONSE_FIELDS",
+    default=[
+        "id",
+        "object",
+        "amount_subtotal",
+        "amount_total",
+        "currency",
+        "client_reference_id",
+        "customer",
+        "customer_details",
+        "payment_intent",
+        "payment_status",
+        "status",
+        "mode",
+        "created",
+        "livemode",
+    ],
+)
+
+# Idempotency-Key handling (see idempotency/decorators.py): how long a finished response is
+# kept for replay, and how long an in-progress key blocks duplicates before being considered
+# abandoned (e.g. the worker crashed).
+IDEMPOTENCY_KEY_TTL_HOURS = env.int("IDEMPOTENCY_KEY_TTL_HOURS", default=24)
+IDEMPOTENCY_LOCK_TIMEOUT_SECONDS = env.int(
+    "IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", default=60
+)
+
+# Cache (Django cache framework). Local memory by default; point CACHE_URL at Redis/Memcached
+# in production, e.g. CACHE_URL=rediscache://127.0.0.1:6379/1
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="locmemcache://"),
+    # Shopping carts live only in the cache (see carts/services.py): give them their own
+    # backend so they are not evicted with ordinary cached data. Use a persistent Redis in
+    # production, e.g. CART_CACHE_URL=rediscache://127.0.0.1:6379/2
+    "carts": env.cache_url("CART_CACHE_URL", default="locmemcache://carts"),
+}
+
+# Product rankings (analytics.ProductRanking): half-life of a sale in the "trending" score, and
+# how long the ranked lists served by /api/products/bestsellers/ are cached.
+RANKINGS_TRENDING_HALF_LIFE_DAYS = env.float(
+    "RANKINGS_TRENDING_HALF_LIFE_DAYS", default=3.0
+)
+RANKINGS_CACHE_SECONDS = env.int("RANKINGS_CACHE_SECONDS", default=300)
+
+# Server-side carts (carts app): lifetime of an untouched cart, max number of distinct
+# products in a cart, max quantity of one product, and how long a priced cart is cached.
+CART_TTL_DAYS = env.int("CART_TTL_DAYS", default=30)
+CART_MAX_LINES = env.int("CART_MAX_LINES", default=100)
+CART_MAX_QUANTITY = env.int("CART_MAX_QUANTITY", default=1000)
+CART_PRICING_CACHE_SECONDS = env.int("CART_PRICING_CACHE_SECONDS", default=60)
+
+# Max age (Cache-Control) of /api/products/availability/ responses, in seconds
+PRODUCT_AVAILABILITY_MAX_AGE = env.int("PRODUCT_AVAILABILITY_MAX_AGE", default=5)
+
+# Lifetime of the per-product stock cache entries (products/stock_cache.py), i.e. the maximum
+# staleness of cached price/quantity_available for writes that don't update the cache
+STOCK_CACHE_SECONDS = env.int("STOCK_CACHE_SECONDS", default=5)
+
+# Cached catalog responses (products/caching.py): kill switch, TTL of views without their own,
+# and per-view overrides, e.g. RESPONSE_CACHE_TTLS=ProductViewSet=30,CategoryViewSet=3600
+RESPONSE_CACHE_ENABLED = env.bool("RESPONSE_CACHE_ENABLED", default=True)
+RESPONSE_CACHE_DEFAULT_TTL = env.int("RESPONSE_CACHE_DEFAULT_TTL", default=60)
+RESPONSE_CACHE_TTLS = env.dict("RESPONSE_CACHE_TTLS", cast={"value": int}, default={})
@@ -14,8 +14,9 @@ urlpatterns = [
     path("api/", include("products.urls")),
     path("api/", include("orders.urls")),
     # path("api/reviews/", include("reviews.urls")),
-    # path("api/carts/", include("carts.urls")),
+    path("api/carts/", include("carts.urls")),
     path("api/payments/", include("payments.urls")),
+    path("api/reports/", include("analytics.urls")),
     # The following two URL patterns are here for drf_spectacular library
     # API Schema View (The raw JSON/YAML specification file)
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import IdempotencyKey
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ["key", "user", "status", "response_status", "expires_at"]
+    list_filter = ["status"]
+    search_fields = ["key"]
+    readonly_fields = ["fingerprint", "response_status", "response_body"]
@@ -0,0 +1,135 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def request_fingerprint(request):
+    """SHA-256 of the method, path and (canonicalized) body of a DRF request."""
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    raw = f"{request.method}\n{request.path}\n{body}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _claim_key(user, key, fingerprint):
+    """
+    Inserts the IN_PROGRESS row for (user, key). Returns (claim, None) when the caller now
+    owns the key and must run the view (claim: the inserted row), or (None, existing) when
+    the key was already used.
+
+    An expired row (abandoned IN_PROGRESS, or a COMPLETED response past its TTL that
+    hasn't been purged yet) is deleted and the key is claimed anew.
+    """
+    lock_timeout = timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS)
+    for _ in range(2):
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                claim = IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    fingerprint=fingerprint,
+                    expires_at=now + lock_timeout,
+                )
+            return claim, None
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if existing is None:
+                continue  # deleted in the meantime, try again
+            if existing.expires_at > now:
+                return None, existing
+            IdempotencyKey.objects.filter(id=existing.id, expires_at__lte=now).delete()
+    # Lost the race for the freed key against another request
+    return None, IdempotencyKey(user=user, key=key, fingerprint=fingerprint)
+
+
+def idempotent(view_method):
+    """
+    Makes a DRF view's POST handler honor the Idempotency-Key header.
+
+    - no header: the view runs as usual
+    - first request with a key: the view runs, and its response (status + data) is stored
+    - retry with the same key and the same request: the stored response is replayed, with
+      an "Idempotent-Replayed: true" header; the view does NOT run again
+    - same key while the first request is still running: 409
+    - same key with a different method/path/body: 422
+
+    Server errors (5xx) and exceptions are not stored: the key is freed so the client can
+    retry. Keys are scoped per user, so the view must require authentication.
+
+        class MyView(APIView):
+            @idempotent
+            def post(self, request, *args, **kwargs):
+                ...
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(view, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response(
+                {"error": f"{IDEMPOTENCY_HEADER} must be at most 255 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = request_fingerprint(request)
+        claim, existing = _claim_key(request.user, key, fingerprint)
+
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                return Response(
+                    {
+                        "error": f"This {IDEMPOTENCY_HEADER} was already used for a different request."
+                    },
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if existing.status != IdempotencyKey.Status.COMPLETED:
+                return Response(
+                    {
+                        "error": "A request with this Idempotency-Key is still being processed. Retry later."
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
+            response = Response(existing.response_body, status=existing.response_status)
+            response[REPLAYED_HEADER] = "true"
+            return response
+
+        # Our own row only: if the view outlived IDEMPOTENCY_LOCK_TIMEOUT_SECONDS, a retry may
+        # have taken the key over (a new row), and its outcome must not be overwritten/deleted
+        claimed = IdempotencyKey.objects.filter(
+            id=claim.id, status=IdempotencyKey.Status.IN_PROGRESS
+        )
+        try:
+            response = view_method(view, request, *args, **kwargs)
+        except Exception:
+            claimed.delete()
+            raise
+
+        if response.status_code >= 500:
+            claimed.delete()
+        else:
+            ttl = timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+            claimed.update(
+                status=IdempotencyKey.Status.COMPLETED,
+                response_status=response.status_code,
+                response_body=response.data,
+                expires_at=timezone.now() + ttl,
+            )
+        return response
+
+    return wrapper
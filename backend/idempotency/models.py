@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class IdempotencyKey(models.Model):
+    """
+    One client-supplied Idempotency-Key and the outcome of the request it was first used with.
+
+    Lifecycle:
+    - IN_PROGRESS: inserted before the view runs. The (user, key) unique constraint makes a
+      concurrent duplicate fail to insert, so it can be rejected instead of running twice.
+      expires_at is short (IDEMPOTENCY_LOCK_TIMEOUT_SECONDS) so a crashed worker doesn't
+      block the key for long.
+    - COMPLETED: the response (status + body) is stored and replayed for every retry until
+      expires_at (IDEMPOTENCY_KEY_TTL_HOURS). Expired rows are removed by purge_idempotency_keys.
+    """
+
+    class Status(models.TextChoices):
+        IN_PROGRESS = "in_progress", "In progress"
+        COMPLETED = "completed", "Completed"
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys",
+    )
+    key = models.CharField(max_length=255)
+    # SHA-256 of method + path + body; a key reused for a different request is rejected
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.IN_PROGRESS
+    )
+
+    response_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    response_body = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_user_key_unique"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status}) for user {self.user_id}"
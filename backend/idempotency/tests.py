@@ -0,0 +1,173 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import Address, Order
+from orders.views import OrderListCreateView
+from products.models import Product
+from .decorators import REPLAYED_HEADER
+from .models import IdempotencyKey
+
+User = get_user_model()
+
+ORDER_LIST_CREATE_URL = reverse("order-list-create")
+
+
+class IdempotencyKeyTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="retry@example.com", password="password123"
+        )
+        self.address = Address.objects.create(user=self.user, city="Tehran")
+        self.product = Product.objects.create(
+            name="Phone",
+            slug="phone",
+            price=100,
+            quantity_on_hand=10,
+            quantity_available=10,
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def order_payload(self, quantity=1):
+        return {
+            "address": self.address.id,
+            "recipient_name": "Retry",
+            "order_items": [{"product": self.product.id, "quantity": quantity}],
+        }
+
+    def post_order(self, key, data=None):
+        return self.client.post(
+            ORDER_LIST_CREATE_URL,
+            data or self.order_payload(),
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post_order("key-1")
+        second = self.post_order("key-1")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data["id"], first.data["id"])
+        self.assertEqual(second[REPLAYED_HEADER], "true")
+        self.assertFalse(first.has_header(REPLAYED_HEADER))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        self.client.post(ORDER_LIST_CREATE_URL, self.order_payload(), format="json")
+        self.client.post(ORDER_LIST_CREATE_URL, self.order_payload(), format="json")
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_key_reused_for_a_different_request_is_rejected(self):
+        self.post_order("key-1")
+        response = self.post_order("key-1", self.order_payload(quantity=2))
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_concurrent_duplicate_is_blocked(self):
+        first = self.post_order("key-1")
+        # Simulate the first request still running
+        IdempotencyKey.objects.filter(key="key-1").update(
+            status=IdempotencyKey.Status.IN_PROGRESS
+        )
+        response = self.post_order("key-1")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+    def test_abandoned_in_progress_key_is_taken_over(self):
+        IdempotencyKey.objects.create(
+            user=self.user,
+            key="key-1",
+            fingerprint="crashed",
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        response = self.post_order("key-1")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            IdempotencyKey.objects.get(key="key-1").status,
+            IdempotencyKey.Status.COMPLETED,
+        )
+
+    def test_request_outliving_its_claim_leaves_the_new_owner_alone(self):
+        """A retry takes over the expired claim of a slow request; the slow one finishes."""
+        create = OrderListCreateView.create
+        retried = []
+
+        def slow_create(view, request, *args, **kwargs):
+            if not retried:
+                retried.append(1)
+                # Our claim expires while the view runs and a retry takes the key over
+                IdempotencyKey.objects.filter(key="key-1").update(
+                    expires_at=timezone.now() - timedelta(seconds=1)
+                )
+                self.assertEqual(
+                    self.post_order("key-1").status_code, status.HTTP_201_CREATED
+                )
+            return create(view, request, *args, **kwargs)
+
+        with mock.patch.object(OrderListCreateView, "create", slow_create):
+            first = self.post_order("key-1")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        # The retry's response is the one kept and replayed
+        kept = IdempotencyKey.objects.get(key="key-1")
+        self.assertNotEqual(kept.response_body["id"], first.data["id"])
+        self.assertEqual(self.post_order("key-1").data["id"], kept.response_body["id"])
+
+    def test_keys_are_scoped_per_user(self):
+        self.post_order("key-1")
+        other = User.objects.create_user(email="other@example.com", password="pw")
+        Address.objects.filter(id=self.address.id).update(user=other)
+        self.client.force_authenticate(user=other)
+
+        response = self.post_order("key-1")
+        self.assertNotIn(REPLAYED_HEADER, response)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_server_errors_free_the_key(self):
+        url = reverse("create-checkout-session")
+        order = Order.objects.create(
+            user=self.user, address=self.address, total_paid=100, recipient_name="Me"
+        )
+        target = "payments.views.PaymentService.create_checkout_session"
+
+        with mock.patch(target, side_effect=RuntimeError("gateway down")):
+            response = self.client.post(
+                url, {"order_id": order.id}, format="json", HTTP_IDEMPOTENCY_KEY="k"
+            )
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        with mock.patch(target, return_value="https://pay.example/cs_1") as create:
+            for _ in range(2):
+                response = self.client.post(
+                    url, {"order_id": order.id}, format="json", HTTP_IDEMPOTENCY_KEY="k"
+                )
+                self.assertEqual(
+                    response.data["checkout_url"], "https://pay.example/cs_1"
+                )
+        create.assert_called_once()
+
+    def test_purge_removes_only_expired_keys(self):
+        now = timezone.now()
+        for key, expires_at in (
+            ("old", now - timedelta(hours=1)),
+            ("fresh", now + timedelta(hours=1)),
+        ):
+            IdempotencyKey.objects.create(
+                user=self.user, key=key, fingerprint="x", expires_at=expires_at
+            )
+
+        call_command("purge_idempotency_keys", stdout=StringIO())
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)), ["fresh"]
+        )
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from orders.models import Order
+from orders.services import OrderService
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes Order.snapshot for orders created before snapshots existed or holding an "
+        "older version of it, rebuilding it from their items, address and shipping_* fields. "
+        "Orders with a current snapshot are untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of orders rebuilt and saved per batch (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+        last_id = 0
+
+        while True:
+            # Keyset pagination on id, so every batch is a cheap index range scan
+            orders = list(
+                Order.objects.filter(
+                    Q(snapshot__isnull=True)
+                    | Q(snapshot__version__isnull=True)
+                    | Q(snapshot__version__lt=OrderService.SNAPSHOT_VERSION),
+                    id__gt=last_id,
+                )
+                .order_by("id")
+                .only("id")[:batch_size]
+            )
+            if not orders:
+                break
+            last_id = orders[-1].id
+
+            snapshots = OrderService.snapshots_from_db(orders)
+            for order in orders:
+                order.snapshot = snapshots[order.id]
+            Order.objects.bulk_update(orders, ["snapshot"])
+
+            total += len(orders)
+            self.stdout.write(f"{total} order(s) backfilled...")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total} order snapshot(s)."))
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from products.models import Product
 import uuid
 
@@ -52,12 +53,32 @@ class Order(models.Model):
         editable=False,
     )
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    # Frozen JSON document of the order as it was placed (items with names and prices,
+    # shipping address, totals). Written once at creation and never changed afterwards, so
+    # the detail view reads it instead of joining OrderItem/Product/Address.
+    # See OrderService.build_snapshot() for its shape.
+    snapshot = models.JSONField(
+        blank=True, null=True, editable=False, encoder=DjangoJSONEncoder
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            # Order history of one user, newest first (cursor pagination)
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+            # Same, filtered by status (e.g. "my paid orders")
+            models.Index(
+                fields=["user", "status", "-created_at"],
+                name="order_user_status_created_idx",
+            ),
+            # Admins browsing all orders by status
+            models.Index(
+                fields=["status", "-created_at"], name="order_status_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Order {self.id}"
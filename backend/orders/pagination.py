@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OrderHistoryCursorPagination(CursorPagination):
+    """
+    Cursor ("keyset") pagination for order history.
+
+    Unlike page numbers, a cursor never makes the database count or skip rows: every page is
+    "WHERE created_at < <last seen> ORDER BY created_at DESC LIMIT n", which the
+    (user, created_at) index answers directly, however many orders the user has.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    # 'id' breaks ties between orders created in the same instant
+    ordering = ("-created_at", "-id")
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from .models import Address, OrderItem, Order
-from products.models import Product
 from django.db import transaction
+from .services import OrderService
 
 
 class AddressSerializer(serializers.ModelSerializer):
@@ -19,15 +19,6 @@ class AddressSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "user"]
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
-    # This is for displaying the order details
-    product_name = serializers.ReadOnlyField(source="product.name")
-
-    class Meta:
-        model = OrderItem
-        fields = ["id", "product", "product_name", "price", "quantity"]
-
-
 class OrderListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
@@ -41,22 +32,33 @@ class OrderListSerializer(serializers.ModelSerializer):
 
 
 class OrderDetailSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True)
-    address = AddressSerializer()
+    """
+    Serves the order detail from its frozen snapshot (see Order.snapshot): address, items
+    and totals come from the JSON document, only the fields that may change after the order
+    was placed (status) are read from the row. No joins involved.
+    The response has the same shape as when it was built from the rows: "address" with the
+    AddressSerializer fields, items with their ids (plus each line's total).
+    """
 
     class Meta:
         model = Order
         fields = [
             "id",
-            "address",
-            "recipient_name",
-            "total_paid",
+            "order_key",
             "status",
-            "items",
             "created_at",
         ]
         read_only_fields = fields
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        snapshot = instance.snapshot or {}
+        data["address"] = snapshot.get("address")
+        data["recipient_name"] = snapshot.get("recipient_name")
+        data["total_paid"] = snapshot.get("total_paid")
+        data["items"] = snapshot.get("items", [])
+        return data
+
 
 class OrderWriteSerializer(serializers.ModelSerializer):
     order_items = serializers.ListField(
@@ -82,44 +84,8 @@ class OrderWriteSerializer(serializers.ModelSerializer):
         user = validated_data.pop("user")
         address = validated_data["address"]
 
-        total_price = 0
-        order_items_to_create = []
-
-        for item in items_data:
-            product_id = item.get("product")
-            quantity = item.get("quantity")
-
-            if not product_id or quantity is None:
-                raise serializers.ValidationError(
-                    {"order_items": "Each item must include 'product' and 'quantity'."}
-                )
-
-            if int(quantity) <= 0:
-                raise serializers.ValidationError(
-                    {"order_items": f"Quantity must be >= 1 for product {product_id}."}
-                )
-
-            try:
-                product = Product.objects.get(id=product_id)
-            except Product.DoesNotExist:
-                raise serializers.ValidationError(
-                    {"order_items": f"Product with ID {product_id} does not exist."}
-                )
-
-            # Soft check (UX). Real check happens at reservation time in payments.
-            if product.quantity_available < quantity:
-                raise serializers.ValidationError(
-                    {
-                        "order_items": f"Not enough stock for '{product.name}'. "
-                        f"Available={product.quantity_available}, requested={quantity}."
-                    }
-                )
-
-            current_price = product.price
-            total_price += current_price * quantity
-            order_items_to_create.append(
-                {"product": product, "price": current_price, "quantity": quantity}
-            )
+        # One query for all products, duplicate lines merged, all line errors reported at once
+        order_lines, total_price = OrderService.prepare_lines(items_data)
 
         # Snapshot address
         validated_data["shipping_address_line1"] = address.address_line_1
@@ -130,11 +96,29 @@ class OrderWriteSerializer(serializers.ModelSerializer):
             order = Order.objects.create(
                 user=user, total_paid=total_price, **validated_data
             )
-            OrderItem.objects.bulk_create(
-                [
-                    OrderItem(order=order, **item_info)
-                    for item_info in order_items_to_create
-                ]
+            items = OrderItem.objects.bulk_create(
+                [OrderItem(order=order, **line) for line in order_lines]
             )
+            # Frozen copy of the order as placed, served by the detail view. Written once the
+            # items are inserted, as it holds their ids.
+            order.snapshot = OrderService.build_snapshot(order, address, items)
+            order.save(update_fields=["snapshot"])
 
         return order
+
+
+class OrderBulkCreateSerializer(serializers.Serializer):
+    """
+    Input of the bulk order endpoint. Each entry of 'orders' has the same shape as the body of
+    POST /api/orders/ (address, recipient_name, order_items).
+    """
+
+    MODE_CHOICES = (
+        ("atomic", "Create all orders or none of them"),
+        ("partial", "Create the valid orders, report the invalid ones"),
+    )
+
+    orders = serializers.ListField(
+        child=serializers.DictField(), min_length=1, max_length=1000
+    )
+    mode = serializers.ChoiceField(choices=MODE_CHOICES, default="atomic")
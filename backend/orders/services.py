@@ -0,0 +1,309 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from products.models import Product
+from .models import Address, Order, OrderItem
+
+
+class OrderService:
+    # Only the columns order creation needs; skips description, images, timestamps, ...
+    PRODUCT_FIELDS = ("id", "name", "price", "quantity_available", "is_active")
+
+    @staticmethod
+    def fetch_products(product_ids):
+        """Loads all the given products with one query, as {id: Product}."""
+        return Product.objects.only(*OrderService.PRODUCT_FIELDS).in_bulk(
+            set(product_ids)
+        )
+
+    @staticmethod
+    def merge_lines(items_data):
+        """
+        Normalizes the raw 'order_items' payload into {product_id: total quantity}.
+
+        Lines for the same product are merged, so the stock check below sees the real
+        requested quantity. Returns (merged_lines, errors); errors is a list of messages,
+        one per invalid line.
+        """
+        merged = {}
+        errors = []
+
+        # The payload is client JSON: anything may be here (a string, a dict, a list of ints)
+        if not isinstance(items_data, list):
+            return merged, [
+                "'order_items' must be a list of {product, quantity} objects."
+            ]
+
+        for item in items_data:
+            if not isinstance(item, dict):
+                errors.append(
+                    "Each item must be an object with 'product' and 'quantity'."
+                )
+                continue
+
+            product_id = item.get("product")
+            quantity = item.get("quantity")
+
+            if not product_id or quantity is None:
+                errors.append("Each item must include 'product' and 'quantity'.")
+                continue
+
+            try:
+                product_id = int(product_id)
+                quantity = int(quantity)
+            except (TypeError, ValueError):
+                errors.append(
+                    f"'product' and 'quantity' must be integers (got product={product_id}, quantity={quantity})."
+                )
+                continue
+
+            if quantity <= 0:
+                errors.append(f"Quantity must be >= 1 for product {product_id}.")
+                continue
+
+            merged[product_id] = merged.get(product_id, 0) + quantity
+
+        return merged, errors
+
+    @staticmethod
+    def prepare_lines(items_data, products_by_id=None):
+        """
+        Validates the order lines and prices them with the current product prices.
+
+        products_by_id may be passed in when the caller has already loaded the products
+        (e.g. for many orders at once); otherwise they are fetched with a single query.
+        All problems across all lines are collected and raised together as one ValidationError.
+
+        Returns (lines, total_price) where lines is a list of
+        {"product": Product, "price": Decimal, "quantity": int}.
+        """
+        if not items_data:
+            raise serializers.ValidationError(
+                {"order_items": ["An order must contain at least one item."]}
+            )
+
+        merged, errors = OrderService.merge_lines(items_data)
+        if products_by_id is None:
+            products_by_id = OrderService.fetch_products(merged)
+
+        lines = []
+        total_price = 0
+        for product_id, quantity in merged.items():
+            product = products_by_id.get(product_id)
+            if product is None:
+                errors.append(f"Product with ID {product_id} does not exist.")
+                continue
+
+            if not product.is_active:
+                errors.append(f"'{product.name}' is no longer available.")
+                continue
+
+            # Soft check (UX). Real check happens at reservation time in payments.
+            if product.quantity_available < quantity:
+                errors.append(
+                    f"Not enough stock for '{product.name}'. "
+                    f"Available={product.quantity_available}, requested={quantity}."
+                )
+                continue
+
+            total_price += product.price * quantity
+            lines.append(
+                {"product": product, "price": product.price, "quantity": quantity}
+            )
+
+        if errors:
+            raise serializers.ValidationError({"order_items": errors})
+
+        return lines, total_price
+
+    # Bumped whenever the shape of Order.snapshot changes: older snapshots are rebuilt from
+    # the rows when served, and rewritten by backfill_order_snapshots
+    SNAPSHOT_VERSION = 2
+
+    @staticmethod
+    def build_snapshot(order, address, items):
+        """
+        The frozen document stored in Order.snapshot. It has the shape of the order detail
+        response (see OrderDetailSerializer):
+        {
+            "version": int,
+            "recipient_name": str,
+            "address": {AddressSerializer fields},
+            "items": [{"id", "product", "product_name", "price", "quantity", "line_total"}],
+            "total_paid": str,
+        }
+        items are saved OrderItems (their ids are part of the document) with their product.
+        The address fields copied on the order at creation (shipping_*) win over the Address
+        row, which may have been edited since.
+        Money is stored as strings to keep the exact decimal value.
+        """
+        return {
+            "version": OrderService.SNAPSHOT_VERSION,
+            "recipient_name": order.recipient_name,
+            "address": {
+                "id": address.id,
+                "user": address.user_id,
+                "city": order.shipping_city or address.city,
+                "address_line_1": order.shipping_address_line1
+                or address.address_line_1,
+                "address_line_2": address.address_line_2,
+                "postal_code": order.shipping_postal_code or address.postal_code,
+                "is_default": address.is_default,
+            },
+            "items": [
+                {
+                    "id": item.id,
+                    "product": item.product_id,
+                    "product_name": item.product.name,
+                    "price": str(item.price),
+                    "quantity": item.quantity,
+                    "line_total": str(item.price * item.quantity),
+                }
+                for item in items
+            ],
+            "total_paid": str(order.total_paid),
+        }
+
+    @staticmethod
+    def has_current_snapshot(order):
+        return (order.snapshot or {}).get("version") == OrderService.SNAPSHOT_VERSION
+
+    @staticmethod
+    def snapshots_from_db(orders):
+        """
+        Rebuilds the snapshot of existing orders (created before snapshots existed, or with
+        an older version of it) from their rows. This is the order detail's former prefetch
+        plan, for any number of orders: 2 queries, the orders JOIN their address and all of
+        their items JOIN product, reading only the product name.
+        Returns {order_id: snapshot}.
+        """
+        items = OrderItem.objects.select_related("product").only(
+            "id", "order_id", "product_id", "price", "quantity", "product__name"
+        )
+        orders = (
+            Order.objects.filter(id__in=[order.id for order in orders])
+            .select_related("address")
+            .prefetch_related(Prefetch("items", queryset=items))
+        )
+        return {
+            order.id: OrderService.build_snapshot(
+                order, order.address, order.items.all()
+            )
+            for order in orders
+        }
+
+    @staticmethod
+    def bulk_create_orders(user, orders_data, atomic=True, batch_size=500):
+        """
+        Validates and creates many orders for one user (B2B bulk submission).
+
+        - products for ALL orders are loaded with one query, addresses with another
+        - every order is validated independently and gets its own result entry
+        - valid orders are inserted with bulk_create(), Orders and OrderItems in chunks of
+          batch_size, inside one transaction
+        - atomic=True: if any order is invalid, nothing is created
+          atomic=False: valid orders are created, invalid ones are reported and skipped
+
+        Returns a list of results in the same order as orders_data:
+        {"index", "status": "created", "id", "order_key", "total_paid"},
+        {"index", "status": "rejected", "errors"} or, for valid orders that were held back
+        because another order in an atomic batch was rejected, {"index", "status": "not_created"}.
+        """
+        # 1) Prefetch everything the validation needs
+        product_ids = set()
+        address_ids = []
+        for order_data in orders_data:
+            merged, _ = OrderService.merge_lines(order_data.get("order_items") or [])
+            product_ids.update(merged)
+            try:
+                address_ids.append(int(order_data.get("address")))
+            except (TypeError, ValueError):
+                address_ids.append(None)
+
+        products_by_id = OrderService.fetch_products(product_ids)
+        addresses_by_id = Address.objects.filter(user=user).in_bulk(
+            {address_id for address_id in address_ids if address_id is not None}
+        )
+
+        # 2) Validate every order against the prefetched data
+        results = []
+        valid = []  # (result, Order, lines)
+        for index, order_data in enumerate(orders_data):
+            errors = {}
+
+            address = addresses_by_id.get(address_ids[index])
+            if address is None:
+                errors["address"] = ["Address does not exist or doesn't belong to you."]
+
+            recipient_name = order_data.get("recipient_name")
+            if not recipient_name or len(str(recipient_name)) > 150:
+                errors["recipient_name"] = [
+                    "A recipient name (max 150 chars) is required."
+                ]
+
+            lines, total_price = [], 0
+            try:
+                lines, total_price = OrderService.prepare_lines(
+                    order_data.get("order_items") or [], products_by_id
+                )
+            except serializers.ValidationError as e:
+                errors.update(e.detail)
+
+            if errors:
+                results.append({"index": index, "status": "rejected", "errors": errors})
+                continue
+
+            order = Order(
+                user=user,
+                address=address,
+                recipient_name=recipient_name,
+                total_paid=total_price,
+                # Snapshot address
+                shipping_address_line1=address.address_line_1,
+                shipping_city=address.city,
+                shipping_postal_code=address.postal_code,
+            )
+            result = {"index": index, "status": "created"}
+            results.append(result)
+            valid.append((result, order, lines))
+
+        if not valid or (atomic and len(valid) != len(orders_data)):
+            for result, _, _ in valid:
+                result["status"] = "not_created"
+            return results
+
+        # 3) Insert all valid orders, then all of their items, then write the snapshots
+        #    (they hold the item ids)
+        with transaction.atomic():
+            orders = Order.objects.bulk_create(
+                [order for _, order, _ in valid], batch_size=batch_size
+            )
+            items = OrderItem.objects.bulk_create(
+                [
+                    OrderItem(order=order, **line)
+                    for order, (_, _, lines) in zip(orders, valid)
+                    for line in lines
+                ],
+                batch_size=batch_size,
+            )
+            items_by_order = defaultdict(list)
+            for item in items:
+                items_by_order[item.order_id].append(item)
+            for order in orders:
+                order.snapshot = OrderService.build_snapshot(
+                    order, order.address, items_by_order[order.id]
+                )
+            Order.objects.bulk_update(orders, ["snapshot"], batch_size=batch_size)
+
+        for result, order, _ in valid:
+            result.update(
+                {
+                    "id": order.id,
+                    "order_key": str(order.order_key),
+                    "total_paid": str(order.total_paid),
+                }
+            )
+        return results
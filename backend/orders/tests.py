@@ -1,15 +1,47 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
 from django.urls import reverse
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
 from products.models import Product
-from .models import Address, Order
+from .models import Address, Order, OrderItem
+from .serializers import AddressSerializer
+from .services import OrderService
 
 User = get_user_model()
 
 # URL Constants
 ADDRESS_LIST_CREATE_URL = reverse("address-list")
 ORDER_LIST_CREATE_URL = reverse("order-list-create")
+ORDER_BULK_CREATE_URL = reverse("order-bulk-create")
+
+
+class QueryCountAssertionsMixin:
+    """Reusable assertions that pin how many SQL queries an endpoint needs."""
+
+    def count_queries(self, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            func(*args, **kwargs)
+        return len(ctx.captured_queries)
+
+    def assertQueryCountIsFlat(self, scenario, sizes=(1, 10), expected=None):
+        """
+        Runs scenario(size) for every size and asserts that they all cost the same number of
+        queries (and exactly `expected` queries, if given), i.e. no N+1 on the size.
+        scenario(size) prepares its data and returns a callable that performs the measured call.
+        """
+        counts = {size: self.count_queries(scenario(size)) for size in sizes}
+        self.assertEqual(
+            len(set(counts.values())), 1, f"Query count grows with size: {counts}"
+        )
+        if expected is not None:
+            self.assertEqual(next(iter(counts.values())), expected, counts)
 
 
 def address_detail_url(address_id):
@@ -20,7 +52,7 @@ def order_detail_url(order_id):
     return reverse("order-detail", kwargs={"pk": order_id})
 
 
-class OrderIntegrationTests(APITestCase):
+class OrderIntegrationTests(QueryCountAssertionsMixin, APITestCase):
     def setUp(self):
         # Create two users for isolation testing using email as the identifier
         self.user = User.objects.create_user(
@@ -39,7 +71,7 @@ class OrderIntegrationTests(APITestCase):
 
         # Create test product with specific stock
         self.product = Product.objects.create(
-            name="Test Product", price=100.00, stock_quantity=10
+            name="Test Product", slug="test-product", price=100.00, quantity_on_hand=10
         )
 
         self.client.force_authenticate(user=self.user)
@@ -89,9 +121,9 @@ class OrderIntegrationTests(APITestCase):
         response = self.client.post(ORDER_LIST_CREATE_URL, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
-        # Check stock reduction
+        # Stock is only reserved at checkout, creating the order doesn't touch it
         self.product.refresh_from_db()
-        self.assertEqual(self.product.stock_quantity, 8)
+        self.assertEqual(self.product.quantity_available, 10)
 
         # Check address snapshotting
         order = Order.objects.get(id=response.data["id"])
@@ -99,7 +131,7 @@ class OrderIntegrationTests(APITestCase):
         self.assertEqual(order.total_paid, 200.00)
 
     def test_order_insufficient_stock(self):
-        """Test that order fails if requested quantity exceeds stock_quantity."""
+        """Test that order fails if requested quantity exceeds quantity_available."""
         address = Address.objects.create(user=self.user, city="Tehran")
         data = {
             "address": address.id,
@@ -109,7 +141,7 @@ class OrderIntegrationTests(APITestCase):
 
         response = self.client.post(ORDER_LIST_CREATE_URL, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn("left in stock", str(response.data))
+        self.assertIn("Not enough stock", str(response.data))
 
     def test_order_isolation_security(self):
         """Test that users cannot retrieve orders belonging to others."""
@@ -132,3 +164,387 @@ class OrderIntegrationTests(APITestCase):
         url = order_detail_url(order.id)
         response = self.client.patch(url, {"status": "paid"})
         self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_duplicate_lines_are_merged_for_stock_check(self):
+        """Two lines of 6 for a product with 10 available must fail the stock check."""
+        address = Address.objects.create(user=self.user, city="Tehran")
+        data = {
+            "address": address.id,
+            "recipient_name": "Dup",
+            "order_items": [
+                {"product": self.product.id, "quantity": 6},
+                {"product": self.product.id, "quantity": 6},
+            ],
+        }
+
+        response = self.client.post(ORDER_LIST_CREATE_URL, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("requested=12", str(response.data))
+
+        data["order_items"][1]["quantity"] = 3
+        response = self.client.post(ORDER_LIST_CREATE_URL, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(id=response.data["id"])
+        self.assertEqual(list(order.items.values_list("quantity", flat=True)), [9])
+
+    def test_all_line_errors_reported_together(self):
+        address = Address.objects.create(user=self.user, city="Tehran")
+        data = {
+            "address": address.id,
+            "recipient_name": "Errors",
+            "order_items": [
+                {"product": 999999, "quantity": 1},
+                {"product": self.product.id, "quantity": 0},
+                {"quantity": 1},
+            ],
+        }
+
+        response = self.client.post(ORDER_LIST_CREATE_URL, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data["order_items"]), 3)
+
+    def test_order_creation_query_count_is_flat(self):
+        """Benchmark: 1 line and 50 lines cost the same number of queries."""
+        address = Address.objects.create(user=self.user, city="Tehran")
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"Bulk {i}",
+                    slug=f"bulk-{i}",
+                    price=1,
+                    quantity_on_hand=5,
+                    quantity_available=5,
+                )
+                for i in range(50)
+            ]
+        )
+
+        def post_order(size):
+            data = {
+                "address": address.id,
+                "recipient_name": "B2B",
+                "order_items": [
+                    {"product": p.id, "quantity": 1} for p in products[:size]
+                ],
+            }
+            return lambda: self.client.post(ORDER_LIST_CREATE_URL, data, format="json")
+
+        self.assertQueryCountIsFlat(post_order, sizes=(1, 50))
+        self.assertEqual(Order.objects.filter(recipient_name="B2B").count(), 2)
+
+    def test_order_detail_query_count_is_pinned(self):
+        """Order detail is served from the snapshot: 1 query, no joins, for any size."""
+        address = Address.objects.create(
+            user=self.user, city="Tehran", address_line_1="Main St 1"
+        )
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"Item {i}",
+                    slug=f"item-{i}",
+                    price=1,
+                    quantity_on_hand=5,
+                    quantity_available=5,
+                )
+                for i in range(20)
+            ]
+        )
+
+        def get_detail(size):
+            data = {
+                "address": address.id,
+                "recipient_name": "Me",
+                "order_items": [
+                    {"product": p.id, "quantity": 1} for p in products[:size]
+                ],
+            }
+            order_id = self.client.post(
+                ORDER_LIST_CREATE_URL, data, format="json"
+            ).data["id"]
+            return lambda: self.client.get(order_detail_url(order_id))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertQueryCountIsFlat(get_detail, sizes=(1, 5, 20), expected=1)
+        self.assertNotIn("JOIN", ctx.captured_queries[-1]["sql"])
+
+    def test_order_detail_is_frozen_at_creation(self):
+        """Later changes to products and addresses don't alter a placed order."""
+        address = Address.objects.create(
+            user=self.user, city="Tehran", address_line_1="Main St 1"
+        )
+        data = {
+            "address": address.id,
+            "recipient_name": "Me",
+            "order_items": [{"product": self.product.id, "quantity": 2}],
+        }
+        order_id = self.client.post(ORDER_LIST_CREATE_URL, data, format="json").data[
+            "id"
+        ]
+
+        Product.objects.filter(id=self.product.id).update(name="Renamed", price=1)
+        Address.objects.filter(id=address.id).update(city="Shiraz")
+
+        response = self.client.get(order_detail_url(order_id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["items"][0]["product_name"], "Test Product")
+        self.assertEqual(response.data["items"][0]["price"], "100.00")
+        self.assertEqual(response.data["items"][0]["line_total"], "200.00")
+        self.assertEqual(response.data["address"]["city"], "Tehran")
+        self.assertEqual(response.data["address"]["id"], address.id)
+        self.assertEqual(response.data["total_paid"], "200.00")
+
+    def test_order_detail_keeps_its_response_shape(self):
+        """Same fields as when the detail was built from the rows (plus order_key/line_total)."""
+        address = Address.objects.create(user=self.user, city="Tehran")
+        data = {
+            "address": address.id,
+            "recipient_name": "Me",
+            "order_items": [{"product": self.product.id, "quantity": 1}],
+        }
+        order_id = self.client.post(ORDER_LIST_CREATE_URL, data, format="json").data[
+            "id"
+        ]
+
+        response = self.client.get(order_detail_url(order_id))
+        self.assertEqual(
+            set(response.data),
+            {
+                "id",
+                "order_key",
+                "address",
+                "recipient_name",
+                "total_paid",
+                "status",
+                "items",
+                "created_at",
+            },
+        )
+        self.assertEqual(
+            set(response.data["address"]), set(AddressSerializer.Meta.fields)
+        )
+        item = OrderItem.objects.get(order_id=order_id)
+        self.assertEqual(response.data["items"][0]["id"], item.id)
+        self.assertEqual(response.data["items"][0]["product"], self.product.id)
+        self.assertEqual(response.data["items"][0]["quantity"], 1)
+
+    def test_orders_without_snapshot_are_rebuilt_and_backfilled(self):
+        address = Address.objects.create(user=self.user, city="Tehran")
+        order = Order.objects.create(
+            user=self.user,
+            address=address,
+            total_paid=300,
+            recipient_name="Legacy",
+            shipping_city="Tehran",
+        )
+        item = OrderItem.objects.create(
+            order=order, product=self.product, price=100, quantity=3
+        )
+        # A snapshot written in the first format ("shipping_address", items without ids)
+        outdated = Order.objects.create(
+            user=self.user,
+            address=address,
+            total_paid=100,
+            recipient_name="Old format",
+            snapshot={"shipping_address": {"city": "Tehran"}, "items": []},
+        )
+        OrderItem.objects.create(
+            order=outdated, product=self.product, price=100, quantity=1
+        )
+
+        response = self.client.get(order_detail_url(order.id))
+        self.assertEqual(response.data["items"][0]["product_name"], "Test Product")
+        self.assertEqual(response.data["items"][0]["id"], item.id)
+        self.assertEqual(response.data["address"]["city"], "Tehran")
+        response = self.client.get(order_detail_url(outdated.id))
+        self.assertEqual(response.data["items"][0]["quantity"], 1)
+        self.assertEqual(response.data["address"]["id"], address.id)
+        order.refresh_from_db()
+        self.assertIsNone(order.snapshot)  # served, not saved
+
+        call_command("backfill_order_snapshots", stdout=StringIO())
+        order.refresh_from_db()
+        outdated.refresh_from_db()
+        self.assertEqual(order.snapshot["items"][0]["quantity"], 3)
+        self.assertEqual(order.snapshot["total_paid"], "300.00")
+        self.assertEqual(outdated.snapshot["version"], OrderService.SNAPSHOT_VERSION)
+        self.assertEqual(outdated.snapshot["items"][0]["quantity"], 1)
+
+    def test_order_detail_rebuild_query_count_is_pinned(self):
+        """
+        Orders without a snapshot are rebuilt with the prefetch plan: 3 queries (the order,
+        the order JOIN its address, its items JOIN product) whatever the number of items.
+        """
+        address = Address.objects.create(user=self.user, city="Tehran")
+        products = Product.objects.bulk_create(
+            [Product(name=f"Item {i}", slug=f"item-{i}", price=1) for i in range(20)]
+        )
+
+        def get_detail(size):
+            order = Order.objects.create(
+                user=self.user, address=address, total_paid=size, recipient_name="Me"
+            )
+            OrderItem.objects.bulk_create(
+                [OrderItem(order=order, product=p, price=1) for p in products[:size]]
+            )
+            return lambda: self.client.get(order_detail_url(order.id))
+
+        self.assertQueryCountIsFlat(get_detail, sizes=(1, 5, 20), expected=3)
+
+
+class BulkOrderTests(QueryCountAssertionsMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="wholesale@example.com", password="password123"
+        )
+        self.other_user = User.objects.create_user(
+            email="other@example.com", password="password123"
+        )
+        self.address = Address.objects.create(
+            user=self.user, city="Tehran", address_line_1="Depot 1", postal_code="111"
+        )
+        self.product = Product.objects.create(
+            name="Crate", slug="crate", price=20, quantity_on_hand=100
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def order_payload(self, quantity=1, address=None):
+        return {
+            "address": address or self.address.id,
+            "recipient_name": "Warehouse",
+            "order_items": [{"product": self.product.id, "quantity": quantity}],
+        }
+
+    def test_bulk_create_all_valid(self):
+        data = {"orders": [self.order_payload(q) for q in (1, 2, 3)]}
+
+        response = self.client.post(ORDER_BULK_CREATE_URL, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 3)
+        orders = Order.objects.filter(user=self.user).order_by("id")
+        self.assertEqual([o.total_paid for o in orders], [20, 40, 60])
+        self.assertEqual(orders[0].shipping_city, "Tehran")
+        self.assertEqual(
+            [r["id"] for r in response.data["results"]], [o.id for o in orders]
+        )
+
+    def test_bulk_create_atomic_mode_creates_nothing_on_error(self):
+        foreign_address = Address.objects.create(user=self.other_user, city="Other")
+        data = {
+            "orders": [
+                self.order_payload(),
+                self.order_payload(address=foreign_address.id),
+            ]
+        }
+
+        response = self.client.post(ORDER_BULK_CREATE_URL, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [r["status"] for r in response.data["results"]], ["not_created", "rejected"]
+        )
+        self.assertIn("address", response.data["results"][1]["errors"])
+        self.assertFalse(Order.objects.exists())
+
+    def test_bulk_create_partial_mode(self):
+        data = {
+            "mode": "partial",
+            "orders": [self.order_payload(), self.order_payload(quantity=1000)],
+        }
+
+        response = self.client.post(ORDER_BULK_CREATE_URL, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [r["status"] for r in response.data["results"]], ["created", "rejected"]
+        )
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_bulk_create_rejects_malformed_lines(self):
+        malformed = ["abc", [1, 2], {"product": 1}]
+        orders = [self.order_payload()]
+        for order_items in malformed:
+            orders.append({**self.order_payload(), "order_items": order_items})
+
+        response = self.client.post(
+            ORDER_BULK_CREATE_URL, {"mode": "partial", "orders": orders}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [r["status"] for r in response.data["results"]],
+            ["created", "rejected", "rejected", "rejected"],
+        )
+        for result in response.data["results"][1:]:
+            self.assertIn("order_items", result["errors"])
+
+    def test_bulk_create_query_count_is_flat(self):
+        def post_orders(count):
+            data = {"orders": [self.order_payload() for _ in range(count)]}
+            return lambda: self.client.post(ORDER_BULK_CREATE_URL, data, format="json")
+
+        self.assertQueryCountIsFlat(post_orders, sizes=(2, 40))
+        self.assertEqual(Order.objects.count(), 42)
+
+
+class OrderHistoryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="buyer@example.com", password="password123"
+        )
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="password123"
+        )
+        address = Address.objects.create(user=self.user, city="Tehran")
+        self.orders = [
+            Order.objects.create(
+                user=self.user,
+                address=address,
+                recipient_name="Me",
+                total_paid=i,
+                status="paid" if i % 2 else "pending",
+            )
+            for i in range(5)
+        ]
+        # Spread the orders over five days: orders[0] is the oldest
+        base = timezone.now() - timedelta(days=10)
+        for i, order in enumerate(self.orders):
+            Order.objects.filter(id=order.id).update(
+                created_at=base + timedelta(days=i)
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def test_history_is_cursor_paginated_newest_first(self):
+        response = self.client.get(ORDER_LIST_CREATE_URL, {"page_size": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first_page = [o["id"] for o in response.data["results"]]
+
+        response = self.client.get(response.data["next"])
+        second_page = [o["id"] for o in response.data["results"]]
+
+        self.assertEqual(
+            first_page + second_page, [o.id for o in reversed(self.orders)]
+        )
+        self.assertIsNone(response.data["next"])
+
+    def test_history_filters(self):
+        since = (timezone.now() - timedelta(days=8)).date().isoformat()
+        response = self.client.get(
+            ORDER_LIST_CREATE_URL, {"status": "paid", "created_after": since}
+        )
+        self.assertEqual(
+            [o["id"] for o in response.data["results"]], [self.orders[3].id]
+        )
+
+        response = self.client.get(ORDER_LIST_CREATE_URL, {"created_before": "soon"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_only_admins_can_view_other_users_history(self):
+        other = User.objects.create_user(email="nosy@example.com", password="pw")
+        self.client.force_authenticate(user=other)
+        response = self.client.get(ORDER_LIST_CREATE_URL, {"user": self.user.id})
+        self.assertEqual(response.data["results"], [])
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(ORDER_LIST_CREATE_URL, {"user": self.user.id})
+        self.assertEqual(len(response.data["results"]), 5)
@@ -1,6 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AddressViewSet, OrderListCreateView, OrderRetrieveView
+from .views import (
+    AddressViewSet,
+    OrderListCreateView,
+    OrderBulkCreateView,
+    OrderRetrieveView,
+)
 
 router = DefaultRouter()
 router.register(r"addresses", AddressViewSet, basename="address")
@@ -8,5 +13,6 @@ router.register(r"addresses", AddressViewSet, basename="address")
 urlpatterns = [
     path("", include(router.urls)),
     path("orders/", OrderListCreateView.as_view(), name="order-list-create"),
+    path("orders/bulk/", OrderBulkCreateView.as_view(), name="order-bulk-create"),
     path("orders/<int:pk>/", OrderRetrieveView.as_view(), name="order-detail"),
 ]
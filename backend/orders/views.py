@@ -1,11 +1,21 @@
-from rest_framework import generics, viewsets, permissions
-from .models import Address, Order
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import generics, viewsets, permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from idempotency.decorators import idempotent
+from .models import Address, Order, STATUS_CHOICES
+from .pagination import OrderHistoryCursorPagination
 from .serializers import (
     AddressSerializer,
     OrderListSerializer,
     OrderDetailSerializer,
     OrderWriteSerializer,
+    OrderBulkCreateSerializer,
 )
+from .services import OrderService
 
 
 class AddressViewSet(viewsets.ModelViewSet):
@@ -39,25 +49,133 @@ class AddressViewSet(viewsets.ModelViewSet):
 
 
 class OrderListCreateView(generics.ListCreateAPIView):
+    """
+    GET: the order history of the current user, newest first, cursor-paginated.
+    Optional filters (all served by the composite indexes on Order):
+    - ?status=paid
+    - ?created_after=2025-01-01 / ?created_before=2025-02-01T00:00:00Z (date or datetime)
+    - ?user=<id> (admins only): look at another user's order history
+    """
+
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderHistoryCursorPagination
 
     def get_queryset(self):
-        # Security: Users only see their own orders
-        return Order.objects.filter(user=self.request.user)
+        params = self.request.query_params
+
+        # Security: Users only see their own orders (admins may pick the user)
+        user_id = self.request.user.id
+        if self.request.user.is_staff and params.get("user"):
+            user_id = self.parse_param("user", int)
+        queryset = Order.objects.filter(user_id=user_id)
+
+        if self.request.method != "GET":
+            return queryset
+
+        order_status = params.get("status")
+        if order_status:
+            if order_status not in dict(STATUS_CHOICES):
+                raise ValidationError({"status": f"Unknown status '{order_status}'."})
+            queryset = queryset.filter(status=order_status)
+
+        if params.get("created_after"):
+            queryset = queryset.filter(
+                created_at__gte=self.parse_param("created_after", self.parse_moment)
+            )
+        if params.get("created_before"):
+            queryset = queryset.filter(
+                created_at__lt=self.parse_param("created_before", self.parse_moment)
+            )
+
+        return queryset
+
+    def parse_param(self, name, parse):
+        """Parses a query param, turning bad input into a 400 instead of a 500."""
+        try:
+            value = parse(self.request.query_params[name])
+        except (TypeError, ValueError):
+            value = None
+        if value is None:
+            raise ValidationError({name: "Invalid value."})
+        return value
+
+    @staticmethod
+    def parse_moment(value):
+        """Accepts a datetime ('2025-01-01T10:00:00Z') or a date ('2025-01-01', i.e. midnight)."""
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            moment = datetime.combine(day, time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
 
     def get_serializer_class(self):
         if self.request.method == "POST":
             return OrderWriteSerializer
         return OrderListSerializer
 
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        # A retried POST with the same Idempotency-Key returns the first order instead of
+        # creating a duplicate
+        return super().post(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         # Add the user during the save process
         serializer.save(user=self.request.user)
 
 
+class OrderBulkCreateView(generics.GenericAPIView):
+    """
+    POST /api/orders/bulk/: submit many orders in one request (B2B clients).
+
+    Response status: 201 if every order was created, 400 if none was,
+    207 (Multi-Status) if mode='partial' and only some of them were.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = OrderBulkCreateSerializer
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = OrderService.bulk_create_orders(
+            user=request.user,
+            orders_data=serializer.validated_data["orders"],
+            atomic=serializer.validated_data["mode"] == "atomic",
+        )
+
+        created = sum(1 for result in results if result["status"] == "created")
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created == 0:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+
+        return Response(
+            {"created": created, "results": results}, status=response_status
+        )
+
+
 class OrderRetrieveView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = OrderDetailSerializer
 
     def get_queryset(self):
+        # The detail is served from Order.snapshot: 1 query, no joins.
         return Order.objects.filter(user=self.request.user)
+
+    def get_object(self):
+        order = super().get_object()
+        if not OrderService.has_current_snapshot(order):
+            # Older order created before snapshots existed, or with an older version of it
+            # (not yet backfilled with backfill_order_snapshots): rebuild it from the rows
+            # for this response only.
+            order.snapshot = OrderService.snapshots_from_db([order])[order.id]
+        return order
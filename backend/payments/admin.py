@@ -1,3 +1,36 @@
 from django.contrib import admin
+from .models import (
+    Transaction,
+    TransactionPayload,
+    StockReservation,
+    ArchivedTransaction,
+    ArchivedStockReservation,
+)
 
 # Register your models here.
+
+admin.site.register(Transaction)
+admin.site.register(TransactionPayload)
+admin.site.register(StockReservation)
+
+
+class ArchiveAdmin(admin.ModelAdmin):
+    """Archived rows are history: searchable and viewable, but never edited."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(ArchiveAdmin):
+    list_display = ["id", "reference_id", "order_id", "amount", "status", "created_at"]
+    search_fields = ["reference_id", "=order_id"]
+
+
+@admin.register(ArchivedStockReservation)
+class ArchivedStockReservationAdmin(ArchiveAdmin):
+    list_display = ["id", "order_id", "product_id", "quantity", "status", "created_at"]
+    search_fields = ["stripe_session_id", "=order_id"]
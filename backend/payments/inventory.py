@@ -0,0 +1,176 @@
+import functools
+import random
+import time
+from collections import namedtuple
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+
+from products.models import Product
+from products.stock_cache import publish_stock
+from .models import StockReservation
+
+# SQLSTATE codes PostgreSQL uses when it aborts a transaction to resolve a lock conflict:
+# 40001 = serialization_failure, 40P01 = deadlock_detected
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+
+
+def lock_products(product_ids):
+    """
+    Lock the given Product rows (SELECT ... FOR UPDATE) and return them as a dict keyed by id.
+
+    Rows are always locked in primary-key order. Two transactions that lock overlapping sets of
+    products therefore acquire the locks in the same sequence, so one simply waits for the other
+    instead of both waiting on each other (deadlock).
+
+    Must be called inside transaction.atomic().
+    """
+    product_ids = sorted(set(product_ids))
+    products = (
+        Product.objects.select_for_update().filter(id__in=product_ids).order_by("id")
+    )
+    return {product.id: product for product in products}
+
+
+def is_retryable_db_error(exc):
+    """
+    Returns True if the database aborted the transaction because of a deadlock or a
+    serialization failure, i.e. running the same transaction again is expected to succeed.
+    """
+    if not isinstance(exc, OperationalError):
+        return False
+
+    cause = exc.__cause__
+    # psycopg 3 exposes the code as 'sqlstate', psycopg2 as 'pgcode'
+    sqlstate = getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)
+    if sqlstate in RETRYABLE_SQLSTATES:
+        return True
+
+    # SQLite has no row locks; a competing writer shows up as "database is locked"
+    return "database is locked" in str(exc)
+
+
+def retry_on_db_conflict(max_attempts=3, base_delay=0.05, max_delay=1.0):
+    """
+    Decorator that re-runs a transactional function when the database aborts it with a
+    deadlock / serialization failure.
+
+    The decorated function must open its own transaction.atomic() block: a retry only makes
+    sense once the aborted transaction has been rolled back completely. If it is called while an
+    outer atomic block is already open, the error is raised as-is so the outer caller can decide.
+
+    Between attempts we sleep with "full jitter" exponential backoff, so that the transactions
+    which collided don't all come back at the same moment and collide again.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            attempt = 1
+            while True:
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as exc:
+                    if (
+                        attempt >= max_attempts
+                        or connection.in_atomic_block
+                        or not is_retryable_db_error(exc)
+                    ):
+                        raise
+                    delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+                    time.sleep(random.uniform(0, delay))
+                    attempt += 1
+
+        return wrapper
+
+    return decorator
+
+
+# One product whose quantity_available doesn't match quantity_on_hand - ACTIVE reservations
+InventoryDrift = namedtuple(
+    "InventoryDrift", ["product_id", "quantity_on_hand", "actual", "expected"]
+)
+
+
+def reserved_quantities(product_ids=None):
+    """
+    Returns {product_id: total quantity held by ACTIVE reservations} using one grouped
+    aggregate query (served by the partial index on ACTIVE reservations).
+    Products without active reservations are simply missing from the dict.
+    """
+    reservations = StockReservation.objects.filter(
+        status=StockReservation.Status.ACTIVE
+    )
+    if product_ids is not None:
+        reservations = reservations.filter(product_id__in=product_ids)
+    return dict(
+        reservations.order_by()
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("product_id", "total")
+    )
+
+
+def find_inventory_drift(chunk_size=5000):
+    """
+    Yields an InventoryDrift for every product whose quantity_available has drifted away from
+    quantity_on_hand minus its ACTIVE reservations.
+
+    Reservations are aggregated once; products are streamed in primary-key chunks (keyset
+    pagination), so memory stays flat however large the catalog is.
+    Nothing is locked here, so a product that is mid-checkout may show up as a false positive;
+    fix_inventory_drift() re-checks every product under lock before changing it.
+    """
+    reserved = reserved_quantities()
+
+    last_id = 0
+    while True:
+        chunk = list(
+            Product.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "quantity_on_hand", "quantity_available")[:chunk_size]
+        )
+        if not chunk:
+            return
+
+        for product_id, on_hand, available in chunk:
+            expected = on_hand - reserved.get(product_id, 0)
+            if available != expected:
+                yield InventoryDrift(product_id, on_hand, available, expected)
+
+        last_id = chunk[-1][0]
+
+
+def fix_inventory_drift(product_ids, chunk_size=500):
+    """
+    Resets quantity_available = quantity_on_hand - ACTIVE reservations for the given products.
+
+    Each chunk is its own short transaction: the products are locked (in id order, like every
+    other inventory write), their reservations are re-aggregated under that lock and the new
+    values are written with one bulk_update(). Expected values below zero (more reserved than
+    physically on hand) are clamped to 0.
+    Returns the number of products that were actually changed.
+    """
+    product_ids = sorted(set(product_ids))
+    fixed = 0
+
+    for start in range(0, len(product_ids), chunk_size):
+        chunk_ids = product_ids[start : start + chunk_size]
+        with transaction.atomic():
+            products = lock_products(chunk_ids)
+            reserved = reserved_quantities(chunk_ids)
+
+            changed = []
+            for product in products.values():
+                expected = max(
+                    product.quantity_on_hand - reserved.get(product.id, 0), 0
+                )
+                if product.quantity_available != expected:
+                    product.quantity_available = expected
+                    changed.append(product)
+
+            Product.objects.bulk_update(changed, ["quantity_available"])
+            publish_stock(changed)
+            fixed += len(changed)
+
+    return fixed
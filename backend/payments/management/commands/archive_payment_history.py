@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payments.retention import (
+    archivable_stock_reservations,
+    archivable_transactions,
+    archive_stock_reservations,
+    archive_transactions,
+    retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves finished StockReservation and Transaction rows older than the retention "
+        "window into their archive tables, in small resumable batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.PAYMENTS_RETENTION_DAYS,
+            help="Archive rows older than this many days "
+            "(default: settings.PAYMENTS_RETENTION_DAYS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows moved per transaction (default: 1000).",
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=None,
+            help="Stop after this many batches per table; run again to continue.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between batches.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows that would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options["days"])
+        self.stdout.write(f"Archiving rows created before {cutoff:%Y-%m-%d %H:%M}.")
+
+        if options["dry_run"]:
+            reservations = archivable_stock_reservations(cutoff).count()
+            transactions = archivable_transactions(cutoff).count()
+            self.stdout.write(
+                f"Would archive {reservations} reservation(s) "
+                f"and {transactions} transaction(s)."
+            )
+            return
+
+        batch_options = {
+            "batch_size": options["batch_size"],
+            "max_batches": options["max_batches"],
+            "pause": options["pause"],
+        }
+        reservations = archive_stock_reservations(cutoff, **batch_options)
+        transactions = archive_transactions(cutoff, **batch_options)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {reservations} reservation(s) and {transactions} transaction(s)."
+            )
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from payments.inventory import find_inventory_drift, fix_inventory_drift
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks that every Product.quantity_available equals quantity_on_hand minus its "
+        "ACTIVE stock reservations. Reports the drift, and repairs it with --fix."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Write the expected quantity_available back to the drifted products.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Number of products read per query (default: 5000).",
+        )
+
+    def handle(self, *args, **options):
+        drifted_ids = []
+        for drift in find_inventory_drift(chunk_size=options["chunk_size"]):
+            drifted_ids.append(drift.product_id)
+            self.stdout.write(
+                f"product {drift.product_id}: quantity_available={drift.actual}, "
+                f"expected={drift.expected} (on hand={drift.quantity_on_hand})"
+            )
+
+        if not drifted_ids:
+            self.stdout.write(self.style.SUCCESS("No inventory drift found."))
+            return
+
+        self.stdout.write(f"{len(drifted_ids)} product(s) drifted.")
+        if options["fix"]:
+            fixed = fix_inventory_drift(drifted_ids)
+            self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} product(s)."))
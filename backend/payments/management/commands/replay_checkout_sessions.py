@@ -0,0 +1,60 @@
+from collections import Counter
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payments.services import PaymentService
+
+stripe.api_key = settings.STRIPE_SECRET_KEY
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays 'checkout.session.completed' events from Stripe through the batch "
+        "fulfillment path. Safe to run repeatedly: already paid orders are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=24,
+            help="How far back to fetch events from Stripe (default: 24).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of sessions fulfilled per database transaction (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options["hours"])
+        events = stripe.Event.list(
+            type="checkout.session.completed",
+            created={"gte": int(since.timestamp())},
+            limit=100,
+        )
+
+        totals = Counter()
+        batch = []
+        for event in events.auto_paging_iter():
+            batch.append(event["data"]["object"])
+            if len(batch) >= options["batch_size"]:
+                totals.update(self._fulfill(batch, options["batch_size"]))
+                batch = []
+        if batch:
+            totals.update(self._fulfill(batch, options["batch_size"]))
+
+        for outcome, count in sorted(totals.items()):
+            self.stdout.write(f"{outcome}: {count}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Replayed {sum(totals.values())} sessions.")
+        )
+
+    def _fulfill(self, sessions, batch_size):
+        results = PaymentService.fulfill_orders_batch(sessions, batch_size=batch_size)
+        return Counter(results.values())
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-19 01:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('payments', '0006_stockreservation'),
+        ('products', '0004_remove_product_stock_quantity_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockreservation',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['product', 'quantity'], name='stockres_active_product_idx'),
+        ),
+    ]
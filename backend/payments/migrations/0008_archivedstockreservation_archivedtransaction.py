@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-19 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_stockreservation_stockres_active_product_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedStockReservation',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('order_id', models.BigIntegerField(db_index=True)),
+                ('product_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('stripe_session_id', models.CharField(blank=True, db_index=True, max_length=255, null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('consumed', 'Consumed'), ('released', 'Released')])),
+                ('created_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('order_id', models.BigIntegerField(db_index=True)),
+                ('reference_id', models.CharField(max_length=100, unique=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed')], max_length=10)),
+                ('raw_response', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 6.0 on 2026-10-19 01:35
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+
+
+def compress(response):
+    return zlib.compress(json.dumps(response, cls=DjangoJSONEncoder).encode())
+
+
+def move_raw_responses(apps, schema_editor):
+    """Copy every existing raw_response into its compressed side-table/column form."""
+    Transaction = apps.get_model("payments", "Transaction")
+    TransactionPayload = apps.get_model("payments", "TransactionPayload")
+    ArchivedTransaction = apps.get_model("payments", "ArchivedTransaction")
+
+    transactions = Transaction.objects.exclude(raw_response=None).values_list(
+        "id", "raw_response"
+    )
+    TransactionPayload.objects.bulk_create(
+        (
+            TransactionPayload(transaction_id=txn_id, data=compress(response))
+            for txn_id, response in transactions.iterator(chunk_size=1000)
+        ),
+        batch_size=1000,
+    )
+
+    archived = ArchivedTransaction.objects.exclude(raw_response=None)
+    for row in archived.iterator(chunk_size=1000):
+        row.payload = compress(row.raw_response)
+        row.save(update_fields=["payload"])
+
+
+def restore_raw_responses(apps, schema_editor):
+    Transaction = apps.get_model("payments", "Transaction")
+    TransactionPayload = apps.get_model("payments", "TransactionPayload")
+    ArchivedTransaction = apps.get_model("payments", "ArchivedTransaction")
+
+    for payload in TransactionPayload.objects.iterator(chunk_size=1000):
+        Transaction.objects.filter(id=payload.transaction_id).update(
+            raw_response=json.loads(zlib.decompress(bytes(payload.data)))
+        )
+    for row in ArchivedTransaction.objects.exclude(payload=None).iterator(
+        chunk_size=1000
+    ):
+        row.raw_response = json.loads(zlib.decompress(bytes(row.payload)))
+        row.save(update_fields=["raw_response"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_archivedstockreservation_archivedtransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionPayload',
+            fields=[
+                ('transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='payments.transaction')),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='payload',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(move_raw_responses, restore_raw_responses),
+        migrations.RemoveField(
+            model_name='archivedtransaction',
+            name='raw_response',
+        ),
+        migrations.RemoveField(
+            model_name='transaction',
+            name='raw_response',
+        ),
+    ]
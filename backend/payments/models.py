@@ -1,9 +1,30 @@
+import json
+import zlib
+
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from orders.models import Order
 from django.conf import settings
 from products.models import Product
 
 
+def pack_raw_response(response):
+    """
+    Trims a gateway response down to settings.PAYMENTS_RAW_RESPONSE_FIELDS (top-level keys)
+    and returns it as zlib-compressed JSON bytes.
+    """
+    allowed = settings.PAYMENTS_RAW_RESPONSE_FIELDS
+    trimmed = {key: response[key] for key in allowed if key in response}
+    return zlib.compress(json.dumps(trimmed, cls=DjangoJSONEncoder).encode())
+
+
+def unpack_raw_response(data):
+    """Reverse of pack_raw_response()."""
+    if data is None:
+        return None
+    return json.loads(zlib.decompress(bytes(data)))
+
+
 class Transaction(models.Model):
     STATUS_CHOICES = (
         ("pending", "Pending"),
@@ -21,13 +42,58 @@ class Transaction(models.Model):
     )
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
-    # Store the raw response from the gateway for debugging
-    raw_response = models.JSONField(blank=True, null=True)
+    # The raw response from the gateway (for debugging) lives in TransactionPayload, so listing
+    # transactions never reads those blobs
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Transaction {self.reference_id} - {self.status}"
 
+    @property
+    def raw_response(self):
+        """The stored gateway response, loaded (one query) only when accessed."""
+        try:
+            return self.payload.response
+        except TransactionPayload.DoesNotExist:
+            return None
+
+
+class TransactionPayload(models.Model):
+    """
+    Side table holding the (trimmed, compressed) raw gateway response of a Transaction.
+    """
+
+    transaction = models.OneToOneField(
+        Transaction,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="payload",
+    )
+    data = models.BinaryField()
+
+    def __str__(self):
+        return f"Payload of transaction {self.transaction_id}"
+
+    @property
+    def response(self):
+        return unpack_raw_response(self.data)
+
+    @classmethod
+    def store(cls, transactions_and_responses):
+        """
+        Saves the gateway response of many transactions at once (one INSERT ... ON CONFLICT),
+        e.g. store([(txn, session)]). Existing payloads are overwritten.
+        """
+        cls.objects.bulk_create(
+            [
+                cls(transaction=txn, data=pack_raw_response(response))
+                for txn, response in transactions_and_responses
+            ],
+            update_conflicts=True,
+            unique_fields=["transaction"],
+            update_fields=["data"],
+        )
+
 
 class StockReservation(models.Model):
     """
@@ -79,7 +145,71 @@ class StockReservation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            # Partial index over ACTIVE rows only: it stays small while CONSUMED/RELEASED history
+            # grows, and (product, quantity) lets "SUM(quantity) GROUP BY product" (used by
+            # reconcile_inventory) be answered from the index alone.
+            models.Index(
+                fields=["product", "quantity"],
+                condition=models.Q(status="active"),
+                name="stockres_active_product_idx",
+            ),
+        ]
+
     def __str__(self):
         sid = (self.stripe_session_id or "")[:10]
         sid_display = f"{sid}..." if sid else "no-session"
         return f"{self.quantity}× {self.product_id} for Order {self.order_id} ({self.status}, {sid_display})"
+
+
+# ----------------------------------------------------------------------------
+# ARCHIVE MODELS
+# ----------------------------------------------------------------------------
+# Old, finished rows are moved here by the archive_payment_history command so that the hot
+# tables (and their indexes) only hold recent data. Archived rows keep their original primary
+# key, and related objects are stored as plain ids (no foreign keys), so archiving never blocks
+# or cascades into deletes elsewhere.
+
+
+class ArchivedStockReservation(models.Model):
+    """A CONSUMED or RELEASED StockReservation past the retention window."""
+
+    id = models.BigIntegerField(primary_key=True)
+    order_id = models.BigIntegerField(db_index=True)
+    product_id = models.BigIntegerField()
+    user_id = models.BigIntegerField()
+    quantity = models.PositiveIntegerField()
+    stripe_session_id = models.CharField(
+        max_length=255, blank=True, null=True, db_index=True
+    )
+    status = models.CharField(choices=StockReservation.Status.choices)
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return (
+            f"Archived reservation {self.id} for Order {self.order_id} ({self.status})"
+        )
+
+
+class ArchivedTransaction(models.Model):
+    """A completed or failed Transaction (including its raw gateway response) past the retention window."""
+
+    id = models.BigIntegerField(primary_key=True)
+    order_id = models.BigIntegerField(db_index=True)
+    reference_id = models.CharField(max_length=100, unique=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=10, choices=Transaction.STATUS_CHOICES)
+    # Compressed copy of TransactionPayload.data
+    payload = models.BinaryField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived transaction {self.reference_id} - {self.status}"
+
+    @property
+    def raw_response(self):
+        return unpack_raw_response(self.payload)
@@ -0,0 +1,121 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    ArchivedStockReservation,
+    ArchivedTransaction,
+    StockReservation,
+    Transaction,
+    TransactionPayload,
+)
+
+
+def retention_cutoff(days=None):
+    """Rows created before this moment are old enough to be archived."""
+    if days is None:
+        days = settings.PAYMENTS_RETENTION_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def _archive_in_batches(queryset, to_archive, batch_size, max_batches, pause):
+    """
+    Moves the rows of queryset into their archive table, batch_size rows per transaction.
+    to_archive(rows) builds the (unsaved) archive instances for one batch.
+
+    Every batch locks only the rows it moves (skipping rows another transaction holds), copies
+    them with one bulk_create() and deletes them with one DELETE, then commits. Batches are
+    independent, so the job can be stopped at any moment and simply run again later; rows
+    that were already copied are skipped thanks to ignore_conflicts on the shared primary key.
+    Returns the number of rows moved.
+    """
+    model = queryset.model
+    moved = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update(skip_locked=True).order_by("id")[:batch_size]
+            )
+            if not rows:
+                break
+
+            archived = to_archive(rows)
+            type(archived[0]).objects.bulk_create(archived, ignore_conflicts=True)
+            model.objects.filter(id__in=[row.id for row in rows]).delete()
+
+        moved += len(rows)
+        batches += 1
+        if pause:
+            # Give the database (and replicas) some room between batches
+            time.sleep(pause)
+
+    return moved
+
+
+def _archive_fields(row):
+    """The concrete column values of a model instance, e.g. order_id instead of order."""
+    return {
+        field.attname: getattr(row, field.attname)
+        for field in row._meta.concrete_fields
+    }
+
+
+def _archived_stock_reservations(rows):
+    return [ArchivedStockReservation(**_archive_fields(row)) for row in rows]
+
+
+def _archived_transactions(rows):
+    # The compressed payload is copied as-is; the TransactionPayload rows go away with their
+    # transactions (on_delete=CASCADE)
+    payloads = dict(
+        TransactionPayload.objects.filter(
+            transaction_id__in=[row.id for row in rows]
+        ).values_list("transaction_id", "data")
+    )
+    return [
+        ArchivedTransaction(**_archive_fields(row), payload=payloads.get(row.id))
+        for row in rows
+    ]
+
+
+def archivable_stock_reservations(cutoff):
+    """CONSUMED / RELEASED reservations created before cutoff."""
+    return StockReservation.objects.filter(
+        status__in=[
+            StockReservation.Status.CONSUMED,
+            StockReservation.Status.RELEASED,
+        ],
+        created_at__lt=cutoff,
+    )
+
+
+def archivable_transactions(cutoff):
+    """Completed / failed transactions created before cutoff. Pending ones are never archived."""
+    return Transaction.objects.filter(
+        status__in=["completed", "failed"], created_at__lt=cutoff
+    )
+
+
+def archive_stock_reservations(cutoff, batch_size=1000, max_batches=None, pause=0):
+    return _archive_in_batches(
+        archivable_stock_reservations(cutoff),
+        _archived_stock_reservations,
+        batch_size,
+        max_batches,
+        pause,
+    )
+
+
+def archive_transactions(cutoff, batch_size=1000, max_batches=None, pause=0):
+    return _archive_in_batches(
+        archivable_transactions(cutoff),
+        _archived_transactions,
+        batch_size,
+        max_batches,
+        pause,
+    )
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Transaction
+from .models import Transaction, ArchivedTransaction
 
 
 class TransactionListSerializer(serializers.ModelSerializer):
@@ -15,6 +15,9 @@ class TransactionListSerializer(serializers.ModelSerializer):
 
 
 class TransactionDetailSerializer(serializers.ModelSerializer):
+    # Loaded lazily from the TransactionPayload side table (detail view only)
+    raw_response = serializers.JSONField(read_only=True)
+
     class Meta:
         model = Transaction
         fields = [
@@ -24,5 +27,26 @@ class TransactionDetailSerializer(serializers.ModelSerializer):
             "amount",
             "status",
             "created_at",
+            "raw_response",
+        ]
+        read_only_fields = fields
+
+
+class ArchivedTransactionSerializer(serializers.ModelSerializer):
+    # Same shape as TransactionDetailSerializer, so clients don't care where the row lives
+    order = serializers.IntegerField(source="order_id")
+    raw_response = serializers.JSONField(read_only=True)
+
+    class Meta:
+        model = ArchivedTransaction
+        fields = [
+            "id",
+            "order",
+            "reference_id",
+            "amount",
+            "status",
+            "created_at",
+            "raw_response",
+            "archived_at",
         ]
         read_only_fields = fields
@@ -1,15 +1,20 @@
 import stripe
+from collections import defaultdict
 from datetime import timedelta
 
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
 
 # from django.db.models import Sum
 from django.utils import timezone
 
-from .models import Transaction, StockReservation
+from .models import Transaction, TransactionPayload, StockReservation
+from .inventory import lock_products, retry_on_db_conflict
 from orders.models import Order
 from products.models import Product
+from products.stock_cache import publish_stock
+from analytics.rollups import record_paid_orders
 
 # Initialize stripe with your secret key from settings.py
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -21,6 +26,18 @@ class OutOfStockError(Exception):
     pass
 
 
+class FulfillmentOutcome:
+    """Per-session results reported by PaymentService.fulfill_orders_batch()."""
+
+    FULFILLED = "fulfilled"
+    ALREADY_PAID = "already_paid"
+    NOT_PAID = "not_paid"
+    ORDER_NOT_FOUND = "order_not_found"
+    NO_RESERVATIONS = "no_reservations"
+    TRANSACTION_NOT_FOUND = "transaction_not_found"
+    OUT_OF_STOCK = "out_of_stock"
+
+
 class PaymentService:
     @staticmethod
     def _check_stock_and_reserve(order, user, expires_at):
@@ -39,10 +56,9 @@ class PaymentService:
 
         # Lock all involved products to prevent overselling under concurrency
         # You may ask why we didn't use the item.product to access the product in each order item. The reason is we needed to lock them all
+        # lock_products() locks them in id order, so concurrent multi-item checkouts can't deadlock each other
         product_ids = [item.product_id for item in items]
-        products_by_id = (
-            Product.objects.select_for_update().filter(id__in=product_ids).in_bulk()
-        )
+        products_by_id = lock_products(product_ids)
 
         # 1) Decrement quantity_available (this is the "hold")
         for item in items:
@@ -54,6 +70,7 @@ class PaymentService:
                 )
             product.quantity_available -= item.quantity
             product.save(update_fields=["quantity_available"])
+        publish_stock(products_by_id.values())
 
         # 2) Create reservation rows as audit trail + release/consume tracking
         StockReservation.objects.bulk_create(
@@ -83,6 +100,19 @@ class PaymentService:
             hours=24
         )  # timezone-aware datetime (Python/Django)
 
+        # Computed once, outside the retried transaction: the Stripe idempotency key below is
+        # derived from it, so every retry of this checkout asks Stripe for the same session
+        return PaymentService._create_checkout_session(order, user, expires_at_dt)
+
+    @staticmethod
+    @retry_on_db_conflict()
+    def _create_checkout_session(order: Order, user, expires_at_dt):
+        """
+        The transaction of create_checkout_session(), re-run on deadlocks. The Stripe session
+        is created inside it (so a Stripe failure rolls the reservations back), which means a
+        conflict after that call re-runs it: the idempotency key makes Stripe return the
+        session it already created instead of opening a duplicate one.
+        """
         expires_at_ts = int(
             expires_at_dt.timestamp()
         )  # Stripe expects a Unix timestamp (int seconds)
@@ -135,6 +165,9 @@ class PaymentService:
                 # cancel_url=settings.PAYMENT_CANCEL_URL,  # optional
                 client_reference_id=order.order_key,
                 expires_at=expires_at_ts,  # 30 min–24h, default 24h; you requested 24h
+                # Same order + same expiry = same checkout attempt (see above); a later
+                # checkout of the order gets a new expiry, hence a new session
+                idempotency_key=f"checkout-{order.order_key}-{expires_at_ts}",
             )
 
             # Attach session.id to reservations created above
@@ -156,6 +189,7 @@ class PaymentService:
             return session.url
 
     @staticmethod
+    @retry_on_db_conflict()
     def release_reservations_for_session(session_id: str) -> bool:
         """
         Release ACTIVE reservations for an expired/cancelled Stripe session:
@@ -164,23 +198,24 @@ class PaymentService:
         """
         with transaction.atomic():
             reservations = list(
-                StockReservation.objects.select_for_update().filter(
+                StockReservation.objects.select_for_update()
+                .filter(
                     stripe_session_id=session_id,
                     status=StockReservation.Status.ACTIVE,
                 )
+                .order_by("id")
             )
             if not reservations:
                 return False
 
             product_ids = [r.product_id for r in reservations]
-            products_by_id = (
-                Product.objects.select_for_update().filter(id__in=product_ids).in_bulk()
-            )
+            products_by_id = lock_products(product_ids)
 
             for r in reservations:
                 p = products_by_id[r.product_id]
                 p.quantity_available += r.quantity
                 p.save(update_fields=["quantity_available"])
+            publish_stock(products_by_id.values())
 
             StockReservation.objects.filter(id__in=[r.id for r in reservations]).update(
                 status=StockReservation.Status.RELEASED
@@ -209,65 +244,233 @@ class PaymentService:
             return False
 
         try:
-            with transaction.atomic():
-                order = Order.objects.select_for_update().get(order_key=order_key)
+            return PaymentService._fulfill_order_atomic(
+                session, order_key, reference_id
+            )
 
-                # Idempotency guard (minimal)
-                if order.status == "paid":
-                    return True
-
-                # Lock ACTIVE reservations for this order + session
-                reservations = list(
-                    StockReservation.objects.select_for_update().filter(
-                        order=order,
-                        stripe_session_id=reference_id,
-                        status=StockReservation.Status.ACTIVE,
-                    )
+        except (Order.DoesNotExist, Transaction.DoesNotExist) as e:
+            print("this error happens in fulfill_order:", e)
+            return False
+        except Exception as e:
+            print("unexpected error in fulfill_order:", e)
+            return False
+
+    @staticmethod
+    @retry_on_db_conflict()
+    def _fulfill_order_atomic(session, order_key, reference_id):
+        """
+        The transactional part of fulfill_order(), kept separate so that a deadlock or
+        serialization failure is retried here instead of being swallowed by fulfill_order().
+
+        Locks are taken in a fixed order: order -> reservations -> products, each in id order.
+        """
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(order_key=order_key)
+
+            # Idempotency guard (minimal)
+            if order.status == "paid":
+                return True
+
+            # Lock ACTIVE reservations for this order + session
+            reservations = list(
+                StockReservation.objects.select_for_update()
+                .filter(
+                    order=order,
+                    stripe_session_id=reference_id,
+                    status=StockReservation.Status.ACTIVE,
                 )
-                if not reservations:
-                    # Could already be consumed/released or a mismatch; treat as failure for now
+                .order_by("id")
+            )
+            if not reservations:
+                # Could already be consumed/released or a mismatch; treat as failure for now
+                return False
+
+            # Lock products and decrement physical stock (quantity_on_hand)
+            product_ids = [r.product_id for r in reservations]
+            products_by_id = lock_products(product_ids)
+
+            # Check every product before touching any of them, so we never commit a partial decrement
+            for r in reservations:
+                if products_by_id[r.product_id].quantity_on_hand < r.quantity:
                     return False
 
-                # Lock products and decrement physical stock (quantity_on_hand)
-                product_ids = [r.product_id for r in reservations]
-                products_by_id = (
-                    Product.objects.select_for_update()
-                    .filter(id__in=product_ids)
-                    .in_bulk()
-                )
+            for r in reservations:
+                p = products_by_id[r.product_id]
+                p.quantity_on_hand -= r.quantity
+                p.save(update_fields=["quantity_on_hand"])
+            # quantity_available doesn't change here, but these values are fresh and locked
+            publish_stock(products_by_id.values())
 
-                for r in reservations:
-                    p = products_by_id[r.product_id]
-                    if p.quantity_on_hand < r.quantity:
-                        return False
-                    p.quantity_on_hand -= r.quantity
-                    p.save(update_fields=["quantity_on_hand"])
+            # Mark reservations consumed
+            StockReservation.objects.filter(id__in=[r.id for r in reservations]).update(
+                status=StockReservation.Status.CONSUMED
+            )
 
-                # Mark reservations consumed
-                StockReservation.objects.filter(
-                    id__in=[r.id for r in reservations]
-                ).update(status=StockReservation.Status.CONSUMED)
+            # Update Transaction record
+            txn = Transaction.objects.select_for_update().get(reference_id=reference_id)
+            if txn.status == "completed":
+                return True
+
+            txn.status = "completed"
+            txn.save(update_fields=["status"])
+            TransactionPayload.store([(txn, session)])
+
+            # Update Order record in orders app
+            order.status = "paid"
+            order.save(update_fields=["status"])
+
+            # Count the sale in the reporting rollups (same transaction: exactly once)
+            record_paid_orders([order.id])
+
+        return True
+
+    @staticmethod
+    def fulfill_orders_batch(sessions, batch_size=500):
+        """
+        Bulk version of fulfill_order(), meant for replaying a backlog of
+        'checkout.session.completed' events (e.g. after an outage).
+
+        Sessions are processed in chunks of batch_size. Each chunk is one transaction with a
+        fixed number of queries, no matter how many sessions it holds:
+        - lock all involved orders, reservations, products and transactions in one pass
+        - decrement Product.quantity_on_hand with a single aggregated UPDATE
+        - mark reservations CONSUMED with one UPDATE
+        - mark Transactions completed and Orders paid with bulk_update()
+        - add the orders to the sales rollups (a fixed number of queries as well)
+
+        A session that can't be fulfilled is skipped without affecting the rest of its chunk.
+        Returns a dict {session_id: FulfillmentOutcome value}.
+        """
+        results = {}
+        paid_sessions = []
+        for session in sessions:
+            if session.get("payment_status") != "paid":
+                results[session.get("id")] = FulfillmentOutcome.NOT_PAID
+            else:
+                paid_sessions.append(session)
+
+        for start in range(0, len(paid_sessions), batch_size):
+            chunk = paid_sessions[start : start + batch_size]
+            results.update(PaymentService._fulfill_batch_atomic(chunk))
+
+        return results
+
+    @staticmethod
+    @retry_on_db_conflict()
+    def _fulfill_batch_atomic(sessions):
+        """
+        One chunk of fulfill_orders_batch(). Locks are taken in the same order as
+        _fulfill_order_atomic(): orders -> reservations -> products -> transactions, each in id order.
+        """
+        results = {}
+        sessions_by_id = {session.get("id"): session for session in sessions}
 
-                # Update Transaction record
-                txn = Transaction.objects.select_for_update().get(
-                    reference_id=reference_id
+        with transaction.atomic():
+            order_keys = {s.get("client_reference_id") for s in sessions}
+            orders_by_key = {
+                order.order_key: order
+                for order in Order.objects.select_for_update()
+                .filter(order_key__in=order_keys)
+                .order_by("id")
+            }
+
+            reservations_by_session = defaultdict(list)
+            for r in (
+                StockReservation.objects.select_for_update()
+                .filter(
+                    stripe_session_id__in=sessions_by_id,
+                    status=StockReservation.Status.ACTIVE,
                 )
-                if txn.status == "completed":
-                    return True
+                .order_by("id")
+            ):
+                reservations_by_session[r.stripe_session_id].append(r)
+
+            products_by_id = lock_products(
+                r.product_id
+                for reservations in reservations_by_session.values()
+                for r in reservations
+            )
+
+            txns_by_reference = {
+                txn.reference_id: txn
+                for txn in Transaction.objects.select_for_update()
+                .filter(reference_id__in=sessions_by_id)
+                .order_by("id")
+            }
+
+            # Decide every session in memory, tracking the physical stock it leaves behind
+            remaining_on_hand = {
+                pid: p.quantity_on_hand for pid, p in products_by_id.items()
+            }
+            decrements = defaultdict(int)
+            consumed_reservation_ids = []
+            orders_to_update = []
+            txns_to_update = []
+
+            for session_id, session in sessions_by_id.items():
+                order = orders_by_key.get(session.get("client_reference_id"))
+                if order is None:
+                    results[session_id] = FulfillmentOutcome.ORDER_NOT_FOUND
+                    continue
+                if order.status == "paid":
+                    results[session_id] = FulfillmentOutcome.ALREADY_PAID
+                    continue
+
+                reservations = [
+                    r
+                    for r in reservations_by_session.get(session_id, [])
+                    if r.order_id == order.id
+                ]
+                if not reservations:
+                    results[session_id] = FulfillmentOutcome.NO_RESERVATIONS
+                    continue
+
+                txn = txns_by_reference.get(session_id)
+                if txn is None:
+                    results[session_id] = FulfillmentOutcome.TRANSACTION_NOT_FOUND
+                    continue
+
+                needed = defaultdict(int)
+                for r in reservations:
+                    needed[r.product_id] += r.quantity
+                if any(remaining_on_hand[pid] < qty for pid, qty in needed.items()):
+                    results[session_id] = FulfillmentOutcome.OUT_OF_STOCK
+                    continue
+
+                for pid, qty in needed.items():
+                    remaining_on_hand[pid] -= qty
+                    decrements[pid] += qty
+                consumed_reservation_ids.extend(r.id for r in reservations)
 
                 txn.status = "completed"
-                txn.raw_response = session
-                txn.save(update_fields=["status", "raw_response"])
+                txns_to_update.append((txn, session))
 
-                # Update Order record in orders app
                 order.status = "paid"
-                order.save(update_fields=["status"])
-
-            return True
+                orders_to_update.append(order)
+
+                results[session_id] = FulfillmentOutcome.FULFILLED
+
+            if decrements:
+                # One UPDATE for all products: quantity_on_hand - CASE id WHEN ... END
+                Product.objects.filter(id__in=decrements).update(
+                    quantity_on_hand=F("quantity_on_hand")
+                    - Case(
+                        *[
+                            When(id=pid, then=Value(qty))
+                            for pid, qty in decrements.items()
+                        ],
+                        output_field=PositiveIntegerField(),
+                    )
+                )
+                StockReservation.objects.filter(id__in=consumed_reservation_ids).update(
+                    status=StockReservation.Status.CONSUMED
+                )
+                Transaction.objects.bulk_update(
+                    [txn for txn, _ in txns_to_update], ["status"]
+                )
+                TransactionPayload.store(txns_to_update)
+                Order.objects.bulk_update(orders_to_update, ["status"])
+                publish_stock(products_by_id[pid] for pid in decrements)
+                record_paid_orders([order.id for order in orders_to_update])
 
-        except (Order.DoesNotExist, Transaction.DoesNotExist) as e:
-            print("this error happens in fulfill_order:", e)
-            return False
-        except Exception as e:
-            print("unexpected error in fulfill_order:", e)
-            return False
+        return results
@@ -1,3 +1,494 @@
-from django.test import TestCase
+import random
+import threading
+import unittest
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from orders.models import Address, Order, OrderItem
+from products.models import Product
+from products.stock_cache import get_stock
+from .inventory import find_inventory_drift, lock_products, retry_on_db_conflict
+from .models import (
+    ArchivedStockReservation,
+    ArchivedTransaction,
+    StockReservation,
+    Transaction,
+)
+from .services import FulfillmentOutcome, PaymentService
+
+User = get_user_model()
+
+
+class PaymentFixturesMixin:
+    """Helpers to build an order that is already in the middle of a Stripe checkout."""
+
+    def create_user(self, email="buyer@example.com"):
+        return User.objects.create_user(email=email, password="password123")
+
+    def create_product(self, name, quantity=10, price=10):
+        slug = name.lower().replace(" ", "-")
+        return Product.objects.create(
+            name=name, slug=slug, price=price, quantity_on_hand=quantity
+        )
+
+    def create_reserved_order(self, user, lines, session_id):
+        """
+        Creates an order with one item per (product, quantity) in lines, reserves the stock
+        the same way create_checkout_session() does and opens a pending Transaction.
+        """
+        address = Address.objects.create(
+            user=user, city="Tehran", address_line_1="Main St", postal_code="123"
+        )
+        order = Order.objects.create(
+            user=user,
+            address=address,
+            recipient_name="Buyer",
+            total_paid=sum(product.price * quantity for product, quantity in lines),
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=order, product=product, price=product.price, quantity=q)
+                for product, q in lines
+            ]
+        )
+        with transaction.atomic():
+            PaymentService._check_stock_and_reserve(
+                order=order, user=user, expires_at=timezone.now() + timedelta(hours=1)
+            )
+        StockReservation.objects.filter(order=order).update(
+            stripe_session_id=session_id
+        )
+        Transaction.objects.create(
+            order=order, reference_id=session_id, amount=order.total_paid
+        )
+        return order
+
+    def paid_session(self, order, session_id):
+        return {
+            "id": session_id,
+            "client_reference_id": str(order.order_key),
+            "payment_status": "paid",
+        }
+
+
+def deadlock_error():
+    """Builds the OperationalError Django raises when PostgreSQL reports a deadlock."""
+    cause = Exception("deadlock detected")
+    cause.sqlstate = "40P01"
+    error = OperationalError("deadlock detected")
+    error.__cause__ = cause
+    return error
+
+
+class InventoryLockingTests(PaymentFixturesMixin, TestCase):
+    def test_lock_products_orders_by_primary_key(self):
+        """Rows must be requested in id order so every transaction locks them in the same order."""
+        products = [self.create_product(f"Product {i}") for i in range(3)]
+        ids = [p.id for p in reversed(products)]
+
+        with transaction.atomic(), CaptureQueriesContext(connection) as ctx:
+            locked = lock_products(ids + ids[:1])
+
+        self.assertEqual(list(locked), sorted(ids))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn("ORDER BY", ctx.captured_queries[0]["sql"])
+
+    @mock.patch("payments.inventory.time.sleep")
+    def test_retry_on_db_conflict_retries_deadlocks(self, sleep):
+        """A deadlock aborts the attempt, the next attempt runs and its result is returned."""
+        calls = []
+
+        @retry_on_db_conflict(max_attempts=3)
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise deadlock_error()
+            return "done"
+
+        # TestCase wraps every test in a transaction; the decorator only retries at the top level
+        with mock.patch("payments.inventory.connection") as conn:
+            conn.in_atomic_block = False
+            self.assertEqual(flaky(), "done")
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @mock.patch("payments.inventory.time.sleep")
+    def test_retry_on_db_conflict_gives_up(self, sleep):
+        """Non-retryable errors and exhausted attempts are raised to the caller."""
+
+        @retry_on_db_conflict(max_attempts=2)
+        def always_deadlocks():
+            raise deadlock_error()
+
+        @retry_on_db_conflict(max_attempts=2)
+        def broken():
+            raise OperationalError("no such table: products_product")
+
+        with mock.patch("payments.inventory.connection") as conn:
+            conn.in_atomic_block = False
+            with self.assertRaises(OperationalError):
+                always_deadlocks()
+            with self.assertRaises(OperationalError):
+                broken()
+
+        self.assertEqual(sleep.call_count, 1)
+
+    def test_fulfill_order_consumes_reservations(self):
+        user = self.create_user()
+        laptop = self.create_product("Laptop", quantity=5)
+        mouse = self.create_product("Mouse", quantity=5)
+        order = self.create_reserved_order(user, [(laptop, 2), (mouse, 1)], "cs_1")
+
+        self.assertTrue(PaymentService.fulfill_order(self.paid_session(order, "cs_1")))
+
+        laptop.refresh_from_db()
+        mouse.refresh_from_db()
+        order.refresh_from_db()
+        self.assertEqual((laptop.quantity_on_hand, laptop.quantity_available), (3, 3))
+        self.assertEqual((mouse.quantity_on_hand, mouse.quantity_available), (4, 4))
+        self.assertEqual(order.status, "paid")
+        self.assertFalse(
+            StockReservation.objects.filter(
+                order=order, status=StockReservation.Status.ACTIVE
+            ).exists()
+        )
+
+
+class BatchFulfillmentTests(PaymentFixturesMixin, TestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.laptop = self.create_product("Laptop", quantity=20)
+        self.mouse = self.create_product("Mouse", quantity=20)
+
+    def reserved_sessions(self, count, prefix="cs_batch"):
+        sessions = []
+        for i in range(count):
+            session_id = f"{prefix}_{i}"
+            order = self.create_reserved_order(
+                self.user, [(self.laptop, 1), (self.mouse, 2)], session_id
+            )
+            sessions.append(self.paid_session(order, session_id))
+        return sessions
+
+    def test_batch_reports_each_session_outcome(self):
+        fulfilled, already_paid, unpaid = self.reserved_sessions(3)
+        Order.objects.filter(order_key=already_paid["client_reference_id"]).update(
+            status="paid"
+        )
+        unpaid["payment_status"] = "unpaid"
+        unknown = {
+            "id": "cs_unknown",
+            "client_reference_id": "nope",
+            "payment_status": "paid",
+        }
+
+        results = PaymentService.fulfill_orders_batch(
+            [fulfilled, already_paid, unpaid, unknown]
+        )
+
+        self.assertEqual(
+            results,
+            {
+                fulfilled["id"]: FulfillmentOutcome.FULFILLED,
+                already_paid["id"]: FulfillmentOutcome.ALREADY_PAID,
+                unpaid["id"]: FulfillmentOutcome.NOT_PAID,
+                "cs_unknown": FulfillmentOutcome.ORDER_NOT_FOUND,
+            },
+        )
+        self.laptop.refresh_from_db()
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.laptop.quantity_on_hand, 19)
+        self.assertEqual(self.mouse.quantity_on_hand, 18)
+        self.assertEqual(
+            Transaction.objects.get(reference_id=fulfilled["id"]).status, "completed"
+        )
+
+    def test_batch_rejects_sessions_beyond_physical_stock(self):
+        sessions = self.reserved_sessions(3)
+        # Stock was lost after checkout: only two orders' worth of mice are left on hand
+        Product.objects.filter(id=self.mouse.id).update(quantity_on_hand=4)
+
+        results = PaymentService.fulfill_orders_batch(sessions)
+
+        self.assertEqual(
+            list(results.values()),
+            [FulfillmentOutcome.FULFILLED] * 2 + [FulfillmentOutcome.OUT_OF_STOCK],
+        )
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.mouse.quantity_on_hand, 0)
+
+    def test_batch_query_count_does_not_grow_with_sessions(self):
+        small = self.reserved_sessions(2)
+        large = self.reserved_sessions(8, prefix="cs_large")
+
+        with CaptureQueriesContext(connection) as small_ctx:
+            PaymentService.fulfill_orders_batch(small)
+        with CaptureQueriesContext(connection) as large_ctx:
+            PaymentService.fulfill_orders_batch(large)
+
+        self.assertEqual(
+            len(small_ctx.captured_queries), len(large_ctx.captured_queries)
+        )
+
+
+class InventoryReconciliationTests(PaymentFixturesMixin, TestCase):
+    def setUp(self):
+        user = self.create_user()
+        self.laptop = self.create_product("Laptop", quantity=10)
+        self.mouse = self.create_product("Mouse", quantity=10)
+        self.create_reserved_order(user, [(self.laptop, 3)], "cs_reconcile")
+
+    def test_consistent_inventory_reports_no_drift(self):
+        self.assertEqual(list(find_inventory_drift()), [])
+
+    def test_reconcile_inventory_reports_and_fixes_drift(self):
+        # A lost webhook left the laptop short and the mouse over-counted
+        Product.objects.filter(id=self.laptop.id).update(quantity_available=2)
+        Product.objects.filter(id=self.mouse.id).update(quantity_available=15)
+
+        drift = list(find_inventory_drift(chunk_size=1))
+        self.assertEqual(
+            [(d.product_id, d.actual, d.expected) for d in drift],
+            [(self.laptop.id, 2, 7), (self.mouse.id, 15, 10)],
+        )
+
+        out = StringIO()
+        call_command("reconcile_inventory", "--fix", stdout=out)
+
+        self.assertIn("2 product(s) drifted", out.getvalue())
+        self.laptop.refresh_from_db()
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.laptop.quantity_available, 7)
+        self.assertEqual(self.mouse.quantity_available, 10)
+        self.assertEqual(list(find_inventory_drift()), [])
+
+
+class TransactionPayloadTests(PaymentFixturesMixin, APITestCase):
+    def setUp(self):
+        user = self.create_user()
+        product = self.create_product("Laptop", quantity=10)
+        self.order = self.create_reserved_order(user, [(product, 1)], "cs_payload")
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="pw"
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def test_payload_is_trimmed_compressed_and_lazy(self):
+        session = self.paid_session(self.order, "cs_payload")
+        session["line_items"] = {"data": ["x" * 10000]}  # not in the allow-list
+        PaymentService.fulfill_order(session)
+
+        txn = Transaction.objects.get(reference_id="cs_payload")
+        self.assertEqual(txn.raw_response["payment_status"], "paid")
+        self.assertNotIn("line_items", txn.raw_response)
+        self.assertLess(len(txn.payload.data), 200)
+
+        # The admin list never touches the payload table
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("transaction-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            any("transactionpayload" in q["sql"] for q in ctx.captured_queries)
+        )
+
+        response = self.client.get(reverse("transaction-detail", kwargs={"id": txn.id}))
+        self.assertEqual(response.data["raw_response"]["id"], "cs_payload")
+
+
+class PaymentHistoryArchivalTests(PaymentFixturesMixin, APITestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        product = self.create_product("Laptop", quantity=10)
+        self.old_order = self.create_reserved_order(self.user, [(product, 1)], "cs_old")
+        self.new_order = self.create_reserved_order(self.user, [(product, 1)], "cs_new")
+        for session_id in ["cs_old", "cs_new"]:
+            order = Order.objects.get(transactions__reference_id=session_id)
+            PaymentService.fulfill_order(self.paid_session(order, session_id))
+
+        # Age the first checkout past the retention window
+        long_ago = timezone.now() - timedelta(days=365)
+        StockReservation.objects.filter(order=self.old_order).update(
+            created_at=long_ago
+        )
+        Transaction.objects.filter(order=self.old_order).update(created_at=long_ago)
+
+    def test_archive_moves_only_old_finished_rows(self):
+        old_txn = Transaction.objects.get(reference_id="cs_old")
+
+        call_command(
+            "archive_payment_history",
+            "--days",
+            "90",
+            "--batch-size",
+            "1",
+            stdout=StringIO(),
+        )
+
+        self.assertFalse(StockReservation.objects.filter(order=self.old_order).exists())
+        self.assertTrue(StockReservation.objects.filter(order=self.new_order).exists())
+        self.assertEqual(
+            list(ArchivedStockReservation.objects.values_list("order_id", flat=True)),
+            [self.old_order.id],
+        )
+
+        archived = ArchivedTransaction.objects.get(id=old_txn.id)
+        self.assertEqual(archived.reference_id, "cs_old")
+        self.assertEqual(archived.raw_response["id"], "cs_old")
+        self.assertEqual(
+            list(Transaction.objects.values_list("reference_id", flat=True)), ["cs_new"]
+        )
+
+        # Running again is a no-op
+        out = StringIO()
+        call_command("archive_payment_history", "--days", "90", stdout=out)
+        self.assertIn("Archived 0 reservation(s) and 0 transaction(s)", out.getvalue())
+
+    def test_admin_can_still_retrieve_archived_transaction(self):
+        txn_id = Transaction.objects.get(reference_id="cs_old").id
+        call_command("archive_payment_history", stdout=StringIO())
+
+        admin = User.objects.create_superuser(email="admin@example.com", password="pw")
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(reverse("transaction-detail", kwargs={"id": txn_id}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["reference_id"], "cs_old")
+        self.assertEqual(response.data["order"], self.old_order.id)
+        self.assertEqual(response.data["raw_response"]["id"], "cs_old")
+        self.assertIn("archived_at", response.data)
+
+
+class StockCacheTests(PaymentFixturesMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_inventory_writes_update_the_cache_on_commit(self):
+        user = self.create_user()
+        product = self.create_product("Hot", quantity=10)
+        self.assertEqual(get_stock([product.id])[product.id]["quantity_available"], 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.create_reserved_order(user, [(product, 3)], "cs_hot")
+        with CaptureQueriesContext(connection) as ctx:
+            stock = get_stock([product.id])
+        self.assertEqual(stock[product.id]["quantity_available"], 7)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PaymentService.release_reservations_for_session("cs_hot")
+        self.assertEqual(get_stock([product.id])[product.id]["quantity_available"], 10)
+
+        # Rolled back writes are never published
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            order.items.update(quantity=5)
+            PaymentService._check_stock_and_reserve(order, user, timezone.now())
+            raise RuntimeError
+        self.assertEqual(get_stock([product.id])[product.id]["quantity_available"], 10)
+
+
+@unittest.skipUnless(
+    connection.vendor == "postgresql", "Row-level lock conflicts need PostgreSQL"
+)
+class InventoryDeadlockTests(PaymentFixturesMixin, TransactionTestCase):
+    """
+    Concurrency benchmark: several workers lock the same products in a random order, the way
+    an un-ordered `SELECT ... FOR UPDATE WHERE id IN (...)` may, and we count how many
+    transactions PostgreSQL aborts. With lock_products() that rate must drop to zero.
+    """
+
+    WORKERS = 8
+    ROUNDS = 15
+
+    def run_workers(self, lock, label):
+        product_ids = [
+            self.create_product(f"{label} {i}", quantity=10**6).id for i in range(5)
+        ]
+        aborted = []
+        barrier = threading.Barrier(self.WORKERS)
+
+        def worker():
+            barrier.wait()
+            try:
+                for _ in range(self.ROUNDS):
+                    ids = random.sample(product_ids, len(product_ids))
+                    try:
+                        with transaction.atomic():
+                            for product in lock(ids):
+                                product.quantity_available -= 1
+                                product.save(update_fields=["quantity_available"])
+                    except OperationalError:
+                        aborted.append(1)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(aborted) / (self.WORKERS * self.ROUNDS)
+
+    def test_ordered_locking_removes_deadlocks(self):
+        def unordered(ids):
+            return [Product.objects.select_for_update().get(id=pid) for pid in ids]
+
+        def ordered(ids):
+            return lock_products(ids).values()
+
+        before = self.run_workers(unordered, "Unordered")
+        after = self.run_workers(ordered, "Ordered")
+
+        self.assertGreaterEqual(before, after)
+        self.assertEqual(after, 0)
+
+
+class CheckoutRetryTests(PaymentFixturesMixin, TransactionTestCase):
+    """create_checkout_session() re-run after a deadlock must not open a second session."""
+
+    @mock.patch("payments.inventory.time.sleep")
+    @mock.patch("payments.services.stripe.checkout.Session.create")
+    def test_retried_checkout_reuses_the_stripe_session(self, create, sleep):
+        create.return_value = mock.Mock(id="cs_retry", url="https://stripe.test/cs")
+        user = self.create_user()
+        product = self.create_product("Retry Lamp", quantity=5)
+        address = Address.objects.create(
+            user=user, city="Tehran", address_line_1="Main St", postal_code="123"
+        )
+        order = Order.objects.create(
+            user=user, address=address, recipient_name="Buyer", total_paid=10
+        )
+        OrderItem.objects.create(order=order, product=product, price=10, quantity=1)
+
+        # The first attempt is aborted after the Stripe call
+        real_create = Transaction.objects.create
+        attempts = []
+
+        def create_transaction(**kwargs):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise deadlock_error()
+            return real_create(**kwargs)
+
+        with mock.patch.object(Transaction.objects, "create", create_transaction):
+            url = PaymentService.create_checkout_session(order, user)
+
+        self.assertEqual(url, "https://stripe.test/cs")
+        self.assertEqual(create.call_count, 2)
+        keys = {call.kwargs["idempotency_key"] for call in create.call_args_list}
+        self.assertEqual(len(keys), 1)
+        # The aborted attempt's reservation was rolled back
+        self.assertEqual(StockReservation.objects.filter(order=order).count(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity_available, 4)
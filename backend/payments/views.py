@@ -2,14 +2,20 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions, generics
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 from orders.models import Order
-from .models import Transaction
+from .models import Transaction, ArchivedTransaction
 from .services import PaymentService, OutOfStockError
 import stripe
 from django.conf import settings
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from .serializers import TransactionListSerializer, TransactionDetailSerializer
+from idempotency.decorators import idempotent
+from .serializers import (
+    TransactionListSerializer,
+    TransactionDetailSerializer,
+    ArchivedTransactionSerializer,
+)
 
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -18,6 +24,9 @@ stripe.api_key = settings.STRIPE_SECRET_KEY
 class CreateCheckoutSessionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    # Retries with the same Idempotency-Key get the first checkout_url back instead of
+    # reserving stock and calling Stripe again
+    @idempotent
     def post(self, request, *args, **kwargs):
         order_id = request.data.get("order_id")
         order = get_object_or_404(Order, id=order_id, user=request.user)
@@ -96,4 +105,12 @@ class TransactionDetailView(generics.RetrieveAPIView):
     queryset = Transaction.objects.all()
     serializer_class = TransactionDetailSerializer
     permission_classes = [permissions.IsAdminUser]
-    # lookup_field = "id"
+    lookup_field = "id"
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # Old transactions are moved to the archive table (keeping their id), look there too
+            archived = get_object_or_404(ArchivedTransaction, id=kwargs["id"])
+            return Response(ArchivedTransactionSerializer(archived).data)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ProductsConfig(AppConfig):
     name = 'products'
+
+    def ready(self):
+        # Connects the receivers that invalidate the cached catalog responses
+        from . import signals  # noqa: F401
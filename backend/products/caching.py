@@ -0,0 +1,179 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+# ----------------------------------------------------------------------------
+# RESPONSE CACHE FOR READ-ONLY ENDPOINTS
+# ----------------------------------------------------------------------------
+# GET list/retrieve responses of the catalog views are cached (serialized data + status).
+#
+# Invalidation is tag based. Every cached response depends on a few tags, e.g. a product detail
+# on "product:42" plus "category:*", "attribute:*" and "option:*" (it nests all three).
+# Every tag has a version stored in the cache, and the versions are part of the response
+# cache key, so invalidate_tags("product:42") (a new version) makes every response depending
+# on it unreachable at once; those entries simply expire. Changing an object invalidates both its
+# own tag and the "<kind>:*" tag (see products/signals.py).
+#
+# Settings:
+# - RESPONSE_CACHE_ENABLED: kill switch
+# - RESPONSE_CACHE_DEFAULT_TTL: seconds, for views without their own TTL
+# - RESPONSE_CACHE_TTLS: {"ProductViewSet": 60, ...} per view class, overrides cache_timeout
+
+STATS_PREFIX = "respcache:stats"
+
+
+def _tag_version_key(tag):
+    return f"respcache:tag:{tag}"
+
+
+def tag_versions(tags):
+    """The current version of every tag; tags without one (new, or evicted) get a fresh one."""
+    keys = {tag: _tag_version_key(tag) for tag in tags}
+    found = cache.get_many(keys.values())
+    versions = {}
+    missing = {}
+    for tag, key in keys.items():
+        if key in found:
+            versions[tag] = found[key]
+        else:
+            versions[tag] = missing[key] = uuid.uuid4().hex
+    if missing:
+        cache.set_many(missing, None)
+    return versions
+
+
+def tags_fingerprint(tags):
+    """A short hash of the current versions of the tags; changes whenever one of them does."""
+    versions = sorted(tag_versions(tags).items())
+    return hashlib.sha256(repr(versions).encode()).hexdigest()[:32]
+
+
+def invalidate_tags(*tags):
+    """Makes every cached response depending on any of these tags stale."""
+    cache.set_many({_tag_version_key(tag): uuid.uuid4().hex for tag in tags}, None)
+
+
+def _count(view_name, outcome):
+    key = f"{STATS_PREFIX}:{view_name}:{outcome}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        # First hit/miss of this view (or the counter was evicted)
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def cache_stats(view_names):
+    """{view_name: {"hits": int, "misses": int}} for the given view class names."""
+    keys = {
+        (name, outcome): f"{STATS_PREFIX}:{name}:{outcome}"
+        for name in view_names
+        for outcome in ("hits", "misses")
+    }
+    found = cache.get_many(keys.values())
+    return {
+        name: {
+            outcome: found.get(keys[(name, outcome)], 0)
+            for outcome in ("hits", "misses")
+        }
+        for name in view_names
+    }
+
+
+def reset_stats(view_names):
+    cache.delete_many(
+        [
+            f"{STATS_PREFIX}:{name}:{outcome}"
+            for name in view_names
+            for outcome in ("hits", "misses")
+        ]
+    )
+
+
+class CachedResponseMixin:
+    """
+    Caches the GET list/retrieve responses of a DRF view (must come before the view's base
+    classes). The cache key varies on the full URL (host, path, sorted query params), on
+    whether the user is staff, and on the versions of the view's tags.
+
+        class CategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+            cache_tag = "category"
+            cache_timeout = 600
+
+    - cache_tag: kind of object the view serves. Lists depend on "<cache_tag>:*",
+      a detail on "<cache_tag>:<pk>"
+    - cache_list_depends_on / cache_detail_depends_on: other kinds the list / detail responses
+      depend on (nested or filtered on); they also depend on "<kind>:*" for each of them
+    - cache_timeout: TTL in seconds (RESPONSE_CACHE_TTLS and RESPONSE_CACHE_DEFAULT_TTL apply
+      when not set)
+    """
+
+    cache_tag = None
+    cache_list_depends_on = ()
+    cache_detail_depends_on = ()
+    cache_timeout = None
+
+    def list(self, request, *args, **kwargs):
+        handler = super().list
+        return self.cached_response(request, lambda: handler(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        handler = super().retrieve
+        return self.cached_response(request, lambda: handler(request, *args, **kwargs))
+
+    def get_cache_tags(self):
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if lookup is None:
+            return [f"{self.cache_tag}:*"] + [
+                f"{kind}:*" for kind in self.cache_list_depends_on
+            ]
+        return [f"{self.cache_tag}:{lookup}"] + [
+            f"{kind}:*" for kind in self.cache_detail_depends_on
+        ]
+
+    def get_cache_timeout(self):
+        ttls = settings.RESPONSE_CACHE_TTLS
+        name = type(self).__name__
+        if name in ttls:
+            return ttls[name]
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return settings.RESPONSE_CACHE_DEFAULT_TTL
+
+    def get_cache_key(self, request):
+        versions = tag_versions(self.get_cache_tags())
+        params = sorted(request.query_params.lists())
+        basis = "|".join(
+            [
+                request.build_absolute_uri(request.path),
+                repr(params),
+                "staff" if request.user.is_staff else "public",
+                repr(sorted(versions.items())),
+            ]
+        )
+        digest = hashlib.sha256(basis.encode()).hexdigest()
+        return f"respcache:{type(self).__name__}:{digest}"
+
+    def cached_response(self, request, build):
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return build()
+
+        name = type(self).__name__
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            _count(name, "hits")
+            data, status_code = cached
+            return Response(data, status=status_code)
+
+        _count(name, "misses")
+        response = build()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(
+                key, (response.data, response.status_code), self.get_cache_timeout()
+            )
+        return response
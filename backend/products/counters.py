@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .caching import invalidate_tags
+from .models import Category, Product
+
+# Category.product_count: the number of active products directly in each category, kept up
+# to date by the receivers in products/signals.py (category membership changes, products
+# activated/deactivated or deleted) so the category menu doesn't COUNT the through table.
+#
+# Queryset .update(is_active=...), bulk_create() of through rows and raw SQL bypass the
+# signals: run the recount_category_products command afterwards (or nightly) to repair.
+#
+# The counts are shown in the cached category responses (products/caching.py), and the
+# UPDATEs below send no post_save signals: every change invalidates the changed categories'
+# tags itself, once the transaction commits.
+
+Membership = Product.categories.through
+
+
+def invalidate_counts_on_commit(category_ids):
+    """Makes the cached responses showing these categories' counts stale after the commit."""
+    tags = [f"category:{pk}" for pk in category_ids]
+    if tags:
+        transaction.on_commit(lambda: invalidate_tags(*tags, "category:*"))
+
+
+def adjust_product_counts(deltas):
+    """Applies {category_id: delta} with one UPDATE per distinct delta (F() expressions)."""
+    by_delta = {}
+    for category_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(category_id)
+    for delta, category_ids in by_delta.items():
+        Category.objects.filter(id__in=category_ids).update(
+            product_count=F("product_count") + delta
+        )
+    invalidate_counts_on_commit(
+        [category_id for ids in by_delta.values() for category_id in ids]
+    )
+
+
+def active_memberships(product_ids=None, category_ids=None):
+    """{category_id: number of active products} among the existing links (1 query)."""
+    links = Membership.objects.filter(product__is_active=True)
+    if product_ids is not None:
+        links = links.filter(product_id__in=product_ids)
+    if category_ids is not None:
+        links = links.filter(category_id__in=category_ids)
+    rows = links.values("category_id").annotate(n=Count("id")).order_by()
+    return {row["category_id"]: row["n"] for row in rows}
+
+
+def recount_product_counts():
+    """Recomputes every category's product_count with a single UPDATE. Returns the row count."""
+    active = (
+        Membership.objects.filter(category_id=OuterRef("pk"), product__is_active=True)
+        .values("category_id")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    updated = Category.objects.update(product_count=Coalesce(Subquery(active), 0))
+    # Which counts changed is unknown: invalidate every category
+    invalidate_counts_on_commit(Category.objects.values_list("pk", flat=True))
+    return updated
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from products.value_stats import rebuild_value_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the value statistics (count, min/max, histogram) of the numeric "
+        "attributes of every category from the product specifications, with fresh bucket "
+        "widths. They are kept up to date incrementally; run this after bulk imports or "
+        "queryset updates (which bypass the signals), or nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--category",
+            type=int,
+            action="append",
+            dest="categories",
+            help="Only rebuild this category (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_value_stats(category_ids=options["categories"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} statistics row(s)."))
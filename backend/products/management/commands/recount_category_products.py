@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from products.counters import recount_product_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the product_count of every category from the category memberships of "
+        "active products, with a single UPDATE. The counts are kept up to date by signals; "
+        "run this after bulk imports or queryset updates (which bypass them), or nightly."
+    )
+
+    def handle(self, *args, **options):
+        updated = recount_product_counts()
+        self.stdout.write(self.style.SUCCESS(f"Recounted {updated} category(ies)."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from products import views
+from products.caching import CachedResponseMixin, cache_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows the hits, misses and hit ratio of every cached catalog view "
+        "(products.caching). Counters live in the default cache and are lost with it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Zero the counters after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        names = sorted(
+            cls.__name__
+            for cls in vars(views).values()
+            if isinstance(cls, type)
+            and issubclass(cls, CachedResponseMixin)
+            and cls is not CachedResponseMixin
+        )
+        for name, counts in cache_stats(names).items():
+            total = counts["hits"] + counts["misses"]
+            ratio = f"{counts['hits'] / total:.1%}" if total else "-"
+            self.stdout.write(
+                f"{name}: {counts['hits']} hit(s), {counts['misses']} miss(es), "
+                f"hit ratio {ratio}"
+            )
+        if options["reset"]:
+            reset_stats(names)
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
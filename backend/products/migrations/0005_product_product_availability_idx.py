@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-19 01:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_remove_product_stock_quantity_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['id', 'price', 'quantity_available', 'is_active'], name='product_availability_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 02:03
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_product_availability_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='option',
+            index=models.Index(models.F('attribute'), django.db.models.functions.text.Upper('value'), name='option_attr_value_upper_idx'),
+        ),
+    ]
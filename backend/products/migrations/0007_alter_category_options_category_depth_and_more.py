@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-19 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Cast, Concat
+
+
+def set_root_paths(apps, schema_editor):
+    """Existing categories are flat: each one is the root of its own tree."""
+    Category = apps.get_model("products", "Category")
+    Category.objects.update(
+        path=Concat(
+            Cast("id", models.CharField()),
+            models.Value("/"),
+            output_field=models.CharField(),
+        ),
+        depth=0,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_option_option_attr_value_upper_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='category',
+            options={'ordering': ['name'], 'verbose_name_plural': 'Categories'},
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='products.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_root_paths, migrations.RunPython.noop),
+    ]
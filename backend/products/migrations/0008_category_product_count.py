@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-19 02:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_products(apps, schema_editor):
+    """Initial counts, with the same single UPDATE as products.counters.recount_product_counts."""
+    Category = apps.get_model("products", "Category")
+    Product = apps.get_model("products", "Product")
+    active = (
+        Product.categories.through.objects.filter(
+            category_id=OuterRef("pk"), product__is_active=True
+        )
+        .values("category_id")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    Category.objects.update(product_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_alter_category_options_category_depth_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_products, migrations.RunPython.noop),
+    ]
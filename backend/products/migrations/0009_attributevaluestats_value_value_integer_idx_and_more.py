@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-19 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_category_product_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttributeValueStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('min_value', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('max_value', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('bucket_width', models.DecimalField(decimal_places=2, default=1, max_digits=14)),
+                ('histogram', models.JSONField(default=dict)),
+                ('stale', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Attribute Value Statistics',
+                'verbose_name_plural': 'Attribute Value Statistics',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='value',
+            index=models.Index(condition=models.Q(('value_integer__isnull', False)), fields=['attribute', 'value_integer'], name='value_integer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='value',
+            index=models.Index(condition=models.Q(('value_decimal__isnull', False)), fields=['attribute', 'value_decimal'], name='value_decimal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='value',
+            index=models.Index(condition=models.Q(('value_boolean__isnull', False)), fields=['attribute', 'value_boolean'], name='value_boolean_idx'),
+        ),
+        migrations.AddField(
+            model_name='attributevaluestats',
+            name='attribute',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='value_stats', to='products.attribute'),
+        ),
+        migrations.AddField(
+            model_name='attributevaluestats',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='value_stats', to='products.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='attributevaluestats',
+            constraint=models.UniqueConstraint(fields=('category', 'attribute'), name='unique_value_stats'),
+        ),
+    ]
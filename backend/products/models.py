@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Concat, Substr, Upper
 
 
 # ----------------------------------------------------------------------------
@@ -61,8 +62,16 @@ class Option(models.Model):
 
     class Meta:
         # Ensures that the same option value cannot be used twice for the same attribute.
+        # Its index on (attribute_id, value) also serves the per-attribute option listing
         unique_together = ("attribute", "value")
         ordering = ["value"]
+        indexes = [
+            # Case-insensitive typeahead within an attribute (/api/options/?attribute=&search=):
+            # a range scan on UPPER(value), see OptionListCreateAPIView
+            models.Index(
+                "attribute", Upper("value"), name="option_attr_value_upper_idx"
+            ),
+        ]
         verbose_name = "Attribute Option"
         verbose_name_plural = "Attribute Options"
 
@@ -107,6 +116,28 @@ class Value(models.Model):
         unique_together = ("product", "attribute")
         verbose_name = "Product Attribute Value"
         verbose_name_plural = "Product Attribute Values"
+        # Filtering products on a specification ("RAM >= 16", "waterproof = true") scans one
+        # attribute's values of one type. Only the rows where that column is set are indexed
+        # (partial indexes), so each index holds a single data type and stays small.
+        # value_option already has its foreign key index. value_text has none: btree entries
+        # are size limited and free text is matched by search, not by equality.
+        indexes = [
+            models.Index(
+                fields=["attribute", "value_integer"],
+                condition=models.Q(value_integer__isnull=False),
+                name="value_integer_idx",
+            ),
+            models.Index(
+                fields=["attribute", "value_decimal"],
+                condition=models.Q(value_decimal__isnull=False),
+                name="value_decimal_idx",
+            ),
+            models.Index(
+                fields=["attribute", "value_boolean"],
+                condition=models.Q(value_boolean__isnull=False),
+                name="value_boolean_idx",
+            ),
+        ]
 
     def __str__(self):
         # A utility method to fetch the correct value based on data type
@@ -136,18 +167,86 @@ class Value(models.Model):
 
 class Category(models.Model):
     """
-    Model for product categories (e.g., Electronics, Clothing, Books).
+    Model for product categories (e.g., Electronics, Clothing, Books), arranged in a tree
+    (e.g., Electronics > Laptops > Gaming).
+
+    The tree is stored as a materialized path: `path` lists the ids from the root down to the
+    category itself, e.g. "1/5/12/" for Gaming (12) under Laptops (5) under Electronics (1).
+    So, without recursive queries:
+    - the subtree of a category is "path LIKE '1/5/%'" (an index range scan)
+    - its ancestors (breadcrumbs) are the ids in its own path
+    path and depth are maintained by save(); don't update parent with queryset.update().
     """
 
     name = models.CharField(max_length=255, unique=True)
     slug = models.SlugField(max_length=255, unique=True)
+    # PROTECT: deleting a category with subcategories would leave them with broken paths
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="children",
+    )
+    path = models.CharField(max_length=255, db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Number of active products directly in this category, maintained by products/signals.py
+    # (see products/counters.py); shown in the category menu without counting
+    product_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["name"]
+        verbose_name_plural = "Categories"
 
     def __str__(self):
         return self.name
 
+    @property
+    def ancestor_ids(self):
+        """Ids from the root down to the parent (breadcrumbs)."""
+        return [int(i) for i in self.path.split("/")[:-2]]
+
+    def is_descendant_of(self, other):
+        return self.path.startswith(other.path)
+
+    @classmethod
+    def lineage(cls, pk):
+        """Queryset of the category `pk` and all its ancestors, as a subquery."""
+        target = cls.objects.filter(pk=pk, path__startswith=models.OuterRef("path"))
+        return cls.objects.filter(models.Exists(target))
+
+    def save(self, *args, **kwargs):
+        old_path = self.path
+        if self.parent_id is None:
+            prefix, self.depth = "", 0
+        else:
+            parent = Category.objects.only("path", "depth").get(pk=self.parent_id)
+            if self.pk and old_path and parent.path.startswith(old_path):
+                raise ValueError("A category cannot be moved under its own subtree.")
+            prefix, self.depth = parent.path, parent.depth + 1
+
+        if self.pk is None:
+            # The path ends with our own id: insert first to get it
+            self.path = ""
+            super().save(*args, **kwargs)
+            self.path = f"{prefix}{self.pk}/"
+            Category.objects.filter(pk=self.pk).update(path=self.path)
+            return
+
+        self.path = f"{prefix}{self.pk}/"
+        super().save(*args, **kwargs)
+        if old_path and old_path != self.path:
+            # Moved: rewrite the paths of the whole subtree with one UPDATE
+            subtree = Category.objects.filter(path__startswith=old_path)
+            subtree.exclude(pk=self.pk).update(
+                path=Concat(
+                    models.Value(self.path),
+                    Substr("path", len(old_path) + 1),
+                    output_field=models.CharField(),
+                ),
+                depth=models.F("depth") + (self.depth - old_path.count("/") + 1),
+            )
+
 
 class Product(models.Model):
     """
@@ -174,6 +273,14 @@ class Product(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Covering index for the availability endpoint: "id IN (...)" answered from the
+            # index alone, without reading the (wide) product rows
+            models.Index(
+                fields=["id", "price", "quantity_available", "is_active"],
+                name="product_availability_idx",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         # Check if this is a "Create" (no Primary Key yet)
@@ -205,3 +312,42 @@ class ProductImage(models.Model):
 
     def __str__(self):
         return f"{self.product.name} Gallery Image ({self.order})"
+
+
+class AttributeValueStats(models.Model):
+    """
+    Distribution of a numeric (integer or decimal) attribute's values among the active
+    products of a category: count, min/max and a histogram, for range sliders and filter UIs,
+    without scanning Value.
+
+    Maintained incrementally by products/signals.py (see products/value_stats.py). Removing
+    the min or max value can't be applied incrementally: the row is then flagged stale and
+    recomputed from Value when next read (or by rebuild_value_stats).
+    """
+
+    attribute = models.ForeignKey(
+        Attribute, on_delete=models.CASCADE, related_name="value_stats"
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="value_stats"
+    )
+    count = models.PositiveIntegerField(default=0)
+    min_value = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    max_value = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    # {"<bucket start>": count}; buckets are [start, start + bucket_width)
+    bucket_width = models.DecimalField(max_digits=14, decimal_places=2, default=1)
+    histogram = models.JSONField(default=dict)
+    stale = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "attribute"], name="unique_value_stats"
+            )
+        ]
+        verbose_name = "Attribute Value Statistics"
+        verbose_name_plural = "Attribute Value Statistics"
+
+    def __str__(self):
+        return f"{self.attribute_id} in {self.category_id}: {self.min_value}..{self.max_value}"
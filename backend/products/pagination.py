@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptionCursorPagination(CursorPagination):
+    """
+    Cursor ("keyset") pagination for option listings, in alphabetical order.
+
+    Every page is "WHERE value > <last seen> ORDER BY value LIMIT n"; filtered by attribute,
+    the (attribute_id, value) unique index answers it directly, however many options
+    (brands, colors, sizes) the attribute has.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    # 'id' breaks ties between equal values of different attributes
+    ordering = ("value", "id")
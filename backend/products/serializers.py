@@ -1,5 +1,15 @@
+from decimal import Decimal
+
 from rest_framework import serializers
-from .models import Category, Product, ProductImage, Attribute, Option, Value
+from .models import (
+    Category,
+    Product,
+    ProductImage,
+    Attribute,
+    Option,
+    Value,
+    AttributeValueStats,
+)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -9,7 +19,16 @@ class CategorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Category
-        fields = ["id", "name", "slug"]
+        fields = ["id", "name", "slug", "parent", "depth", "product_count"]
+        read_only_fields = ["depth", "product_count"]
+
+    def validate_parent(self, parent):
+        # A category can't be moved under itself or one of its descendants
+        if parent and self.instance and parent.is_descendant_of(self.instance):
+            raise serializers.ValidationError(
+                "A category cannot be moved under its own subtree."
+            )
+        return parent
 
 
 # ----------------------------------------------------------------------------
@@ -29,6 +48,21 @@ class OptionSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class OptionBulkCreateSerializer(serializers.Serializer):
+    """Input of the bulk option creation: many values for one attribute."""
+
+    attribute = serializers.PrimaryKeyRelatedField(queryset=Attribute.objects.all())
+    values = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        min_length=1,
+        max_length=1000,
+    )
+
+    def validate_values(self, values):
+        # Duplicates in the request would only be ignored by the database anyway
+        return list(dict.fromkeys(values))
+
+
 # ----------------------------------------------------------------------------
 # --- 2. EAV Attribute Serializers ---
 class AttributeListSerializer(serializers.ModelSerializer):
@@ -61,6 +95,24 @@ class AttributeDetailSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class SchemaOptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Option
+        fields = ["id", "value"]
+        read_only_fields = fields
+
+
+class AttributeSchemaSerializer(serializers.ModelSerializer):
+    """An attribute of a category schema (/api/categories/{id}/schema/) with its options."""
+
+    options = SchemaOptionSerializer(many=True)
+
+    class Meta:
+        model = Attribute
+        fields = ["id", "name", "slug", "data_type", "options"]
+        read_only_fields = fields
+
+
 class AttributeWriteSerializer(serializers.ModelSerializer):
     """Serializer for creating and updating Attribute records."""
 
@@ -320,3 +372,32 @@ class ProductWriteSerializer(serializers.ModelSerializer):
     def get_url(self, obj):
         """Generates the combined slug-ID URL for the product."""
         return f"/products/{obj.slug}-{obj.id}/"
+
+
+class AttributeValueStatsSerializer(serializers.ModelSerializer):
+    """Range and histogram of a numeric attribute within a category (range sliders)."""
+
+    attribute_name = serializers.CharField(source="attribute.name", read_only=True)
+    attribute_slug = serializers.CharField(source="attribute.slug", read_only=True)
+    histogram = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AttributeValueStats
+        fields = [
+            "attribute",
+            "attribute_name",
+            "attribute_slug",
+            "count",
+            "min_value",
+            "max_value",
+            "bucket_width",
+            "histogram",
+        ]
+        read_only_fields = fields
+
+    def get_histogram(self, obj):
+        """[[bucket start, count], ...] in ascending order."""
+        return sorted(
+            ([start, count] for start, count in obj.histogram.items()),
+            key=lambda bucket: Decimal(bucket[0]),
+        )
@@ -0,0 +1,232 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from .caching import invalidate_tags
+from .counters import active_memberships, adjust_product_counts
+from .models import Attribute, Category, Option, Product, ProductImage, Value
+from .value_stats import apply_entries, categories_of, entries_of, number_of
+
+# Invalidate the cached catalog responses (products/caching.py) when the catalog changes.
+# Tags are bumped once the transaction commits: bumping earlier would let a concurrent request
+# cache the old rows under the new versions.
+#
+# Queryset .update()/.delete() and bulk_create() don't send these signals; responses depending
+# on rows changed that way are served stale until their TTL runs out.
+
+# Saves touching only these fields don't change anything shown in the product list
+STOCK_FIELDS = {"quantity_on_hand", "quantity_available"}
+
+
+def invalidate_on_commit(*tags):
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+def _m2m_changed_pks(instance, action, reverse, pk_set, reverse_accessor):
+    """The pks of the objects whose side of a categories m2m changed (or None)."""
+    if action in ("post_add", "post_remove"):
+        return pk_set if reverse else [instance.pk]
+    if action == "post_clear" and not reverse:
+        return [instance.pk]
+    if action == "pre_clear" and reverse:
+        # category.<reverse_accessor>.clear() doesn't say which objects it removes
+        return list(getattr(instance, reverse_accessor).values_list("pk", flat=True))
+    return None
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    invalidate_on_commit(f"category:{instance.pk}", "category:*")
+
+
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+def attribute_changed(sender, instance, **kwargs):
+    invalidate_on_commit(f"attribute:{instance.pk}", "attribute:*")
+
+
+@receiver(m2m_changed, sender=Attribute.categories.through)
+def attribute_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # instance is an Attribute or, if reverse, a Category whose pk_set holds the attributes
+    changed = _m2m_changed_pks(instance, action, reverse, pk_set, "attributes")
+    if changed:
+        # "attribute:*" too: the category schemas list the attributes of each category
+        invalidate_on_commit(*(f"attribute:{pk}" for pk in changed), "attribute:*")
+
+
+@receiver(post_save, sender=Option)
+@receiver(post_delete, sender=Option)
+def option_changed(sender, instance, **kwargs):
+    invalidate_on_commit(
+        f"option:{instance.pk}", "option:*", f"attribute:{instance.attribute_id}"
+    )
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= STOCK_FIELDS:
+        # Stock updates (checkout, fulfillment) only show on the product's detail
+        invalidate_on_commit(f"product:{instance.pk}")
+    else:
+        invalidate_on_commit(f"product:{instance.pk}", "product:*")
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    invalidate_on_commit(f"product:{instance.pk}", "product:*")
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def product_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # instance is a Product or, if reverse, a Category whose pk_set holds the products
+    changed = _m2m_changed_pks(instance, action, reverse, pk_set, "products")
+    if changed:
+        # "product:*" too: product lists can be filtered by category
+        invalidate_on_commit(*(f"product:{pk}" for pk in changed), "product:*")
+
+
+@receiver(post_save, sender=Value)
+@receiver(post_delete, sender=Value)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_part_changed(sender, instance, **kwargs):
+    invalidate_on_commit(f"product:{instance.product_id}")
+
+
+# ----------------------------------------------------------------------------
+# Category.product_count (see products/counters.py)
+# ----------------------------------------------------------------------------
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def count_category_products(sender, instance, action, reverse, pk_set, **kwargs):
+    # instance is a Product or, if reverse, a Category whose pk_set holds the products
+    if action == "post_add":
+        # pk_set only holds the links actually created (existing ones are skipped)
+        if reverse:
+            added = Product.objects.filter(pk__in=pk_set, is_active=True).count()
+            adjust_product_counts({instance.pk: added})
+        elif instance.is_active:
+            adjust_product_counts({category_id: 1 for category_id in pk_set})
+    elif action in ("pre_remove", "pre_clear"):
+        # Before the links go, so only the ones that exist are counted (pk_set may hold
+        # others; it is None on clear)
+        if reverse:
+            counts = active_memberships(category_ids=[instance.pk], product_ids=pk_set)
+        else:
+            counts = active_memberships(product_ids=[instance.pk], category_ids=pk_set)
+        adjust_product_counts({category_id: -n for category_id, n in counts.items()})
+
+
+@receiver(post_init, sender=Product)
+def remember_is_active(sender, instance, **kwargs):
+    # Read from __dict__: a deferred is_active (.only(...)) must not cost a query
+    instance._saved_is_active = instance.__dict__.get("is_active")
+
+
+@receiver(post_save, sender=Product)
+def count_activation_toggle(sender, instance, created, update_fields=None, **kwargs):
+    was_active = instance._saved_is_active
+    instance._saved_is_active = instance.__dict__.get("is_active")
+    # Also read by value_stats_on_activation_toggle()
+    instance._toggled_is_active = not (
+        created
+        or update_fields is not None
+        and "is_active" not in update_fields
+        or was_active is None
+        or was_active == instance.is_active
+    )
+    if instance._toggled_is_active:
+        delta = 1 if instance.is_active else -1
+        adjust_product_counts(
+            {pk: delta for pk in instance.categories.values_list("pk", flat=True)}
+        )
+
+
+@receiver(pre_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    # Its links are deleted without m2m_changed signals
+    if instance.__dict__.get("is_active", True):
+        adjust_product_counts(
+            {
+                category_id: -n
+                for category_id, n in active_memberships([instance.pk]).items()
+            }
+        )
+
+
+# ----------------------------------------------------------------------------
+# AttributeValueStats (see products/value_stats.py)
+# ----------------------------------------------------------------------------
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def value_stats_on_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    # instance is a Product or, if reverse, a Category whose pk_set holds the products
+    if action == "post_add":
+        if reverse:
+            apply_entries(added=entries_of(pk_set, category_ids=[instance.pk]))
+        elif instance.is_active:
+            apply_entries(added=entries_of([instance.pk], category_ids=pk_set))
+    elif action in ("pre_remove", "pre_clear"):
+        # Before the links go; entries_of() only follows the links that exist
+        if reverse:
+            products = pk_set if pk_set is not None else instance.products.values("pk")
+            apply_entries(removed=entries_of(products, category_ids=[instance.pk]))
+        else:
+            apply_entries(removed=entries_of([instance.pk], category_ids=pk_set))
+
+
+@receiver(post_save, sender=Product)
+def value_stats_on_activation_toggle(sender, instance, created, **kwargs):
+    # Set by count_activation_toggle(), which is connected first
+    if instance._toggled_is_active:
+        entries = entries_of([instance.pk], active_only=False)
+        if instance.is_active:
+            apply_entries(added=entries)
+        else:
+            apply_entries(removed=entries)
+
+
+@receiver(post_init, sender=Value)
+def remember_number(sender, instance, **kwargs):
+    fields = instance.__dict__
+    instance._saved_number = (
+        fields.get("attribute_id"),
+        number_of(fields.get("value_integer"), fields.get("value_decimal")),
+    )
+
+
+@receiver(post_save, sender=Value)
+def value_saved(sender, instance, created, **kwargs):
+    old_attribute_id, old_number = instance._saved_number
+    remember_number(sender, instance)
+    new_attribute_id, new_number = instance._saved_number
+    if not created and (old_attribute_id, old_number) == (new_attribute_id, new_number):
+        return
+
+    categories = categories_of(instance.product_id)
+    removed = []
+    if not created and old_number is not None:
+        removed = [(old_attribute_id, c, old_number) for c in categories]
+    added = []
+    if new_number is not None:
+        added = [(new_attribute_id, c, new_number) for c in categories]
+    apply_entries(added=added, removed=removed)
+
+
+@receiver(pre_delete, sender=Value)
+def value_deleted(sender, instance, **kwargs):
+    # pre_delete: when a product is deleted, its values' pre_delete signals are sent before
+    # its category links are deleted, so their categories are still known here
+    attribute_id, number = instance._saved_number
+    if number is not None:
+        categories = categories_of(instance.product_id)
+        apply_entries(removed=[(attribute_id, c, number) for c in categories])
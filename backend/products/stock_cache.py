@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Product
+
+# Short-lived cache of the fields clients poll the most (price, quantity_available, is_active),
+# one entry per product, so that polling hot products (e.g. during a flash sale) doesn't read the
+# very rows checkout is locking.
+#
+# - read-through: get_stock() serves from the cache and loads the misses with one query
+# - write-through: every inventory write in PaymentService publishes the new values with
+#   publish_stock() once its transaction commits
+# - bounded staleness: entries expire after settings.STOCK_CACHE_SECONDS, so writes that don't
+#   go through publish_stock() (admin edits, out-of-order commit callbacks) are visible after
+#   at most that long
+
+STOCK_FIELDS = ("id", "price", "quantity_available", "is_active")
+
+
+def stock_key(product_id):
+    return f"stock:{product_id}"
+
+
+def _entry(price, quantity_available, is_active):
+    return {
+        "price": str(price),
+        "quantity_available": quantity_available,
+        "is_active": is_active,
+    }
+
+
+def get_stock(product_ids):
+    """
+    {product_id: {"price", "quantity_available", "is_active"}} for the given ids; unknown ids
+    are left out. Cached entries are used as is, the others are loaded with one query and cached.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    cached = cache.get_many([stock_key(pid) for pid in product_ids])
+    stock = {
+        pid: cached[stock_key(pid)] for pid in product_ids if stock_key(pid) in cached
+    }
+
+    missing = [pid for pid in product_ids if pid not in stock]
+    if missing:
+        rows = (
+            Product.objects.filter(id__in=missing).values_list(*STOCK_FIELDS).order_by()
+        )
+        loaded = {pid: _entry(*values) for pid, *values in rows}
+        # Unknown ids are cached too (as {}), so polling them doesn't hit the database either
+        loaded.update({pid: {} for pid in missing if pid not in loaded})
+        cache.set_many(
+            {stock_key(pid): entry for pid, entry in loaded.items()},
+            settings.STOCK_CACHE_SECONDS,
+        )
+        stock.update(loaded)
+
+    return {pid: entry for pid, entry in stock.items() if entry}
+
+
+def publish_stock(products):
+    """
+    Write-through: caches the current values of the given Product objects once the current
+    transaction commits (right away outside of a transaction). The values are captured now,
+    so call it after the products were changed. Nothing is published if the transaction
+    rolls back.
+    """
+    entries = {
+        stock_key(p.id): _entry(p.price, p.quantity_available, p.is_active)
+        for p in products
+    }
+    if entries:
+        transaction.on_commit(
+            lambda: cache.set_many(entries, settings.STOCK_CACHE_SECONDS)
+        )
@@ -1,10 +1,26 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework.test import APITestCase
 from rest_framework import status
 
-from products.models import Category, Product, Attribute, Option, Value
+from products.caching import cache_stats
+from products.value_stats import refresh_stale
+from products.models import (
+    Category,
+    Product,
+    Attribute,
+    Option,
+    Value,
+    AttributeValueStats,
+)
 
 
 # Get the custom user model dynamically
@@ -18,6 +34,7 @@ PRODUCT_LIST_CREATE_URL = reverse("product-list")  # /api/products/
 ATTRIBUTE_LIST_CREATE_URL = reverse("attribute-list")  # /api/attributes/
 OPTION_LIST_CREATE_URL = reverse("option-list-create")  # /api/options/
 VALUE_CREATE_URL = reverse("value-create")  # /api/values/
+AVAILABILITY_URL = reverse("product-availability")  # /api/products/availability/
 
 
 # Helper functions to generate URL for detail views (e.g., /api/products/1/)
@@ -564,3 +581,558 @@ class ProductIntegrationTests(APITestCase):
         self.client.force_authenticate(user=self.public_user)
         res_create = self.client.post(reverse("attribute-list"), {"name": "Size"})
         self.assertEqual(res_create.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ProductAvailabilityTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.phone = Product.objects.create(
+            name="Phone", slug="phone", price=100, quantity_on_hand=3
+        )
+        self.case = Product.objects.create(
+            name="Case", slug="case", price=5, quantity_on_hand=0, is_active=False
+        )
+
+    def test_many_products_in_one_query(self):
+        ids = f"{self.case.id},999999,{self.phone.id}"
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(AVAILABILITY_URL, {"ids": ids})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(
+            response.data,
+            [
+                {"id": self.case.id, "price": "5.00", "quantity_available": 0, "is_active": False},
+                {"id": self.phone.id, "price": "100.00", "quantity_available": 3, "is_active": True},
+            ],
+        )
+        self.assertIn("max-age=", response["Cache-Control"])
+
+        # Served from the stock cache from now on
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get(AVAILABILITY_URL, {"ids": ids})
+        self.assertEqual(again.data, response.data)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_ids_are_validated(self):
+        for ids in ("", "1,a", ",".join(str(i) for i in range(1, 102))):
+            response = self.client.get(AVAILABILITY_URL, {"ids": ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="password123"
+        )
+        self.category = Category.objects.create(name="Phones", slug="phones")
+        self.phone = Product.objects.create(
+            name="Phone", slug="phone", price=100, quantity_on_hand=3
+        )
+        self.phone.categories.add(self.category)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(ctx.captured_queries)
+
+    def test_responses_are_cached_per_query_and_staff_status(self):
+        url = product_detail_url(self.phone.id)
+        first, queries = self.get(url)
+        self.assertGreater(queries, 0)
+
+        again, queries = self.get(url)
+        self.assertEqual(queries, 0)
+        self.assertEqual(again.data, first.data)
+
+        # Other query params and staff users get their own entries
+        _, queries = self.get(url, fields="name")
+        self.assertGreater(queries, 0)
+        self.client.force_authenticate(user=self.admin)
+        _, queries = self.get(url)
+        self.assertGreater(queries, 0)
+
+    def test_changes_invalidate_dependent_responses(self):
+        detail_url = product_detail_url(self.phone.id)
+        self.get(detail_url)
+        self.get(PRODUCT_LIST_CREATE_URL)
+
+        # A stock update only invalidates the product's detail
+        self.phone.quantity_available = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone.save(update_fields=["quantity_available"])
+        response, queries = self.get(detail_url)
+        self.assertGreater(queries, 0)
+        self.assertEqual(response.data["quantity_available"], 1)
+        _, queries = self.get(PRODUCT_LIST_CREATE_URL)
+        self.assertEqual(queries, 0)
+
+        # Renaming a category shows in every product detail nesting it
+        self.category.name = "Mobile phones"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        response, _ = self.get(detail_url)
+        self.assertEqual(response.data["categories"][0]["name"], "Mobile phones")
+
+        self.phone.name = "Phone 2"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone.save()
+        response, queries = self.get(PRODUCT_LIST_CREATE_URL)
+        self.assertGreater(queries, 0)
+        self.assertEqual(response.data[0]["name"], "Phone 2")
+
+    def test_hit_and_miss_counters(self):
+        self.get(category_detail_url(self.category.id))
+        self.get(category_detail_url(self.category.id))
+        self.get(CATEGORY_LIST_CREATE_URL)
+
+        stats = cache_stats(["CategoryViewSet"])
+        self.assertEqual(stats["CategoryViewSet"], {"hits": 1, "misses": 2})
+
+
+class CategorySchemaTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Phones", slug="phones")
+        self.color = Attribute.objects.create(
+            name="Color", slug="color", data_type="choice"
+        )
+        self.ram = Attribute.objects.create(name="RAM", slug="ram", data_type="integer")
+        Attribute.objects.create(name="Size", slug="size")  # not in the category
+        self.color.categories.add(self.category)
+        self.ram.categories.add(self.category)
+        self.red = Option.objects.create(attribute=self.color, value="Red")
+        self.url = reverse("category-schema", kwargs={"pk": self.category.id})
+
+    def test_schema_in_two_queries_then_cached(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(
+            response.data["attributes"],
+            [
+                {
+                    "id": self.color.id,
+                    "name": "Color",
+                    "slug": "color",
+                    "data_type": "choice",
+                    "options": [{"id": self.red.id, "value": "Red"}],
+                },
+                {
+                    "id": self.ram.id,
+                    "name": "RAM",
+                    "slug": "ram",
+                    "data_type": "integer",
+                    "options": [],
+                },
+            ],
+        )
+        self.assertEqual(response["ETag"], f'"{response.data["version"]}"')
+
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get(self.url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(again.data, response.data)
+
+    def test_versioned_with_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Option.objects.create(attribute=self.color, value="Blue")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.data["attributes"][0]["options"]), 2)
+
+    def test_unknown_category(self):
+        response = self.client.get(reverse("category-schema", kwargs={"pk": 999999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_attribute_detail_prefetches_options(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(attribute_detail_url(self.color.id))
+        self.assertEqual(response.data["options"][0]["value"], "Red")
+        # attribute, its categories, its options
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+
+class OptionListingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="password123"
+        )
+        self.brand = Attribute.objects.create(
+            name="Brand", slug="brand", data_type="choice"
+        )
+        self.color = Attribute.objects.create(
+            name="Color", slug="color", data_type="choice"
+        )
+        for value in ("Samsung", "Sony", "Apple", "sandisk"):
+            Option.objects.create(attribute=self.brand, value=value)
+        Option.objects.create(attribute=self.color, value="Silver")
+
+    def values(self, **params):
+        response = self.client.get(OPTION_LIST_CREATE_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [option["value"] for option in response.data["results"]]
+
+    def test_filter_search_and_paginate(self):
+        self.assertEqual(
+            self.values(attribute=self.brand.id), ["Apple", "Samsung", "Sony", "sandisk"]
+        )
+        # Case-insensitive prefix search within the attribute
+        self.assertEqual(
+            self.values(attribute=self.brand.id, search="sa"), ["Samsung", "sandisk"]
+        )
+        self.assertEqual(self.values(search="S"), ["Samsung", "Silver", "Sony", "sandisk"])
+
+        response = self.client.get(
+            OPTION_LIST_CREATE_URL, {"attribute": self.brand.id, "page_size": 3}
+        )
+        self.assertEqual(len(response.data["results"]), 3)
+        next_page = self.client.get(response.data["next"])
+        self.assertEqual(
+            [option["value"] for option in next_page.data["results"]], ["sandisk"]
+        )
+
+    def test_bulk_create_skips_existing_values(self):
+        self.client.force_authenticate(user=self.admin)
+        url = reverse("option-bulk-create")
+        data = {"attribute": self.brand.id, "values": ["Sony", "LG", "Nokia", "LG"]}
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(
+            sorted(option["value"] for option in response.data["options"]),
+            ["LG", "Nokia", "Sony"],
+        )
+        self.assertEqual(
+            len([q for q in ctx.captured_queries if q["sql"].startswith("INSERT")]), 1
+        )
+
+        # Retrying creates nothing
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.data["created"], 0)
+        self.assertEqual(Option.objects.filter(attribute=self.brand).count(), 6)
+
+    def test_bulk_create_counts_options_by_id(self):
+        """An option deleted between the SELECT and the INSERT is re-created and counted."""
+        self.client.force_authenticate(user=self.admin)
+        bulk_create = Option.objects.bulk_create
+
+        def delete_then_insert(*args, **kwargs):
+            # A concurrent request deleting "Sony" right before our INSERT
+            Option.objects.filter(attribute=self.brand, value="Sony").delete()
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(Option.objects, "bulk_create", delete_then_insert):
+            response = self.client.post(
+                reverse("option-bulk-create"),
+                {"attribute": self.brand.id, "values": ["Sony", "Nokia"]},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+
+    def test_bulk_create_is_admin_only(self):
+        response = self.client.post(
+            reverse("option-bulk-create"),
+            {"attribute": self.brand.id, "values": ["LG"]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CategoryTreeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="password123"
+        )
+        self.electronics = Category.objects.create(name="Electronics", slug="electronics")
+        self.laptops = Category.objects.create(
+            name="Laptops", slug="laptops", parent=self.electronics
+        )
+        self.gaming = Category.objects.create(
+            name="Gaming", slug="gaming", parent=self.laptops
+        )
+        self.books = Category.objects.create(name="Books", slug="books")
+
+        self.rog = Product.objects.create(name="ROG", slug="rog", price=2000)
+        self.rog.categories.add(self.gaming, self.laptops)
+        self.xps = Product.objects.create(name="XPS", slug="xps", price=1500)
+        self.xps.categories.add(self.laptops)
+        self.novel = Product.objects.create(name="Novel", slug="novel", price=10)
+        self.novel.categories.add(self.books)
+
+    def test_paths_follow_moves(self):
+        self.assertEqual(
+            self.gaming.path, f"{self.electronics.id}/{self.laptops.id}/{self.gaming.id}/"
+        )
+        self.assertEqual(self.gaming.depth, 2)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.patch(
+            category_detail_url(self.laptops.id), {"parent": self.books.id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.gaming.refresh_from_db()
+        self.assertEqual(
+            self.gaming.path, f"{self.books.id}/{self.laptops.id}/{self.gaming.id}/"
+        )
+
+        # Not under its own subtree
+        response = self.client.patch(
+            category_detail_url(self.laptops.id), {"parent": self.gaming.id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.delete(category_detail_url(self.books.id))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_products_of_a_subtree(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                PRODUCT_LIST_CREATE_URL, {"category": self.electronics.id}
+            )
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(sorted(p["name"] for p in response.data), ["ROG", "XPS"])
+
+        response = self.client.get(PRODUCT_LIST_CREATE_URL, {"category": 999999})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_subtree_with_product_counts_and_breadcrumbs(self):
+        response = self.client.get(
+            reverse("category-subtree", kwargs={"pk": self.electronics.id})
+        )
+        counts = {node["name"]: node["subtree_product_count"] for node in response.data}
+        self.assertEqual(counts, {"Electronics": 2, "Laptops": 2, "Gaming": 1})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                reverse("category-breadcrumbs", kwargs={"pk": self.gaming.id})
+            )
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(
+            [node["name"] for node in response.data], ["Electronics", "Laptops", "Gaming"]
+        )
+
+    def test_attributes_are_inherited(self):
+        weight = Attribute.objects.create(name="Weight", slug="weight")
+        gpu = Attribute.objects.create(name="GPU", slug="gpu")
+        weight.categories.add(self.electronics)
+        gpu.categories.add(self.gaming)
+
+        def schema(category):
+            response = self.client.get(
+                reverse("category-schema", kwargs={"pk": category.id})
+            )
+            return [attribute["name"] for attribute in response.data["attributes"]]
+
+        self.assertEqual(schema(self.gaming), ["GPU", "Weight"])
+        self.assertEqual(schema(self.laptops), ["Weight"])
+
+
+class CategoryProductCountTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.phones = Category.objects.create(name="Phones", slug="phones")
+        self.sale = Category.objects.create(name="Sale", slug="sale")
+        self.phone = Product.objects.create(name="Phone", slug="phone", price=100)
+        self.old = Product.objects.create(
+            name="Old", slug="old", price=50, is_active=False
+        )
+
+    def counts(self):
+        return dict(Category.objects.values_list("slug", "product_count"))
+
+    def test_counts_follow_memberships_and_activation(self):
+        self.phone.categories.add(self.phones, self.sale)
+        self.phone.categories.add(self.phones)  # already there
+        self.old.categories.add(self.phones)  # inactive
+        self.assertEqual(self.counts(), {"phones": 1, "sale": 1})
+
+        self.sale.products.add(self.old)
+        self.old.is_active = True
+        self.old.save()
+        self.assertEqual(self.counts(), {"phones": 2, "sale": 2})
+
+        # Stock updates don't touch the counts
+        self.old.save(update_fields=["quantity_available"])
+        self.phone.categories.remove(self.sale, Category.objects.create(name="X", slug="x"))
+        self.assertEqual(self.counts(), {"phones": 2, "sale": 1, "x": 0})
+
+        self.phones.products.clear()
+        self.old.delete()
+        self.assertEqual(self.counts(), {"phones": 0, "sale": 0, "x": 0})
+
+    def test_exposed_without_extra_queries_and_recount(self):
+        self.phone.categories.add(self.phones)
+        Product.objects.filter(id=self.old.id).update(is_active=True)  # no signals
+        self.old.categories.add(self.phones)
+        Category.objects.update(product_count=0)
+
+        call_command("recount_category_products", stdout=StringIO())
+        self.assertEqual(self.counts(), {"phones": 2, "sale": 0})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(CATEGORY_LIST_CREATE_URL)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(
+            {c["slug"]: c["product_count"] for c in response.data}, {"phones": 2, "sale": 0}
+        )
+
+
+    def test_cached_category_responses_show_the_new_counts(self):
+        detail_url = category_detail_url(self.phones.pk)
+
+        def served_counts():
+            listed = self.client.get(CATEGORY_LIST_CREATE_URL).data
+            detail = self.client.get(detail_url).data
+            return {c["slug"]: c["product_count"] for c in listed}, detail[
+                "product_count"
+            ]
+
+        self.assertEqual(served_counts(), ({"phones": 0, "sale": 0}, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone.categories.add(self.phones)
+        self.assertEqual(served_counts(), ({"phones": 1, "sale": 0}, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone.is_active = False
+            self.phone.save()
+        self.assertEqual(served_counts(), ({"phones": 0, "sale": 0}, 0))
+
+        Product.objects.filter(id=self.phone.id).update(is_active=True)  # no signals
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("recount_category_products", stdout=StringIO())
+        self.assertEqual(served_counts(), ({"phones": 1, "sale": 0}, 1))
+
+
+class ProductCompareTests(APITestCase):
+    def setUp(self):
+        self.ram = Attribute.objects.create(name="RAM", slug="ram", data_type="integer")
+        self.color = Attribute.objects.create(
+            name="Color", slug="color", data_type="choice"
+        )
+        self.weight = Attribute.objects.create(
+            name="Weight", slug="weight", data_type="decimal"
+        )
+        black = Option.objects.create(attribute=self.color, value="Black")
+
+        self.a = Product.objects.create(name="A", slug="a", price=100)
+        self.b = Product.objects.create(name="B", slug="b", price=200)
+        hidden = Product.objects.create(name="H", slug="h", price=1, is_active=False)
+        self.hidden = hidden
+
+        Value.objects.create(product=self.a, attribute=self.ram, value_integer=8)
+        Value.objects.create(product=self.b, attribute=self.ram, value_integer=16)
+        Value.objects.create(product=self.a, attribute=self.color, value_option=black)
+        Value.objects.create(product=self.b, attribute=self.color, value_option=black)
+        Value.objects.create(product=self.b, attribute=self.weight, value_decimal="1.25")
+
+    def test_matrix_in_two_queries(self):
+        ids = f"{self.b.id},{self.hidden.id},{self.a.id}"
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("product-compare"), {"ids": ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        self.assertEqual([p["name"] for p in response.data["products"]], ["B", "A"])
+        matrix = {
+            a["slug"]: (a["values"], a["differs"]) for a in response.data["attributes"]
+        }
+        self.assertEqual(
+            [a["slug"] for a in response.data["attributes"]], ["color", "ram", "weight"]
+        )
+        self.assertEqual(matrix["color"], (["Black", "Black"], False))
+        self.assertEqual(matrix["ram"], ([16, 8], True))
+        self.assertEqual(matrix["weight"], (["1.25", None], True))
+
+    def test_ids_are_validated(self):
+        for ids in ("", f"{self.a.id}", f"{self.a.id},{self.a.id}", "1,2,3,4,5,6", "1,x"):
+            response = self.client.get(reverse("product-compare"), {"ids": ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AttributeValueStatsTests(APITestCase):
+    def setUp(self):
+        self.laptops = Category.objects.create(name="Laptops", slug="laptops")
+        self.ram = Attribute.objects.create(name="RAM", slug="ram", data_type="integer")
+        self.weight = Attribute.objects.create(
+            name="Weight", slug="weight", data_type="decimal"
+        )
+        self.products = []
+        for i, (ram, weight) in enumerate([(8, "1.20"), (16, "1.80"), (32, "2.50")]):
+            product = Product.objects.create(name=f"L{i}", slug=f"l{i}", price=1000)
+            product.categories.add(self.laptops)
+            Value.objects.create(product=product, attribute=self.ram, value_integer=ram)
+            Value.objects.create(
+                product=product, attribute=self.weight, value_decimal=weight
+            )
+            self.products.append(product)
+
+    def stats(self):
+        response = self.client.get(
+            reverse("category-value-stats", kwargs={"pk": self.laptops.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {
+            row["attribute_slug"]: (row["count"], row["min_value"], row["max_value"])
+            for row in response.data
+        }
+
+    def test_maintained_incrementally(self):
+        self.assertEqual(
+            self.stats(),
+            {"ram": (3, "8.00", "32.00"), "weight": (3, "1.20", "2.50")},
+        )
+        row = AttributeValueStats.objects.get(attribute=self.ram)
+        self.assertEqual(sum(row.histogram.values()), 3)
+
+        # Removing the max can't be applied in place: recomputed when read
+        self.products[2].categories.remove(self.laptops)
+        self.assertTrue(AttributeValueStats.objects.get(attribute=self.ram).stale)
+        self.assertEqual(
+            self.stats(),
+            {"ram": (2, "8.00", "16.00"), "weight": (2, "1.20", "1.80")},
+        )
+
+        self.products[0].is_active = False
+        self.products[0].save()
+        value = Value.objects.get(product=self.products[1], attribute=self.ram)
+        value.value_integer = 64
+        value.save()
+        self.assertEqual(
+            self.stats(), {"ram": (1, "64.00", "64.00"), "weight": (1, "1.80", "1.80")}
+        )
+
+        self.products[1].delete()
+        self.assertEqual(self.stats(), {})
+
+    def test_incremental_matches_rebuild(self):
+        Value.objects.filter(product=self.products[0], attribute=self.ram).delete()
+
+        def snapshot():
+            return list(
+                AttributeValueStats.objects.filter(count__gt=0)
+                .order_by("attribute_id")
+                .values_list("attribute_id", "count", "min_value", "max_value", "stale")
+            )
+
+        # Removing the min flagged the RAM row stale
+        self.assertTrue(AttributeValueStats.objects.get(attribute=self.ram).stale)
+        refresh_stale(self.laptops.id)
+        incremental = snapshot()
+        call_command("rebuild_value_stats", stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
@@ -5,6 +5,7 @@ from .views import (
     ProductViewSet,
     AttributeViewSet,
     OptionListCreateAPIView,
+    OptionBulkCreateAPIView,
     OptionDestroyAPIView,
     ValueCreateAPIView,
     ValueUpdateDestroyAPIView,
@@ -23,6 +24,11 @@ urlpatterns = [
     path("", include(router.urls)),
     # EAV Options endpoint (List/Create)
     path("options/", OptionListCreateAPIView.as_view(), name="option-list-create"),
+    path(
+        "options/bulk/",
+        OptionBulkCreateAPIView.as_view(),
+        name="option-bulk-create",
+    ),
     path(
         "options/<int:pk>/",
         OptionDestroyAPIView.as_view(),
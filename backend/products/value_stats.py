@@ -0,0 +1,209 @@
+import math
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AttributeValueStats, Product, Value
+
+# Incremental maintenance of AttributeValueStats.
+#
+# An "entry" is one numeric value counted in one category: (attribute_id, category_id, number).
+# Every change that adds or removes entries (a value saved or deleted, a product added to or
+# removed from a category, a product activated or deactivated) is applied with
+# apply_entries(), which locks the affected stats rows and updates count, min/max and the
+# histogram in place. What can't be applied that way (removing the current min or max, a
+# histogram grown too wide for its bucket width) flags the row stale; stale rows are
+# recomputed from Value by refresh_stale() when read, or by the rebuild_value_stats command.
+#
+# Queryset .update()/bulk_create() on Value or the category memberships bypass the signals:
+# run rebuild_value_stats afterwards.
+
+HISTOGRAM_BUCKETS = 10
+# A histogram with more buckets than this (values spread far beyond the range the bucket
+# width was chosen for) is recomputed with a wider bucket
+MAX_HISTOGRAM_BUCKETS = 4 * HISTOGRAM_BUCKETS
+
+CENT = Decimal("0.01")
+
+NUMERIC = Q(value_integer__isnull=False) | Q(value_decimal__isnull=False)
+
+
+def number_of(value_integer, value_decimal):
+    """The numeric value of a Value row as a Decimal, or None for non-numeric values."""
+    if value_integer is not None:
+        return Decimal(value_integer)
+    if value_decimal is not None:
+        return Decimal(value_decimal)
+    return None
+
+
+def bucket_width(low, high):
+    """A round (1, 2 or 5 x 10^k) width splitting [low, high] in about HISTOGRAM_BUCKETS."""
+    span = float(high - low) / HISTOGRAM_BUCKETS
+    if span <= 0:
+        return Decimal(1)
+    exponent = math.floor(math.log10(span))
+    step = next(step for step in (1, 2, 5, 10) if span <= step * 10**exponent)
+    return max(Decimal(step).scaleb(exponent), CENT)
+
+
+def bucket_of(number, width):
+    """Key of the histogram bucket holding number, e.g. "20.00" for 23 with a width of 10."""
+    return str((math.floor(number / width) * width).quantize(CENT))
+
+
+def entries_of(product_ids, category_ids=None, active_only=True):
+    """
+    The entries of the numeric values of the given products, in all their categories or only
+    the given ones (1 query, using the partial indexes on the typed columns).
+    """
+    values = Value.objects.filter(NUMERIC, product_id__in=product_ids)
+    if active_only:
+        values = values.filter(product__is_active=True)
+    if category_ids is None:
+        values = values.filter(product__categories__isnull=False)
+    else:
+        values = values.filter(product__categories__in=category_ids)
+    rows = values.values_list(
+        "attribute_id", "product__categories", "value_integer", "value_decimal"
+    )
+    return [
+        (attribute_id, category_id, number_of(integer, decimal))
+        for attribute_id, category_id, integer, decimal in rows.order_by()
+    ]
+
+
+def categories_of(product_id):
+    """The categories whose stats count the product's values (none while inactive)."""
+    return list(
+        Product.categories.through.objects.filter(
+            product_id=product_id, product__is_active=True
+        ).values_list("category_id", flat=True)
+    )
+
+
+def apply_entries(added=(), removed=()):
+    """
+    Adds and removes entries, in 3 queries whatever their number: create the missing rows,
+    lock the rows, write them back with bulk_update().
+    """
+    if not added and not removed:
+        return
+    keys = {(a, c) for a, c, _ in added} | {(a, c) for a, c, _ in removed}
+
+    with transaction.atomic():
+        AttributeValueStats.objects.bulk_create(
+            [AttributeValueStats(attribute_id=a, category_id=c) for a, c in keys],
+            ignore_conflicts=True,
+        )
+        rows = AttributeValueStats.objects.select_for_update().filter(
+            attribute_id__in={a for a, _ in keys},
+            category_id__in={c for _, c in keys},
+        )
+        rows = {
+            (row.attribute_id, row.category_id): row
+            for row in rows.order_by("id")
+            if (row.attribute_id, row.category_id) in keys
+        }
+
+        for attribute_id, category_id, number in added:
+            row = rows[(attribute_id, category_id)]
+            if row.count == 0:
+                row.min_value = row.max_value = number
+                row.histogram = {}
+            row.count += 1
+            row.min_value = min(row.min_value, number)
+            row.max_value = max(row.max_value, number)
+            bucket = bucket_of(number, row.bucket_width)
+            row.histogram[bucket] = row.histogram.get(bucket, 0) + 1
+            if len(row.histogram) > MAX_HISTOGRAM_BUCKETS:
+                row.stale = True
+
+        for attribute_id, category_id, number in removed:
+            row = rows[(attribute_id, category_id)]
+            if row.count <= 1:
+                row.count, row.min_value, row.max_value = 0, None, None
+                row.histogram, row.stale = {}, False
+                continue
+            row.count -= 1
+            bucket = bucket_of(number, row.bucket_width)
+            if row.histogram.get(bucket, 0) > 1:
+                row.histogram[bucket] -= 1
+            else:
+                row.histogram.pop(bucket, None)
+            if number in (row.min_value, row.max_value):
+                # The next min/max is unknown without a scan
+                row.stale = True
+
+        now = timezone.now()
+        for row in rows.values():
+            row.updated_at = now
+        AttributeValueStats.objects.bulk_update(
+            rows.values(),
+            ["count", "min_value", "max_value", "histogram", "stale", "updated_at"],
+        )
+
+
+def summarize(numbers):
+    """count, min, max, bucket width and histogram of a list of Decimals."""
+    low, high = min(numbers), max(numbers)
+    width = bucket_width(low, high)
+    histogram = defaultdict(int)
+    for number in numbers:
+        histogram[bucket_of(number, width)] += 1
+    return {
+        "count": len(numbers),
+        "min_value": low,
+        "max_value": high,
+        "bucket_width": width,
+        "histogram": dict(histogram),
+        "stale": False,
+    }
+
+
+def rebuild_value_stats(category_ids=None, attribute_ids=None):
+    """
+    Recomputes the stats of the given categories/attributes (all by default) from Value with
+    one query, choosing new bucket widths, and replaces their rows. Returns the row count.
+    """
+    values = Value.objects.filter(NUMERIC, product__is_active=True)
+    scope = AttributeValueStats.objects.all()
+    if category_ids is not None:
+        values = values.filter(product__categories__in=category_ids)
+        scope = scope.filter(category_id__in=category_ids)
+    else:
+        values = values.filter(product__categories__isnull=False)
+    if attribute_ids is not None:
+        values = values.filter(attribute_id__in=attribute_ids)
+        scope = scope.filter(attribute_id__in=attribute_ids)
+
+    numbers = defaultdict(list)
+    rows = values.values_list(
+        "attribute_id", "product__categories", "value_integer", "value_decimal"
+    )
+    for attribute_id, category_id, integer, decimal in rows.order_by().iterator(
+        chunk_size=5000
+    ):
+        numbers[(attribute_id, category_id)].append(number_of(integer, decimal))
+
+    stats = [
+        AttributeValueStats(
+            attribute_id=attribute_id, category_id=category_id, **summarize(group)
+        )
+        for (attribute_id, category_id), group in numbers.items()
+    ]
+    with transaction.atomic():
+        scope.delete()
+        AttributeValueStats.objects.bulk_create(stats, batch_size=1000)
+    return len(stats)
+
+
+def refresh_stale(category_id):
+    """Recomputes the stale stats rows of a category, if any."""
+    stale = AttributeValueStats.objects.filter(category_id=category_id, stale=True)
+    attribute_ids = list(stale.values_list("attribute_id", flat=True))
+    if attribute_ids:
+        rebuild_value_stats([category_id], attribute_ids)
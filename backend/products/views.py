@@ -1,5 +1,18 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Upper
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import (
+    GenericAPIView,
     ListCreateAPIView,
     CreateAPIView,
     UpdateAPIView,
@@ -11,7 +24,7 @@ from rest_framework.response import Response
 
 # from rest_framework.filters import SearchFilter, OrderingFilter
 # from django_filters.rest_framework import DjangoFilterBackend
-from .models import Category, Product, Attribute, Option, Value
+from .models import Category, Product, Attribute, Option, Value, AttributeValueStats
 from .serializers import (
     CategorySerializer,
     ProductListSerializer,
@@ -19,34 +32,192 @@ from .serializers import (
     ProductWriteSerializer,
     AttributeListSerializer,
     AttributeDetailSerializer,
+    AttributeSchemaSerializer,
+    AttributeValueStatsSerializer,
     AttributeWriteSerializer,
     OptionSerializer,
+    OptionBulkCreateSerializer,
     ValueWriteSerializer,
 )
+from .caching import CachedResponseMixin, tags_fingerprint
+from .pagination import OptionCursorPagination
 from .permissions import IsAdminOrReadOnly
+from .signals import invalidate_on_commit
+from .stock_cache import get_stock
+from .value_stats import refresh_stale
 from django.db.models import ProtectedError
+from analytics import copurchases, similarity
+from analytics.rankings import ORDERINGS, cached_ranking
+
+
+def in_subtree(category_id, product_ref="pk"):
+    """
+    Filter for products in the category or any of its subcategories: one indexed lookup of
+    the category's path, then an EXISTS on "path LIKE '<path>%'" (no recursion, no duplicates).
+    product_ref: the field holding the product id in the filtered queryset (e.g. "product_id"
+    for rows pointing to a product).
+    """
+    if not str(category_id).isdigit():
+        raise ValidationError({"category": "Must be a category id."})
+    path = (
+        Category.objects.filter(pk=category_id).values_list("path", flat=True).first()
+    )
+    if path is None:
+        raise NotFound("Category not found.")
+    return Exists(
+        Product.categories.through.objects.filter(
+            product_id=OuterRef(product_ref), category__path__startswith=path
+        )
+    )
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """
     Handles CRUD operations for Product Categories.
     Permissions: Read-only for all users, Admin-only for CUD.
+    List/retrieve responses are cached (products.caching).
+    Categories form a tree (see Category); subtree and breadcrumbs come from its paths.
     """
 
+    cache_tag = "category"
+    cache_timeout = 600
+
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response(
+                {"detail": "Cannot delete this category because it has subcategories."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    @action(detail=True, methods=["get"])
+    def subtree(self, request, pk=None):
+        """
+        GET /api/categories/{id}/subtree/: the category and all its descendants, depth first,
+        each with subtree_product_count: the number of active products in its own subtree (a
+        product in several of its categories counts once; product_count only counts the
+        products directly in the category). One query for the nodes, one for their products, both
+        "path LIKE '<path>%'" index range scans.
+        """
+        root = self.get_object()
+        nodes = list(
+            Category.objects.filter(path__startswith=root.path).order_by("path")
+        )
+
+        memberships = Product.categories.through.objects.filter(
+            category__path__startswith=root.path, product__is_active=True
+        ).values_list("category__path", "product_id")
+        products = defaultdict(set)
+        for path, product_id in memberships.iterator(chunk_size=5000):
+            # Counts for the category and each of its ancestors inside the subtree
+            ids = path.split("/")[root.depth : -1]
+            for end in range(len(ids)):
+                products[ids[end]].add(product_id)
+
+        data = CategorySerializer(nodes, many=True).data
+        for item in data:
+            item["subtree_product_count"] = len(products.get(str(item["id"]), ()))
+        return Response(data)
+
+    @action(detail=True, methods=["get"])
+    def breadcrumbs(self, request, pk=None):
+        """
+        GET /api/categories/{id}/breadcrumbs/: the category and its ancestors, root first,
+        in one query (the ancestors are the categories whose path prefixes its own).
+        """
+        if not str(pk).isdigit():
+            raise NotFound()
+        chain = Category.lineage(pk).order_by("depth")
+        data = CategorySerializer(chain, many=True).data
+        if not data:
+            raise NotFound()
+        return Response(data)
+
+    @action(detail=True, methods=["get"], url_path="value-stats")
+    def value_stats(self, request, pk=None):
+        """
+        GET /api/categories/{id}/value-stats/: count, min/max and histogram of every numeric
+        attribute among the active products of the category, for range sliders. Read from
+        AttributeValueStats (maintained incrementally) instead of scanning Value; rows flagged
+        stale are recomputed first.
+        """
+        category = self.get_object()
+        refresh_stale(category.id)
+        stats = (
+            AttributeValueStats.objects.filter(category=category, count__gt=0)
+            .select_related("attribute")
+            .order_by("attribute__name")
+        )
+        return Response(AttributeValueStatsSerializer(stats, many=True).data)
 
-class ProductViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=["get"])
+    def schema(self, request, pk=None):
+        """
+        GET /api/categories/{id}/schema/: the attributes of the category with their data types
+        and options, for product forms and storefront filters. Attributes are inherited: those
+        of the ancestors apply too. Two queries (attributes, then their options), cached until
+        a category, an attribute or an option changes.
+
+        Versioned: the ETag (also returned as "version") changes with the schema, so clients can
+        keep it locally and revalidate with If-None-Match (304 Not Modified when unchanged).
+        """
+        if not str(pk).isdigit():
+            raise NotFound()
+        # "category:*": moving any ancestor changes the inherited attributes
+        version = tags_fingerprint(["category:*", "attribute:*", "option:*"])
+        etag = quote_etag(version)
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = f"category-schema:{pk}:{version}"
+            data = cache.get(key)
+            if data is None:
+                attributes = (
+                    Attribute.objects.filter(categories__in=Category.lineage(pk))
+                    .distinct()
+                    .prefetch_related("options")
+                )
+                serialized = AttributeSchemaSerializer(attributes, many=True).data
+                # Only a category without attributes costs a third query
+                if not serialized and not Category.objects.filter(pk=pk).exists():
+                    raise NotFound()
+                data = {
+                    "category": int(pk),
+                    "version": version,
+                    "attributes": serialized,
+                }
+                cache.set(key, data, self.get_cache_timeout())
+            response = Response(data)
+
+        response["ETag"] = etag
+        # Clients may keep it but must revalidate before using it
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+
+class ProductViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """
     Handles CRUD operations for Products.
     Permissions: Read-only for all users, Admin-only for CUD.
     Includes filtering and searching.
+    List/retrieve responses are cached (products.caching); the detail nests categories and
+    specifications, so it also depends on them.
     """
 
     permission_classes = [IsAdminOrReadOnly]
 
+    cache_tag = "product"
+    # Lists filtered by category depend on the category tree
+    cache_list_depends_on = ("category",)
+    cache_detail_depends_on = ("category", "attribute", "option")
+    cache_timeout = 60
+
     # # Filters and Search
     # filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     # filterset_fields = ["category", "price", "is_active"]
@@ -70,6 +241,12 @@ class ProductViewSet(viewsets.ModelViewSet):
                 "categories", "images", "values__attribute", "values__value_option"
             )
 
+        if self.action == "list":
+            category_id = self.request.query_params.get("category")
+            if category_id:
+                # ?category=<id>: products of the category and of all its subcategories
+                return queryset.filter(in_subtree(category_id))
+
         # Default minimal queryset for write operations (create, update, destroy)
         return queryset
 
@@ -84,20 +261,187 @@ class ProductViewSet(viewsets.ModelViewSet):
             return ProductDetailSerializer
         return ProductListSerializer  # default for 'list'
 
+    # ------------------
+    # Rankings
+    # ------------------
+    @action(detail=False, methods=["get"])
+    def bestsellers(self, request):
+        """
+        GET /api/products/bestsellers/: best selling products, best first.
+        - ?category=<id>: only products of this category and of its subcategories
+        - ?by=units (default, all-time units sold) | trending (recent sales weigh more)
+        - ?limit=20 (max 100)
+        Served from the precomputed rankings (analytics.ProductRanking) and cached for
+        RANKINGS_CACHE_SECONDS, so most requests don't touch the database at all.
+        """
+        params = request.query_params
+        by = params.get("by", "units")
+        if by not in ORDERINGS:
+            raise ValidationError({"by": f"Must be one of: {', '.join(ORDERINGS)}."})
+        try:
+            category_id = int(params["category"]) if params.get("category") else None
+            limit = min(max(int(params.get("limit", 20)), 1), 100)
+        except ValueError:
+            raise ValidationError("'category' and 'limit' must be integers.")
+
+        data = cached_ranking(
+            by,
+            category_id,
+            limit,
+            lambda products: ProductListSerializer(products, many=True).data,
+            # Same subtree filter as the product list's ?category=, on the ranking rows
+            in_category=lambda: in_subtree(category_id, product_ref="product_id"),
+        )
+        return Response(data)
+
+    @action(detail=False, methods=["get"])
+    def availability(self, request):
+        """
+        GET /api/products/availability/?ids=1,2,3: live price and stock of many products (max 100)
+        at once, for cart and wishlist pages, in the requested order; unknown ids are left out.
+        Served from the stock cache (products.stock_cache); misses cost one query on a covering
+        index. Cacheable by clients and proxies for PRODUCT_AVAILABILITY_MAX_AGE seconds.
+        """
+        try:
+            ids = [int(i) for i in request.query_params.get("ids", "").split(",") if i]
+        except ValueError:
+            raise ValidationError({"ids": "Must be a comma separated list of ids."})
+        if not ids or len(ids) > 100:
+            raise ValidationError({"ids": "Between 1 and 100 ids are required."})
 
-class AttributeViewSet(viewsets.ModelViewSet):
+        # Read-through stock cache: most polls of hot products don't reach the database
+        stock = get_stock(ids)
+        response = Response(
+            [{"id": i, **stock[i]} for i in dict.fromkeys(ids) if i in stock]
+        )
+        patch_cache_control(
+            response, public=True, max_age=settings.PRODUCT_AVAILABILITY_MAX_AGE
+        )
+        return response
+
+    # Column holding the value of each attribute data type (see Value.get_value())
+    VALUE_COLUMNS = {
+        "text": "value_text",
+        "integer": "value_integer",
+        "decimal": "value_decimal",
+        "boolean": "value_boolean",
+        "choice": "value_option__value",
+    }
+
+    @action(detail=False, methods=["get"])
+    def compare(self, request):
+        """
+        GET /api/products/compare/?ids=1,2,3: side-by-side comparison of 2 to 5 products, in the
+        requested order (unknown ids are left out). Returns the products and an attribute x
+        product matrix: one row per attribute any of them has, ordered by attribute name, with
+        one value per product (null where a product has none) and whether the values differ.
+
+        Two queries: the products, then all their specifications as flat tuples (attribute and
+        option joined in); typed values are picked by column, without a get_value() per row.
+        """
+        try:
+            ids = [int(i) for i in request.query_params.get("ids", "").split(",") if i]
+        except ValueError:
+            raise ValidationError({"ids": "Must be a comma separated list of ids."})
+        ids = list(dict.fromkeys(ids))
+        if not 2 <= len(ids) <= 5:
+            raise ValidationError({"ids": "Between 2 and 5 distinct ids are required."})
+
+        found = {p.id: p for p in self.get_queryset().filter(id__in=ids)}
+        products = [found[i] for i in ids if i in found]
+        column = {product.id: index for index, product in enumerate(products)}
+
+        fields = ("product_id", "attribute_id", "attribute__name", "attribute__slug")
+        fields += ("attribute__data_type", *self.VALUE_COLUMNS.values())
+        rows = (
+            Value.objects.filter(product_id__in=column)
+            .values(*fields)
+            .order_by("attribute__name", "attribute_id")
+        )
+
+        matrix = {}
+        for row in rows:
+            attribute = matrix.get(row["attribute_id"])
+            if attribute is None:
+                attribute = matrix[row["attribute_id"]] = {
+                    "id": row["attribute_id"],
+                    "name": row["attribute__name"],
+                    "slug": row["attribute__slug"],
+                    "data_type": row["attribute__data_type"],
+                    "values": [None] * len(products),
+                }
+            value = row[self.VALUE_COLUMNS[row["attribute__data_type"]]]
+            if isinstance(value, Decimal):
+                # As DRF renders decimals
+                value = str(value)
+            attribute["values"][column[row["product_id"]]] = value
+
+        attributes = list(matrix.values())
+        for attribute in attributes:
+            attribute["differs"] = len(set(attribute["values"])) > 1
+
+        return Response(
+            {
+                "products": ProductListSerializer(products, many=True).data,
+                "attributes": attributes,
+            }
+        )
+
+    @action(detail=True, methods=["get"], url_path="bought-together")
+    def bought_together(self, request, pk=None):
+        """
+        GET /api/products/{id}/bought-together/: products most often bought in the same order,
+        from the precomputed co-purchase index (build_copurchase_index). ?limit=10 (max 20)
+        """
+        try:
+            product_id = int(pk)
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 20)
+        except ValueError:
+            raise ValidationError("'id' and 'limit' must be integers.")
+
+        pairs = copurchases.bought_together(product_id, limit)
+        data = ProductListSerializer([product for product, _ in pairs], many=True).data
+        for item, (_, times) in zip(data, pairs):
+            item["times_bought_together"] = times
+        return Response(data)
+
+    @action(detail=True, methods=["get"])
+    def similar(self, request, pk=None):
+        """
+        GET /api/products/{id}/similar/: products sharing the most categories and
+        specifications, precomputed by build_similar_products. ?limit=10 (max 10)
+        """
+        try:
+            product_id = int(pk)
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 10)
+        except ValueError:
+            raise ValidationError("'id' and 'limit' must be integers.")
+
+        pairs = similarity.similar_products(product_id, limit)
+        data = ProductListSerializer([product for product, _ in pairs], many=True).data
+        for item, (_, score) in zip(data, pairs):
+            item["similarity"] = round(score, 3)
+        return Response(data)
+
+
+class AttributeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """
     Handles CRUD operations for Attributes (Product Specifications).
     Permissions: Read-only for all users, Admin-only for CUD.
+    List/retrieve responses are cached (products.caching).
     """
 
     permission_classes = [IsAdminOrReadOnly]
 
+    cache_tag = "attribute"
+    cache_detail_depends_on = ("category", "option")
+    cache_timeout = 600
+
     def get_queryset(self):
         base_queryset = Attribute.objects.all()
         if self.action == "retrieve":
-            # Optimization for detail view
-            return base_queryset.prefetch_related("categories")
+            # Optimization for detail view: both nested lists in one query each
+            return base_queryset.prefetch_related("categories", "options")
 
         # Default minimal queryset for write operations (create, update, destroy)
         return base_queryset
@@ -114,15 +458,90 @@ class AttributeViewSet(viewsets.ModelViewSet):
         return AttributeListSerializer  # default for 'list'
 
 
-class OptionListCreateAPIView(ListCreateAPIView):
+class OptionListCreateAPIView(CachedResponseMixin, ListCreateAPIView):
     """
     Handles GET (list all options) and POST (create a new option).
     Read access for all, Write access for Admin only.
+    The list is cached (products.caching).
     """
 
-    queryset = Option.objects.all()
+    cache_tag = "option"
+    cache_timeout = 600
+
     serializer_class = OptionSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = OptionCursorPagination
+
+    def get_queryset(self):
+        """
+        Optional filters, both served by indexes on Option:
+        - ?attribute=<id>: the options of one attribute
+        - ?search=<prefix>: case-insensitive prefix search (typeahead). A range on UPPER(value)
+          instead of LIKE, so the (attribute_id, UPPER(value)) index is used whatever the
+          database collation.
+        """
+        queryset = Option.objects.all()
+        params = self.request.query_params
+
+        attribute_id = params.get("attribute")
+        if attribute_id:
+            if not attribute_id.isdigit():
+                raise ValidationError({"attribute": "Must be an attribute id."})
+            queryset = queryset.filter(attribute_id=attribute_id)
+
+        prefix = params.get("search", "").strip().upper()
+        if prefix:
+            queryset = queryset.alias(value_upper=Upper("value")).filter(
+                value_upper__gte=prefix, value_upper__lt=prefix + "\U0010ffff"
+            )
+        return queryset
+
+
+class OptionBulkCreateAPIView(GenericAPIView):
+    """
+    POST /api/options/bulk/ {"attribute": id, "values": [...]}: creates many options of one
+    attribute at once (max 1000) with a single INSERT. Values the attribute already has are
+    skipped (the unique (attribute, value) constraint, ON CONFLICT DO NOTHING), so the request
+    can be safely retried. Returns every requested option with its id.
+    Admin only.
+    """
+
+    serializer_class = OptionBulkCreateSerializer
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        attribute = serializer.validated_data["attribute"]
+        values = serializer.validated_data["values"]
+
+        with transaction.atomic():
+            existing_ids = set(
+                Option.objects.filter(
+                    attribute=attribute, value__in=values
+                ).values_list("id", flat=True)
+            )
+            Option.objects.bulk_create(
+                [Option(attribute=attribute, value=value) for value in values],
+                ignore_conflicts=True,
+            )
+            # bulk_create() sends no post_save signals: invalidate the cached listings here
+            invalidate_on_commit("option:*", f"attribute:{attribute.pk}")
+
+            # ignore_conflicts leaves the new objects without ids: read them back. The
+            # created ones are those missing before the INSERT, whoever inserted them (a
+            # concurrent request creating the same value at the same moment counts it too).
+            options = list(Option.objects.filter(attribute=attribute, value__in=values))
+
+        return Response(
+            {
+                "created": sum(
+                    1 for option in options if option.id not in existing_ids
+                ),
+                "options": OptionSerializer(options, many=True).data,
+            },
+            status=status.HTTP_201_CREATED,
+        )
 
 
 class OptionDestroyAPIView(DestroyAPIView):